@@ -20,6 +20,7 @@ class CollectStatusResponse(VersionedModel):
 
 class OTelSpansResponse(VersionedModel):
     count: Optional[int] = None
+    next_cursor: Optional[str] = None
     spans: List[OTelSpanDTO]
 
 
@@ -53,14 +54,17 @@ class AgentaRootsDTO(BaseModel):
 
 class AgentaNodesResponse(VersionedModel, AgentaNodesDTO):
     count: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class AgentaTreesResponse(VersionedModel, AgentaTreesDTO):
     count: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class AgentaRootsResponse(VersionedModel, AgentaRootsDTO):
     count: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class LegacySummary(BaseModel):
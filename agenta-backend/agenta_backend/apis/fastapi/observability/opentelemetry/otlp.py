@@ -3,7 +3,7 @@ from datetime import datetime
 
 import agenta_backend.apis.fastapi.observability.opentelemetry.traces_proto as Trace_Proto
 
-from google.protobuf.json_format import MessageToDict
+from google.protobuf.message import DecodeError
 
 from agenta_backend.core.observability.dtos import (
     OTelSpanDTO,
@@ -29,18 +29,38 @@ SPAN_STATUS_CODES = [
 ]
 
 
-def _parse_attribute(attribute):
-    raw_value = attribute.value
-    value_type = list(MessageToDict(raw_value).keys())[0].replace("V", "_v")
-    clean_value = getattr(raw_value, value_type)
+def _parse_value(value):
+    # Only the field that is set is read, instead of converting the value to a dict
+    value_type = value.WhichOneof("value")
 
-    return (attribute.key, clean_value)
+    if value_type is None:
+        return None
+    if value_type == "array_value":
+        return [_parse_value(item) for item in value.array_value.values]
+    if value_type == "kvlist_value":
+        return _parse_attributes(value.kvlist_value.values)
 
+    return getattr(value, value_type)
 
-def _parse_timestamp(timestamp_ns: int) -> str:
-    timestamp = timestamp_ns / 1_000_000_000
 
-    return datetime.fromtimestamp(timestamp).isoformat(timespec="microseconds")
+def _parse_attributes(attributes) -> dict:
+    return {attribute.key: _parse_value(attribute.value) for attribute in attributes}
+
+
+def _parse_timestamp(timestamp_ns: int) -> datetime:
+    # Integer arithmetic, so that the nanoseconds are truncated without float rounding
+    return datetime.fromtimestamp(timestamp_ns // 1_000_000_000).replace(
+        microsecond=timestamp_ns // 1_000 % 1_000_000
+    )
+
+
+def validate_otlp_stream(otlp_stream: bytes) -> bool:
+    try:
+        Trace_Proto.TracesData().ParseFromString(otlp_stream)
+    except DecodeError:
+        return False
+
+    return True
 
 
 def parse_otlp_stream(otlp_stream: bytes) -> List[OTelSpanDTO]:
@@ -85,25 +105,16 @@ def parse_otlp_stream(otlp_stream: bytes) -> List[OTelSpanDTO]:
                 )
 
                 # SPAN ATTRIBUTES
-                s_attributes = {
-                    k: v
-                    for k, v in [
-                        _parse_attribute(attribute) for attribute in span.attributes
-                    ]
-                }
+                s_attributes = _parse_attributes(span.attributes)
 
                 # SPAN EVENTS
                 s_events = [
                     OTelEventDTO(
                         name=event.name,
-                        timestamp=_parse_timestamp(event.time_unix_nano),
-                        attributes={
-                            k: v
-                            for k, v in [
-                                _parse_attribute(attribute)
-                                for attribute in event.attributes
-                            ]
-                        },
+                        timestamp=_parse_timestamp(event.time_unix_nano).isoformat(
+                            timespec="microseconds"
+                        ),
+                        attributes=_parse_attributes(event.attributes),
                     )
                     for event in span.events
                 ]
@@ -116,13 +127,7 @@ def parse_otlp_stream(otlp_stream: bytes) -> List[OTelSpanDTO]:
                             trace_id="0x" + link.trace_id.hex(),
                             span_id="0x" + link.span_id.hex(),
                         ),
-                        attributes={
-                            k: v
-                            for k, v in [
-                                _parse_attribute(attribute)
-                                for attribute in link.attributes
-                            ]
-                        },
+                        attributes=_parse_attributes(link.attributes),
                     )
                     for link in span.links
                 ]
@@ -4,7 +4,13 @@ from uuid import UUID
 from fastapi import APIRouter, Request, Depends, Query, status, HTTPException
 
 from agenta_backend.core.observability.service import ObservabilityService
+from agenta_backend.core.observability.interfaces import ObservabilityQueueInterface
+from agenta_backend.core.observability.ingestion import (
+    ObservabilityIngestor,
+    OTLP_INGESTION_MAX_PENDING,
+)
 from agenta_backend.core.observability.dtos import (
+    SpanDTO,
     QueryDTO,
     AnalyticsDTO,
     TreeDTO,
@@ -15,6 +21,7 @@ from agenta_backend.core.observability.utils import FilteringException
 from agenta_backend.apis.fastapi.shared.utils import handle_exceptions
 from agenta_backend.apis.fastapi.observability.opentelemetry.otlp import (
     parse_otlp_stream,
+    validate_otlp_stream,
 )
 from agenta_backend.apis.fastapi.observability.utils import (
     parse_query_dto,
@@ -46,11 +53,26 @@ class ObservabilityRouter:
         self,
         observability_service: ObservabilityService,
         observability_legacy_receiver: Optional[Callable] = None,
+        observability_queue: Optional[ObservabilityQueueInterface] = None,
+        max_pending: int = OTLP_INGESTION_MAX_PENDING,
     ):
         self.service = observability_service
 
         self.legacy_receiver = observability_legacy_receiver
 
+        # With a queue, received traces are ingested in the background by the ingestor
+        self.queue = observability_queue
+        self.max_pending = max_pending
+        self.ingestor = (
+            ObservabilityIngestor(
+                observability_service=observability_service,
+                observability_queue=observability_queue,
+                parse_otlp_stream=self._parse_otlp_stream,
+            )
+            if observability_queue
+            else None
+        )
+
         self.router = APIRouter()
 
         ### OTLP
@@ -148,11 +170,28 @@ class ObservabilityRouter:
             )
         ### LEGACY ###
 
-        otel_span_dtos = parse_otlp_stream(otlp_stream)
+        if self.queue:
+            if not validate_otlp_stream(otlp_stream):
+                raise HTTPException(
+                    status_code=400,
+                    detail="Invalid OTLP payload.",
+                )
 
-        span_dtos = [
-            parse_from_otel_span_dto(otel_span_dto) for otel_span_dto in otel_span_dtos
-        ]
+            if await self.queue.size() >= self.max_pending:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many traces waiting to be ingested. Please retry later.",
+                    headers={"Retry-After": "1"},
+                )
+
+            await self.queue.enqueue(
+                project_id=UUID(request.state.project_id),
+                otlp_stream=otlp_stream,
+            )
+
+            return CollectStatusResponse(version=self.VERSION, status="processing")
+
+        span_dtos = self._parse_otlp_stream(otlp_stream)
 
         await self.service.ingest(
             project_id=UUID(request.state.project_id),
@@ -161,6 +200,13 @@ class ObservabilityRouter:
 
         return CollectStatusResponse(version=self.VERSION, status="processing")
 
+    def _parse_otlp_stream(self, otlp_stream: bytes) -> List[SpanDTO]:
+        otel_span_dtos = parse_otlp_stream(otlp_stream)
+
+        return [
+            parse_from_otel_span_dto(otel_span_dto) for otel_span_dto in otel_span_dtos
+        ]
+
     ### QUERIES
 
     @handle_exceptions()
@@ -175,6 +221,11 @@ class ObservabilityRouter:
     ):
         """
         Query traces, with optional grouping, windowing, filtering, and pagination.
+
+        The count is estimated from the planner statistics unless `counting=exact`.
+        When the page is full, `next_cursor` is the cursor of the following page, to
+        be passed as `cursor`. Search results are ranked by relevance, hence have no
+        cursor, and are paginated with `page` and `size` instead.
         """
 
         if (
@@ -188,7 +239,7 @@ class ObservabilityRouter:
             )
 
         try:
-            span_dtos, count = await self.service.query(
+            span_dtos, count, next_cursor = await self.service.query(
                 project_id=UUID(request.state.project_id),
                 query_dto=query_dto,
             )
@@ -207,6 +258,7 @@ class ObservabilityRouter:
             return OTelSpansResponse(
                 version=self.VERSION,
                 count=count,
+                next_cursor=next_cursor,
                 spans=spans,
             )
 
@@ -234,6 +286,7 @@ class ObservabilityRouter:
                     return AgentaTreesResponse(
                         version=self.VERSION,
                         count=count,
+                        next_cursor=next_cursor,
                         trees=[
                             AgentaTreeDTO(
                                 tree=TreeDTO(
@@ -274,6 +327,7 @@ class ObservabilityRouter:
                     return AgentaRootsResponse(
                         version=self.VERSION,
                         count=count,
+                        next_cursor=next_cursor,
                         roots=[
                             AgentaRootDTO(
                                 root=RootDTO(id=root_id),
@@ -287,6 +341,7 @@ class ObservabilityRouter:
             return AgentaNodesResponse(
                 version=self.VERSION,
                 count=count,
+                next_cursor=next_cursor,
                 nodes=[AgentaNodeDTO(**span.model_dump()) for span in spans],
             )
 
@@ -38,6 +38,7 @@ from agenta_backend.core.observability.dtos import (
     WindowingDTO,
     FilteringDTO,
     PaginationDTO,
+    Counting,
     QueryDTO,
     AnalyticsDTO,
     ConditionDTO,
@@ -95,9 +96,16 @@ def _parse_pagination(
     size: Optional[int] = None,
     next: Optional[str] = None,  # pylint: disable=W0622:redefined-builtin
     stop: Optional[str] = None,
+    cursor: Optional[str] = None,
 ) -> Optional[PaginationDTO]:
     _pagination = None
 
+    if cursor and (page or next):
+        raise HTTPException(
+            status_code=400,
+            detail="'cursor' cannot be provided with 'page' or 'next'",
+        )
+
     if page and next:
         raise HTTPException(
             status_code=400,
@@ -121,11 +129,24 @@ def _parse_pagination(
         size=size,
         next=next,
         stop=stop,
+        cursor=cursor,
     )
 
     return _pagination
 
 
+def _parse_counting(
+    counting: Optional[str] = None,
+) -> Counting:
+    try:
+        return Counting(counting or Counting.ESTIMATED.value)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail="'counting' must be either 'exact' or 'estimated'",
+        ) from e
+
+
 def parse_query_dto(
     # GROUPING
     # - Option 2: Flat query parameters
@@ -143,12 +164,20 @@ def parse_query_dto(
     size: Optional[int] = Query(None),
     next: Optional[str] = Query(None),  # pylint: disable=W0622:redefined-builtin
     stop: Optional[str] = Query(None),
+    # - the 'next_cursor' of the previous page, unlike 'next' which is a timestamp
+    cursor: Optional[str] = Query(None),
+    # COUNTING
+    # - Option 2: Flat query parameters
+    counting: Optional[str] = Query(None),
 ) -> QueryDTO:
     return QueryDTO(
         grouping=_parse_grouping(focus=focus),
         windowing=_parse_windowing(oldest=oldest, newest=newest),
         filtering=_parse_filtering(filtering=filtering),
-        pagination=_parse_pagination(page=page, size=size, next=next, stop=stop),
+        pagination=_parse_pagination(
+            page=page, size=size, next=next, stop=stop, cursor=cursor
+        ),
+        counting=_parse_counting(counting=counting),
     )
 
 
@@ -261,6 +261,7 @@ class StringOperator(Enum):
     CONTAINS = "contains"
     MATCHES = "matches"
     LIKE = "like"
+    SEARCH = "search"
 
 
 class ListOperator(Enum):
@@ -324,12 +325,20 @@ class PaginationDTO(BaseModel):
     next: Optional[datetime] = None
     stop: Optional[datetime] = None
 
+    cursor: Optional[str] = None
+
+
+class Counting(Enum):
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+
 
 class QueryDTO(BaseModel):
     grouping: Optional[GroupingDTO] = None
     windowing: Optional[WindowingDTO] = None
     filtering: Optional[FilteringDTO] = None
     pagination: Optional[PaginationDTO] = None
+    counting: Counting = Counting.ESTIMATED
 
 
 class AnalyticsDTO(BaseModel):
@@ -0,0 +1,190 @@
+import os
+import asyncio
+import logging
+import socket
+from collections import defaultdict
+from itertools import count
+from typing import Callable, Dict, List, Tuple
+from uuid import UUID
+
+from agenta_backend.core.observability.interfaces import ObservabilityQueueInterface
+from agenta_backend.core.observability.service import ObservabilityService
+from agenta_backend.core.observability.dtos import SpanDTO
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Ingestion settings: the number of workers draining the queue, the maximum number of
+# OTLP payloads coalesced per write, and the maximum number of queued payloads before
+# the receiver pushes back on the exporters
+OTLP_INGESTION_WORKERS = int(os.environ.get("AGENTA_OTLP_INGESTION_WORKERS", 4))
+OTLP_INGESTION_BATCH_SIZE = int(os.environ.get("AGENTA_OTLP_INGESTION_BATCH_SIZE", 100))
+OTLP_INGESTION_MAX_PENDING = int(
+    os.environ.get("AGENTA_OTLP_INGESTION_MAX_PENDING", 10000)
+)
+
+
+class LocalObservabilityQueue(ObservabilityQueueInterface):
+    """
+    In-memory stand-in of the ingestion queue, for tests and single-process setups.
+    Payloads are lost if the process exits.
+    """
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.in_flight: Dict[str, Tuple[str, UUID, bytes]] = {}
+        self.ids = count()
+
+    async def enqueue(
+        self,
+        *,
+        project_id: UUID,
+        otlp_stream: bytes,
+    ) -> None:
+        await self.queue.put((str(next(self.ids)), project_id, otlp_stream))
+
+    async def dequeue(
+        self,
+        *,
+        consumer: str,
+        count: int,
+    ) -> List[Tuple[str, UUID, bytes]]:
+        messages = [await self.queue.get()]
+        while len(messages) < count and not self.queue.empty():
+            messages.append(self.queue.get_nowait())
+
+        for message in messages:
+            self.in_flight[message[0]] = message
+
+        return messages
+
+    async def ack(
+        self,
+        *,
+        message_ids: List[str],
+    ) -> None:
+        for message_id in message_ids:
+            self.in_flight.pop(message_id, None)
+
+    async def nack(
+        self,
+        *,
+        message_ids: List[str],
+    ) -> None:
+        for message_id in message_ids:
+            message = self.in_flight.pop(message_id, None)
+            if message:
+                await self.queue.put(message)
+
+    async def size(self) -> int:
+        return self.queue.qsize() + len(self.in_flight)
+
+
+class ObservabilityIngestor:
+    """
+    Pool of workers draining the OTLP payloads queued by the receiver.
+
+    Each worker dequeues up to `batch_size` payloads, parses them, and ingests the spans
+    of each project with a single `ObservabilityService.ingest` call. Payloads that
+    cannot be parsed are dropped. When the spans of several payloads cannot be written
+    together, the payloads are split in halves and written again, so that only the
+    payloads that cannot be written on their own are released, to be retried.
+    """
+
+    def __init__(
+        self,
+        *,
+        observability_service: ObservabilityService,
+        observability_queue: ObservabilityQueueInterface,
+        parse_otlp_stream: Callable[[bytes], List[SpanDTO]],
+        workers: int = OTLP_INGESTION_WORKERS,
+        batch_size: int = OTLP_INGESTION_BATCH_SIZE,
+    ):
+        self.service = observability_service
+        self.queue = observability_queue
+        self.parse_otlp_stream = parse_otlp_stream
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self.tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self.tasks = [
+            asyncio.create_task(self._work(f"{self.consumer}-{index}"))
+            for index in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _work(self, consumer: str) -> None:
+        while True:
+            try:
+                messages = await self.queue.dequeue(
+                    consumer=consumer,
+                    count=self.batch_size,
+                )
+                if messages:
+                    await self.process(messages)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error(f"Error while draining the OTLP queue: {e}")
+                await asyncio.sleep(1)
+
+    async def process(self, messages: List[Tuple[str, UUID, bytes]]) -> None:
+        payloads_by_project: Dict[UUID, List[Tuple[str, List[SpanDTO]]]] = defaultdict(
+            list
+        )
+        dropped_message_ids: List[str] = []
+
+        for message_id, project_id, otlp_stream in messages:
+            try:
+                span_dtos = self.parse_otlp_stream(otlp_stream)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error(f"Dropping unparsable OTLP payload {message_id}: {e}")
+                dropped_message_ids.append(message_id)
+                continue
+
+            payloads_by_project[project_id].append((message_id, span_dtos))
+
+        if dropped_message_ids:
+            await self.queue.ack(message_ids=dropped_message_ids)
+
+        for project_id, payloads in payloads_by_project.items():
+            await self._ingest(project_id, payloads)
+
+    async def _ingest(
+        self,
+        project_id: UUID,
+        payloads: List[Tuple[str, List[SpanDTO]]],
+    ) -> None:
+        message_ids = [message_id for message_id, _ in payloads]
+        span_dtos = [span_dto for _, span_dtos in payloads for span_dto in span_dtos]
+
+        try:
+            await self.service.ingest(
+                project_id=project_id,
+                span_dtos=span_dtos,
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            # A single payload that cannot be written fails the payloads written with
+            # it, which would otherwise be retried, and eventually dropped, with it
+            if len(payloads) > 1:
+                middle = len(payloads) // 2
+                await self._ingest(project_id, payloads[:middle])
+                await self._ingest(project_id, payloads[middle:])
+                return
+
+            logger.error(
+                f"Could not ingest {len(span_dtos)} spans of project {project_id}: {e}"
+            )
+            await self.queue.nack(message_ids=message_ids)
+            return
+
+        await self.queue.ack(message_ids=message_ids)
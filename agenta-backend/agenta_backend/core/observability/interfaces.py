@@ -1,5 +1,6 @@
 from typing import List, Tuple, Optional
 from uuid import UUID
+from datetime import datetime
 
 from agenta_backend.core.observability.dtos import (
     QueryDTO,
@@ -20,7 +21,7 @@ class ObservabilityDAOInterface:
         *,
         project_id: UUID,
         query_dto: QueryDTO,
-    ) -> Tuple[List[SpanDTO], Optional[int]]:
+    ) -> Tuple[List[SpanDTO], Optional[int], Optional[str]]:
         raise NotImplementedError
 
     async def analytics(
@@ -83,3 +84,64 @@ class ObservabilityDAOInterface:
         node_ids: List[UUID],
     ) -> None:
         raise NotImplementedError
+
+    async def delete_older(
+        self,
+        *,
+        project_id: UUID,
+        #
+        oldest: datetime,
+    ) -> int:
+        raise NotImplementedError
+
+    async def create_partitions(
+        self,
+        *,
+        ahead: int,
+    ) -> List[str]:
+        raise NotImplementedError
+
+    async def drop_partitions(
+        self,
+        *,
+        oldest: datetime,
+    ) -> List[str]:
+        raise NotImplementedError
+
+
+class ObservabilityQueueInterface:
+    def __init__(self):
+        raise NotImplementedError
+
+    async def enqueue(
+        self,
+        *,
+        project_id: UUID,
+        otlp_stream: bytes,
+    ) -> None:
+        raise NotImplementedError
+
+    async def dequeue(
+        self,
+        *,
+        consumer: str,
+        count: int,
+    ) -> List[Tuple[str, UUID, bytes]]:
+        raise NotImplementedError
+
+    async def ack(
+        self,
+        *,
+        message_ids: List[str],
+    ) -> None:
+        raise NotImplementedError
+
+    async def nack(
+        self,
+        *,
+        message_ids: List[str],
+    ) -> None:
+        raise NotImplementedError
+
+    async def size(self) -> int:
+        raise NotImplementedError
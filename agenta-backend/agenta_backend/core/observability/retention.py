@@ -0,0 +1,109 @@
+import os
+import json
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from agenta_backend.core.observability.service import ObservabilityService
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Retention settings: the number of weekly partitions created ahead of time, the
+# retention of all projects, enforced by dropping whole partitions, the shorter
+# retentions of some projects, enforced by deleting their nodes in chunks, and the
+# interval between two runs, in seconds
+OBSERVABILITY_PARTITIONS_AHEAD = int(
+    os.environ.get("AGENTA_OBSERVABILITY_PARTITIONS_AHEAD", 4)
+)
+OBSERVABILITY_RETENTION_DAYS = (
+    int(os.environ["AGENTA_OBSERVABILITY_RETENTION_DAYS"])
+    if os.environ.get("AGENTA_OBSERVABILITY_RETENTION_DAYS")
+    else None
+)
+OBSERVABILITY_PROJECT_RETENTION_DAYS = {
+    UUID(project_id): int(days)
+    for project_id, days in json.loads(
+        os.environ.get("AGENTA_OBSERVABILITY_PROJECT_RETENTION_DAYS") or "{}"
+    ).items()
+}
+OBSERVABILITY_RETENTION_INTERVAL = int(
+    os.environ.get("AGENTA_OBSERVABILITY_RETENTION_INTERVAL", 3600)
+)
+
+
+class ObservabilityRetention:
+    """
+    Background maintenance of the time-partitioned nodes.
+
+    Each run creates the partitions of the coming weeks, and moves the nodes written
+    to the default partition meanwhile to the partitions of their weeks. It then drops
+    the partitions older than the retention of all projects, and deletes the nodes of
+    the projects with a shorter retention, row by row. Runs are safe to overlap
+    across replicas.
+    """
+
+    def __init__(
+        self,
+        *,
+        observability_service: ObservabilityService,
+        ahead: int = OBSERVABILITY_PARTITIONS_AHEAD,
+        retention_days: Optional[int] = OBSERVABILITY_RETENTION_DAYS,
+        project_retention_days: Dict[UUID, int] = OBSERVABILITY_PROJECT_RETENTION_DAYS,
+        interval: int = OBSERVABILITY_RETENTION_INTERVAL,
+    ):
+        self.service = observability_service
+        self.ahead = max(1, ahead)
+        self.retention_days = retention_days
+        self.project_retention_days = project_retention_days
+        self.interval = interval
+        self.tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self.tasks = [asyncio.create_task(self._work())]
+
+    async def stop(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                await self.process()
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error(f"Error while maintaining the observability data: {e}")
+
+            await asyncio.sleep(self.interval)
+
+    async def process(self) -> None:
+        now = datetime.now(timezone.utc)
+
+        created = await self.service.create_partitions(ahead=self.ahead)
+        if created:
+            logger.info(f"Created partitions {created}")
+
+        if self.retention_days is not None:
+            dropped = await self.service.drop_partitions(
+                oldest=now - timedelta(days=self.retention_days),
+            )
+            if dropped:
+                logger.info(f"Dropped partitions {dropped}")
+
+        for project_id, days in self.project_retention_days.items():
+            if self.retention_days is not None and days >= self.retention_days:
+                continue
+
+            count = await self.service.delete_older(
+                project_id=project_id,
+                oldest=now - timedelta(days=days),
+            )
+            if count:
+                logger.info(f"Deleted {count} nodes of project {project_id}")
@@ -1,5 +1,6 @@
 from typing import List, Optional, Tuple
 from uuid import UUID
+from datetime import datetime
 
 from agenta_backend.core.observability.interfaces import ObservabilityDAOInterface
 from agenta_backend.core.observability.dtos import (
@@ -32,11 +33,11 @@ class ObservabilityService:
         *,
         project_id: UUID,
         query_dto: QueryDTO,
-    ) -> Tuple[List[SpanDTO], Optional[int]]:
+    ) -> Tuple[List[SpanDTO], Optional[int], Optional[str]]:
         if query_dto.filtering:
             parse_filtering(query_dto.filtering)
 
-        span_dtos, count = await self.observability_dao.query(
+        span_dtos, count, next_cursor = await self.observability_dao.query(
             project_id=project_id,
             query_dto=query_dto,
         )
@@ -52,7 +53,7 @@ class ObservabilityService:
                 span_dto for span_dto in span_idx.values() if span_dto.parent is None
             ]
 
-        return span_dtos, count
+        return span_dtos, count, next_cursor
 
     async def analytics(
         self,
@@ -149,3 +150,32 @@ class ObservabilityService:
                 project_id=project_id,
                 node_ids=node_ids,
             )
+
+    async def delete_older(
+        self,
+        *,
+        project_id: UUID,
+        oldest: datetime,
+    ) -> int:
+        return await self.observability_dao.delete_older(
+            project_id=project_id,
+            oldest=oldest,
+        )
+
+    async def create_partitions(
+        self,
+        *,
+        ahead: int,
+    ) -> List[str]:
+        return await self.observability_dao.create_partitions(
+            ahead=ahead,
+        )
+
+    async def drop_partitions(
+        self,
+        *,
+        oldest: datetime,
+    ) -> List[str]:
+        return await self.observability_dao.drop_partitions(
+            oldest=oldest,
+        )
@@ -1,18 +1,23 @@
-from typing import Optional, List, Tuple, Union
+import re
+from typing import Any, Dict, Optional, List, Tuple, Union
+from json import dumps, loads
+from base64 import urlsafe_b64encode, urlsafe_b64decode
 from datetime import datetime, timedelta, time, timezone
 from traceback import print_exc
 from uuid import UUID
 
-from sqlalchemy import and_, or_, not_, distinct, Column, func, cast, text
-from sqlalchemy import TIMESTAMP, Enum, UUID as SQLUUID, Integer, Numeric
+from sqlalchemy import and_, or_, not_, distinct, Column, func, cast, text, bindparam
+from sqlalchemy import tuple_, literal_column, BigInteger, delete
+from sqlalchemy import TIMESTAMP, Enum, UUID as SQLUUID, Integer, Numeric, String
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.future import select
 from sqlalchemy.dialects import postgresql
 
 from agenta_backend.dbs.postgres.shared.engine import engine
-from agenta_backend.dbs.postgres.observability.dbes import NodesDBE
+from agenta_backend.dbs.postgres.observability.dbes import NodesDBE, NodesRollupsDBE
 from agenta_backend.dbs.postgres.observability.mappings import (
     map_span_dto_to_dbe,
+    map_span_dto_to_row,
     map_span_dbe_to_dto,
     map_bucket_dbes_to_dtos,
 )
@@ -20,6 +25,7 @@ from agenta_backend.dbs.postgres.observability.mappings import (
 from agenta_backend.core.observability.interfaces import ObservabilityDAOInterface
 from agenta_backend.core.observability.dtos import (
     QueryDTO,
+    Counting,
     SpanDTO,
     AnalyticsDTO,
     BucketDTO,
@@ -57,6 +63,23 @@ _SUGGESTED_BUCKETS_LIST = [
     (720, "12 hours"),
     (1440, "1 day"),
 ]
+_BULK_INSERT_CHUNK_SIZE = 1000
+_BULK_DELETE_CHUNK_SIZE = 1000
+_PARTITION_INTERVAL = timedelta(weeks=1)
+_PARTITION_BOUND = re.compile(r"FOR VALUES FROM \((.+?)\) TO \((.+?)\)")
+_PARTITIONS_LOCK = 0x6E6F646573  # "nodes"
+_DEFAULT_PARTITION = f"{NodesDBE.__tablename__}_default"
+_INGESTION_LOCK = 0x7370616E73  # "spans", seeds the ingestion locks
+_INGESTION_TREE_LOCKS = 64  # beyond which a write locks the whole project
+_SEARCH_CONFIG = literal_column("'simple'::regconfig")
+_NODES_COLUMNS = [
+    column.name for column in NodesDBE.__table__.columns if column.computed is None
+]
+_ROLLUPS_METRICS = [
+    column.name
+    for column in NodesRollupsDBE.__table__.columns
+    if column.name not in ("project_id", "focus", "timestamp")
+]
 
 
 class ObservabilityDAO(ObservabilityDAOInterface):
@@ -69,7 +92,7 @@ class ObservabilityDAO(ObservabilityDAOInterface):
         project_id: UUID,
         #
         query_dto: QueryDTO,
-    ) -> Tuple[List[SpanDTO], Optional[int]]:
+    ) -> Tuple[List[SpanDTO], Optional[int], Optional[str]]:
         try:
             async with engine.session() as session:
                 # BASE (SUB-)QUERY
@@ -92,6 +115,23 @@ class ObservabilityDAO(ObservabilityDAOInterface):
                     )
                 # --------
 
+                # RANKING
+                # -> by relevance when searching, unless paginating with cursors,
+                #    hence no cursor is returned for ranked results
+                pagination = query_dto.pagination
+                search = _search(query_dto.filtering)
+                ranking = None
+                # -------
+                if search is not None and not (pagination and pagination.cursor):
+                    ranking = func.ts_rank(
+                        NodesDBE.content_search,
+                        func.websearch_to_tsquery(_SEARCH_CONFIG, search),
+                    ).label("ranking")
+
+                    if grouping_column is not None:
+                        query = query.add_columns(ranking)
+                # -------
+
                 # SCOPING
                 query = query.filter_by(
                     project_id=project_id,
@@ -125,36 +165,65 @@ class ObservabilityDAO(ObservabilityDAOInterface):
                 # ---------
 
                 # SORTING
+                # -> (created_at, key) is unique, hence usable as a cursor
+                key_column = (
+                    grouping_column if grouping_column is not None else NodesDBE.node_id
+                )
+                if ranking is not None:
+                    query = query.order_by(ranking.desc())
+
                 query = query.order_by(
                     NodesDBE.created_at.desc(),
+                    key_column.desc(),
                 )
                 # -------
 
-                # COUNTING // dangerous with large datasets
-                count_query = select(
-                    func.count()  # pylint: disable=E1102:not-callable
-                ).select_from(query.subquery())
+                # COUNTING
+                if query_dto.counting == Counting.EXACT:
+                    # dangerous with large datasets
+                    count_query = select(
+                        func.count()  # pylint: disable=E1102:not-callable
+                    ).select_from(query.subquery())
 
-                count = (await session.execute(count_query)).scalar()
+                    count = (await session.execute(count_query)).scalar()
+                else:
+                    count = await _estimate_count(session, query)
                 # --------
 
                 # PAGINATION
-                pagination = query_dto.pagination
-                # ----------
                 if pagination:
                     query = _chunk(
                         query,
+                        key=key_column,
                         **pagination.model_dump(),
                     )
                 # ----------
 
+                next_cursor = None
+
                 # GROUPING
                 if grouping and grouping_column:
-                    subquery = query.subquery()
+                    groups = (await session.execute(query)).all()
+
+                    if (
+                        ranking is None
+                        and pagination
+                        and pagination.size
+                        and len(groups) == pagination.size
+                    ):
+                        next_cursor = _encode_cursor(
+                            groups[-1].created_at,
+                            groups[-1].grouping_key,
+                        )
 
                     query = select(NodesDBE)
+                    query = query.filter_by(
+                        project_id=project_id,
+                    )
                     query = query.filter(
-                        grouping_column.in_(select(subquery.c["grouping_key"]))
+                        grouping_column.in_(
+                            list({group.grouping_key for group in groups})
+                        )
                     )
 
                     # SORTING
@@ -187,7 +256,19 @@ class ObservabilityDAO(ObservabilityDAOInterface):
                 spans = (await session.execute(query)).scalars().all()
                 # ---------------
 
-            return [map_span_dbe_to_dto(span) for span in spans], count
+                if (
+                    grouping_column is None
+                    and ranking is None
+                    and pagination
+                    and pagination.size
+                    and len(spans) == pagination.size
+                ):
+                    next_cursor = _encode_cursor(
+                        spans[-1].created_at,
+                        spans[-1].node_id,
+                    )
+
+            return [map_span_dbe_to_dto(span) for span in spans], count, next_cursor
 
         except AttributeError as e:
             print_exc()
@@ -261,188 +342,93 @@ class ObservabilityDAO(ObservabilityDAOInterface):
 
                 # ---------
 
-                # BASE QUERY
-                _count = func.count().label("count")  # pylint: disable=not-callable
-                _duration = None
-                _cost = None
-                _tokens = None
-                _timestamp = func.date_bin(
-                    text(f"'{window_text}'"),
-                    NodesDBE.created_at,
-                    oldest,
-                ).label("timestamp")
-                # ----------
-
                 # GROUPING
-                if (
-                    analytics_dto.grouping
+                # node -> all nodes, with their own metrics
+                # tree -> root nodes, with the metrics accumulated over their trees
+                focus = (
+                    "tree"
+                    if analytics_dto.grouping
                     and analytics_dto.grouping.focus.value != "node"
-                ):
-                    _duration = func.sum(
-                        cast(
-                            NodesDBE.metrics["acc.duration.total"],
-                            Numeric,
-                        )
-                    ).label("duration")
-                    _cost = func.sum(
-                        cast(
-                            NodesDBE.metrics["acc.costs.total"],
-                            Numeric,
-                        )
-                    ).label("cost")
-                    _tokens = func.sum(
-                        cast(
-                            NodesDBE.metrics["acc.tokens.total"],
-                            Integer,
-                        )
-                    ).label("tokens")
-                elif not analytics_dto.grouping or (
-                    analytics_dto.grouping
-                    and analytics_dto.grouping.focus.value == "node"
-                ):
-                    _duration = func.sum(
-                        cast(
-                            NodesDBE.metrics["unit.duration.total"],
-                            Numeric,
-                        )
-                    ).label("duration")
-                    _cost = func.sum(
-                        cast(
-                            NodesDBE.metrics["unit.costs.total"],
-                            Numeric,
-                        )
-                    ).label("cost")
-                    _tokens = func.sum(
-                        cast(
-                            NodesDBE.metrics["unit.tokens.total"],
-                            Integer,
-                        )
-                    ).label("tokens")
-                else:
-                    raise ValueError("Unknown grouping focus.")
-                # --------
-
-                # BASE QUERY
-                total_query = select(
-                    _count,
-                    _duration,
-                    _cost,
-                    _tokens,
-                    _timestamp,
-                ).select_from(NodesDBE)
-
-                error_query = select(
-                    _count,
-                    _duration,
-                    _cost,
-                    _tokens,
-                    _timestamp,
-                ).select_from(NodesDBE)
-                # ----------
-
-                # WINDOWING
-                total_query = total_query.filter(
-                    NodesDBE.created_at >= oldest,
-                    NodesDBE.created_at < newest,
-                )
-
-                error_query = error_query.filter(
-                    NodesDBE.created_at >= oldest,
-                    NodesDBE.created_at < newest,
-                )
-                # ---------
-
-                # SCOPING
-                total_query = total_query.filter_by(
-                    project_id=project_id,
+                    else "node"
                 )
+                # --------
 
-                error_query = error_query.filter_by(
-                    project_id=project_id,
-                )
+                # ROLLUPS
+                if not analytics_dto.filtering and _is_minute(oldest, newest):
+                    bucket_dbes = await _query_rollups(
+                        session,
+                        project_id=project_id,
+                        focus=focus,
+                        oldest=oldest,
+                        newest=newest,
+                        window_text=window_text,
+                    )
                 # -------
 
-                # TOTAL vs ERROR
-                error_query = error_query.filter(
-                    NodesDBE.exception.isnot(None),
-                )
-                # ----------------
-
-                # FILTERING
-                filtering = analytics_dto.filtering
-                # ---------
-                if filtering:
-                    operator = filtering.operator
-                    conditions = filtering.conditions
-
-                    total_query = total_query.filter(
-                        _combine(
-                            operator,
-                            _filters(conditions),
-                        )
-                    )
+                else:
+                    # BASE QUERY
+                    # -> totals and errors in a single scan, with conditional aggregates
+                    _timestamp = func.date_bin(
+                        text(f"'{window_text}'"),
+                        NodesDBE.created_at,
+                        oldest,
+                    ).label("timestamp")
 
-                    error_query = error_query.filter(
-                        _combine(
-                            operator,
-                            _filters(conditions),
-                        )
-                    )
-                # ---------
+                    query = select(
+                        *_metrics_aggregates(focus),
+                        _timestamp,
+                    ).select_from(NodesDBE)
+                    # ----------
 
-                # GROUPING
-                if (
-                    analytics_dto.grouping
-                    and analytics_dto.grouping.focus.value != "node"
-                ):
-                    total_query = total_query.filter_by(
-                        parent_id=None,
+                    # WINDOWING
+                    query = query.filter(
+                        NodesDBE.created_at >= oldest,
+                        NodesDBE.created_at < newest,
                     )
+                    # ---------
 
-                    error_query = error_query.filter_by(
-                        parent_id=None,
+                    # SCOPING
+                    query = query.filter_by(
+                        project_id=project_id,
                     )
-                # --------
-
-                # SORTING
-                total_query = total_query.group_by("timestamp")
-
-                error_query = error_query.group_by("timestamp")
-                # -------
+                    # -------
 
-                # DEBUGGING
-                # TODO: HIDE THIS BEFORE RELEASING
-                print(
-                    str(
-                        total_query.compile(
-                            dialect=postgresql.dialect(),
-                            compile_kwargs={"literal_binds": True},
+                    # FILTERING
+                    filtering = analytics_dto.filtering
+                    # ---------
+                    if filtering:
+                        operator = filtering.operator
+                        conditions = filtering.conditions
+
+                        query = query.filter(
+                            _combine(
+                                operator,
+                                _filters(conditions),
+                            )
                         )
-                    )
-                )
-                print("...")
-                print(
-                    str(
-                        error_query.compile(
-                            dialect=postgresql.dialect(),
-                            compile_kwargs={"literal_binds": True},
+                    # ---------
+
+                    # GROUPING
+                    if focus == "tree":
+                        query = query.filter_by(
+                            parent_id=None,
                         )
-                    )
-                )
-                # ---------
+                    # --------
 
-                # QUERY EXECUTION
-                total_bucket_dbes = (await session.execute(total_query)).all()
-                error_bucket_dbes = (await session.execute(error_query)).all()
-                # ---------------
+                    # SORTING
+                    query = query.group_by("timestamp")
+                    # -------
+
+                    # QUERY EXECUTION
+                    bucket_dbes = (await session.execute(query)).all()
+                    # ---------------
 
                 window = _to_minutes(window_text)
 
                 timestamps = _to_timestamps(oldest, newest, window)
 
                 bucket_dtos, count = map_bucket_dbes_to_dtos(
-                    total_bucket_dbes=total_bucket_dbes,
-                    error_bucket_dbes=error_bucket_dbes,
+                    bucket_dbes=bucket_dbes,
                     window=window,
                     timestamps=timestamps,
                 )
@@ -469,6 +455,14 @@ class ObservabilityDAO(ObservabilityDAOInterface):
 
         async with engine.session() as session:
             session.add(span_dbe)
+            await session.flush()
+
+            await _rollup_nodes(
+                session,
+                project_id=project_id,
+                node_ids=[span_dbe.node_id],
+            )
+
             await session.commit()
 
     async def create_many(
@@ -477,17 +471,75 @@ class ObservabilityDAO(ObservabilityDAOInterface):
         project_id: UUID,
         span_dtos: List[SpanDTO],
     ) -> None:
-        span_dbes = [
-            map_span_dto_to_dbe(
+        # Spans are written with Core upserts rather than ORM objects, skipping the
+        # unit of work, and with their JSONB columns already encoded
+        rows = [
+            map_span_dto_to_row(
                 project_id=project_id,
                 span_dto=span_dto,
             )
             for span_dto in span_dtos
         ]
 
+        if not rows:
+            return
+
         async with engine.session() as session:
-            for span_dbe in span_dbes:
-                session.add(span_dbe)
+            # Spans of a tree are written one transaction at a time, so that the spans
+            # that are sent again (e.g. when redelivered) are always seen as existing,
+            # rather than inserted twice or added to the rollups twice. Spans of other
+            # trees (e.g. sent concurrently by other apps) are written concurrently.
+            await _lock_trees(
+                session,
+                project_id=project_id,
+                tree_ids=[row["tree_id"] for row in rows],
+            )
+
+            # Rollups are written once, at the end of the transaction, so that they
+            # are locked in the same order by concurrent transactions
+            rollups: Dict[Tuple[str, datetime], Dict[str, Any]] = {}
+
+            for start in range(0, len(rows), _BULK_INSERT_CHUNK_SIZE):
+                chunk = rows[start : start + _BULK_INSERT_CHUNK_SIZE]
+                node_ids = [row["node_id"] for row in chunk]
+
+                # The existing spans keep their creation time, which is part of the
+                # primary key of the partitioned table
+                existing_created_ats = dict(
+                    (
+                        await session.execute(
+                            select(NodesDBE.node_id, NodesDBE.created_at)
+                            .filter_by(project_id=project_id)
+                            .filter(NodesDBE.node_id.in_(node_ids))
+                        )
+                    ).all()
+                )
+
+                for row in chunk:
+                    if row["node_id"] in existing_created_ats:
+                        row["created_at"] = existing_created_ats[row["node_id"]]
+
+                # The previous metrics of the existing spans are subtracted from the
+                # rollups, and the new metrics of all spans are added to them
+                if existing_created_ats:
+                    await _read_rollups(
+                        session,
+                        rollups,
+                        project_id=project_id,
+                        node_ids=list(existing_created_ats),
+                        sign=-1,
+                    )
+
+                await session.execute(_upsert_nodes_statement(), chunk)
+
+                await _read_rollups(
+                    session,
+                    rollups,
+                    project_id=project_id,
+                    node_ids=node_ids,
+                )
+
+            await _write_rollups(session, rollups, project_id=project_id)
 
             await session.commit()
 
@@ -573,62 +625,597 @@ class ObservabilityDAO(ObservabilityDAOInterface):
         project_id: UUID,
         node_id: UUID,
     ) -> None:
-        span_dbe = await self.read_one(
+        await self.delete_many(
             project_id=project_id,
-            node_id=node_id,
-            to_dto=False,
+            node_ids=[node_id],
         )
 
-        if span_dbe:
-            # COULD BE REPLACED WITH A CASCADE
-            children_dbes = await self.read_children(
-                project_id=project_id,
-                parent_id=node_id,
-                to_dto=False,
+    async def delete_many(
+        self,
+        *,
+        project_id: UUID,
+        node_ids: List[UUID],
+    ) -> None:
+        async with engine.session() as session:
+            # The nodes and all their descendants, in a single recursive query
+            nodes = (
+                select(NodesDBE.node_id)
+                .filter_by(project_id=project_id)
+                .filter(NodesDBE.node_id.in_(node_ids))
+                .cte("descendants", recursive=True)
+            )
+            nodes = nodes.union(
+                select(NodesDBE.node_id)
+                .filter_by(project_id=project_id)
+                .join(nodes, NodesDBE.parent_id == nodes.c.node_id)
             )
 
-            if children_dbes:
-                await self.delete_many(
+            node_ids = (await session.execute(select(nodes.c.node_id))).scalars().all()
+
+            for i in range(0, len(node_ids), _BULK_DELETE_CHUNK_SIZE):
+                await _delete_nodes(
+                    session,
                     project_id=project_id,
-                    node_ids=[child_dbe.node_id for child_dbe in children_dbes],
+                    node_ids=node_ids[i : i + _BULK_DELETE_CHUNK_SIZE],
                 )
-            # --------------------------------
 
-            async with engine.session() as session:
-                await session.delete(span_dbe)
-                await session.commit()
+            await session.commit()
 
-    async def delete_many(
+    async def delete_older(
         self,
         *,
         project_id: UUID,
-        node_ids: List[UUID],
-    ) -> None:
-        span_dbes = await self.read_many(
+        oldest: datetime,
+    ) -> int:
+        count = 0
+
+        while True:
+            # One short transaction per chunk, skipping rows locked by others
+            async with engine.session() as session:
+                query = select(NodesDBE.node_id)
+
+                query = query.filter_by(project_id=project_id)
+                query = query.filter(NodesDBE.created_at < oldest)
+
+                query = query.limit(_BULK_DELETE_CHUNK_SIZE)
+                query = query.with_for_update(skip_locked=True)
+
+                node_ids = (await session.execute(query)).scalars().all()
+
+                if node_ids:
+                    await _delete_nodes(
+                        session,
+                        project_id=project_id,
+                        node_ids=node_ids,
+                    )
+                    await session.commit()
+
+            count += len(node_ids)
+
+            if len(node_ids) < _BULK_DELETE_CHUNK_SIZE:
+                return count
+
+    async def create_partitions(
+        self,
+        *,
+        ahead: int,
+    ) -> List[str]:
+        created = []
+
+        async with engine.session() as session:
+            # Serializes the maintenance of the partitions across replicas
+            await session.execute(select(func.pg_advisory_xact_lock(_PARTITIONS_LOCK)))
+
+            # Blocks the writes to the default partition (but not its reads) until the
+            # partitions are created, so that none of its nodes is left behind
+            await session.execute(
+                text(f"LOCK TABLE {_DEFAULT_PARTITION} IN EXCLUSIVE MODE")
+            )
+
+            partitions = await _read_partitions(session)
+
+            # The nodes written to the default partition, while the partitions of their
+            # weeks were missing, are moved to new partitions of their weeks
+            default_lowers = set(
+                (
+                    await session.execute(
+                        text(
+                            "SELECT DISTINCT date_trunc('week', created_at "
+                            "AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' "
+                            f"FROM {_DEFAULT_PARTITION}"
+                        )
+                    )
+                )
+                .scalars()
+                .all()
+            )
+
+            current = _to_partition_lower(datetime.now(timezone.utc))
+            lowers = default_lowers | {
+                current + week * _PARTITION_INTERVAL for week in range(ahead + 1)
+            }
+
+            for lower in sorted(lowers):
+                upper = lower + _PARTITION_INTERVAL
+
+                if any(
+                    (_lower is None or _lower < upper)
+                    and (_upper is None or _upper > lower)
+                    for _, _lower, _upper in partitions
+                ):
+                    continue
+
+                name = f"{NodesDBE.__tablename__}_p{lower:%Y%m%d}"
+                bounds = (
+                    f"FOR VALUES FROM ('{lower.isoformat()}') "
+                    f"TO ('{upper.isoformat()}')"
+                )
+
+                if lower in default_lowers:
+                    await _move_default_partition(
+                        session,
+                        name=name,
+                        lower=lower,
+                        upper=upper,
+                    )
+                    await session.execute(
+                        text(
+                            f"ALTER TABLE {NodesDBE.__tablename__} "
+                            f"ATTACH PARTITION {name} {bounds}"
+                        )
+                    )
+                else:
+                    await session.execute(
+                        text(
+                            f"CREATE TABLE {name} "
+                            f"PARTITION OF {NodesDBE.__tablename__} {bounds}"
+                        )
+                    )
+
+                created.append(name)
+
+            await session.commit()
+
+        return created
+
+    async def drop_partitions(
+        self,
+        *,
+        oldest: datetime,
+    ) -> List[str]:
+        dropped = []
+
+        async with engine.session() as session:
+            # Serializes the maintenance of the partitions across replicas
+            await session.execute(select(func.pg_advisory_xact_lock(_PARTITIONS_LOCK)))
+
+            partitions = await _read_partitions(session)
+
+            for name, lower, upper in partitions:
+                if upper is None or upper > oldest:
+                    continue
+
+                await session.execute(text(f"DROP TABLE {name}"))
+
+                # The rollups of the dropped nodes, of all projects, go with them
+                query = delete(NodesRollupsDBE)
+
+                query = query.filter(NodesRollupsDBE.timestamp < upper)
+                if lower is not None:
+                    query = query.filter(NodesRollupsDBE.timestamp >= lower)
+
+                await session.execute(query)
+
+                dropped.append(name)
+
+            await session.commit()
+
+        return dropped
+
+
+async def _read_partitions(
+    session,
+) -> List[Tuple[str, Optional[datetime], Optional[datetime]]]:
+    # The partitions of the nodes table, with their bounds (None for MINVALUE/MAXVALUE)
+    rows = (
+        await session.execute(
+            text(
+                "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+                "FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = :table"
+            ),
+            {"table": NodesDBE.__tablename__},
+        )
+    ).all()
+
+    # The default partition has no bounds, and is never created nor dropped
+    return [
+        (name, *_parse_partition_bound(bound))
+        for name, bound in rows
+        if bound != "DEFAULT"
+    ]
+
+
+async def _move_default_partition(
+    session,
+    *,
+    name: str,
+    lower: datetime,
+    upper: datetime,
+) -> None:
+    # Moves the nodes of the default partition within the bounds to a new table, to
+    # be attached as the partition of these bounds
+    columns = ", ".join(_NODES_COLUMNS)
+
+    await session.execute(
+        text(
+            f"CREATE TABLE {name} "
+            f"(LIKE {NodesDBE.__tablename__} INCLUDING DEFAULTS INCLUDING GENERATED)"
+        )
+    )
+    await session.execute(
+        text(
+            f"WITH moved AS ("
+            f"DELETE FROM {_DEFAULT_PARTITION} "
+            f"WHERE created_at >= '{lower.isoformat()}' "
+            f"AND created_at < '{upper.isoformat()}' "
+            f"RETURNING {columns}"
+            f") "
+            f"INSERT INTO {name} ({columns}) SELECT {columns} FROM moved"
+        )
+    )
+
+
+def _parse_partition_bound(
+    bound: str,
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    # FOR VALUES FROM ('2024-11-25 00:00:00+00') TO ('2024-12-02 00:00:00+00')
+    match = _PARTITION_BOUND.match(bound)
+
+    if not match:  # DEFAULT
+        return None, None
+
+    return tuple(
+        None if value in ("MINVALUE", "MAXVALUE") else datetime.fromisoformat(value)
+        for value in (match.group(1).strip("'"), match.group(2).strip("'"))
+    )
+
+
+def _to_partition_lower(timestamp: datetime) -> datetime:
+    # Partitions are weekly, from Monday 00:00 UTC
+    timestamp = timestamp.astimezone(timezone.utc)
+
+    return datetime.combine(
+        timestamp.date() - timedelta(days=timestamp.weekday()),
+        time.min,
+        tzinfo=timezone.utc,
+    )
+
+
+async def _delete_nodes(
+    session,
+    *,
+    project_id: UUID,
+    node_ids: List[UUID],
+) -> None:
+    # Subtracts the metrics of the given nodes from their rollups, then deletes them
+    await _rollup_nodes(
+        session,
+        project_id=project_id,
+        node_ids=node_ids,
+        sign=-1,
+    )
+
+    query = delete(NodesDBE)
+
+    query = query.filter_by(project_id=project_id)
+    query = query.filter(NodesDBE.node_id.in_(node_ids))
+
+    await session.execute(query)
+
+
+def _metrics_aggregates(focus: str, sign: int = 1) -> list:
+    # Totals and errors (with FILTER) of the metrics of the nodes, for each focus:
+    # node -> all nodes, with their own metrics
+    # tree -> root nodes, with the metrics accumulated over their trees
+    prefix = "acc" if focus == "tree" else "unit"
+    is_error = NodesDBE.exception.isnot(None)
+
+    _count = func.count()  # pylint: disable=not-callable
+    _duration = getattr(NodesDBE, f"{prefix}_duration")
+    _cost = getattr(NodesDBE, f"{prefix}_costs")
+    _tokens = getattr(NodesDBE, f"{prefix}_tokens")
+
+    aggregates = {
+        "count": _count,
+        "duration": func.sum(_duration),
+        "cost": func.sum(_cost),
+        "tokens": func.sum(_tokens),
+        "error_count": _count.filter(is_error),
+        "error_duration": func.sum(_duration).filter(is_error),
+        "error_cost": func.sum(_cost).filter(is_error),
+        "error_tokens": func.sum(_tokens).filter(is_error),
+    }
+
+    return [
+        (aggregate if sign == 1 else sign * aggregate).label(name)
+        for name, aggregate in aggregates.items()
+    ]
+
+
+async def _lock_trees(
+    session,
+    *,
+    project_id: UUID,
+    tree_ids: List[UUID],
+) -> None:
+    # Locks the given trees of a project until the end of the transaction, or the whole
+    # project when there are too many trees. Tree locks hold the project lock shared,
+    # so that they exclude the project lock, and are taken in the same order.
+    project_key = str(project_id)
+    tree_keys = sorted({f"{project_id}:{tree_id}" for tree_id in tree_ids})
+
+    if len(tree_keys) > _INGESTION_TREE_LOCKS:
+        await session.execute(
+            select(
+                func.pg_advisory_xact_lock(
+                    func.hashtextextended(project_key, _INGESTION_LOCK)
+                )
+            )
+        )
+        return
+
+    await session.execute(
+        select(
+            func.pg_advisory_xact_lock_shared(
+                func.hashtextextended(project_key, _INGESTION_LOCK)
+            )
+        )
+    )
+    for tree_key in tree_keys:
+        await session.execute(
+            select(
+                func.pg_advisory_xact_lock(
+                    func.hashtextextended(tree_key, _INGESTION_LOCK)
+                )
+            )
+        )
+
+
+def _rollups_query(
+    *,
+    project_id: UUID,
+    node_ids: List[UUID],
+    focus: str,
+    sign: int = 1,
+):
+    # Metrics of the given nodes, per minute, as rows of the rollups of the focus
+    _minute = func.date_trunc(literal_column("'minute'"), NodesDBE.created_at)
+
+    query = select(
+        NodesDBE.project_id,
+        literal_column(f"'{focus}'").label("focus"),
+        _minute.label("timestamp"),
+        *_metrics_aggregates(focus, sign),
+    )
+    query = query.filter_by(project_id=project_id)
+    query = query.filter(NodesDBE.node_id.in_(node_ids))
+    if focus == "tree":
+        query = query.filter(NodesDBE.parent_id.is_(None))
+    # Rollups are always locked in the same order, to avoid deadlocks
+    query = query.group_by(NodesDBE.project_id, "timestamp").order_by("timestamp")
+
+    return query
+
+
+def _upsert_rollups_statement(statement):
+    # Adds the metrics of the inserted rows to the existing rollups
+    table = NodesRollupsDBE.__table__
+
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.project_id, table.c.focus, table.c.timestamp],
+        set_={
+            column: func.coalesce(table.c[column], 0)
+            + func.coalesce(statement.excluded[column], 0)
+            for column in _ROLLUPS_METRICS
+        },
+    )
+
+
+async def _rollup_nodes(
+    session,
+    *,
+    project_id: UUID,
+    node_ids: List[UUID],
+    sign: int = 1,
+) -> None:
+    # Adds (or subtracts) the metrics of the given nodes to their per-minute rollups
+    table = NodesRollupsDBE.__table__
+
+    for focus in ("node", "tree"):
+        query = _rollups_query(
             project_id=project_id,
             node_ids=node_ids,
-            to_dto=False,
+            focus=focus,
+            sign=sign,
         )
 
-        if span_dbes:
-            for span_dbe in span_dbes:
-                # COULD BE REPLACED WITH A CASCADE
-                children_dbes = await self.read_children(
-                    project_id=project_id,
-                    parent_id=span_dbe.node_id,
-                    to_dto=False,
-                )
+        columns = [column.name for column in query.selected_columns]
+        statement = postgresql.insert(table).from_select(columns, query)
 
-                if children_dbes:
-                    await self.delete_many(
-                        project_id=project_id,
-                        node_ids=[child_dbe.node_id for child_dbe in children_dbes],
-                    )
-                # --------------------------------
+        await session.execute(_upsert_rollups_statement(statement))
 
-                async with engine.session() as session:
-                    await session.delete(span_dbe)
-                    await session.commit()
+
+async def _read_rollups(
+    session,
+    rollups: Dict[Tuple[str, datetime], Dict[str, Any]],
+    *,
+    project_id: UUID,
+    node_ids: List[UUID],
+    sign: int = 1,
+) -> None:
+    # Adds (or subtracts) the metrics of the given nodes to the pending rollups, by
+    # (focus, minute), to be written with _write_rollups
+    for focus in ("node", "tree"):
+        query = _rollups_query(
+            project_id=project_id,
+            node_ids=node_ids,
+            focus=focus,
+            sign=sign,
+        )
+
+        for row in (await session.execute(query)).mappings().all():
+            rollup = rollups.setdefault((row["focus"], row["timestamp"]), {})
+            for column in _ROLLUPS_METRICS:
+                if row[column] is not None:
+                    rollup[column] = (rollup.get(column) or 0) + row[column]
+
+
+async def _write_rollups(
+    session,
+    rollups: Dict[Tuple[str, datetime], Dict[str, Any]],
+    *,
+    project_id: UUID,
+) -> None:
+    # Adds the pending rollups to the per-minute rollups, in one statement locking the
+    # rollups in the same order as _rollup_nodes
+    if not rollups:
+        return
+
+    values = [
+        {
+            "project_id": project_id,
+            "focus": focus,
+            "timestamp": timestamp,
+            **{
+                column: rollups[(focus, timestamp)].get(column)
+                for column in _ROLLUPS_METRICS
+            },
+        }
+        for focus, timestamp in sorted(rollups)
+    ]
+    statement = postgresql.insert(NodesRollupsDBE.__table__).values(values)
+
+    await session.execute(_upsert_rollups_statement(statement))
+
+
+async def _query_rollups(
+    session,
+    *,
+    project_id: UUID,
+    focus: str,
+    oldest: datetime,
+    newest: datetime,
+    window_text: str,
+) -> list:
+    # grouped by expression, since "timestamp" is also a column of the rollups
+    _timestamp = func.date_bin(
+        text(f"'{window_text}'"),
+        NodesRollupsDBE.timestamp,
+        oldest,
+    )
+
+    query = select(
+        *[
+            (
+                cast(func.sum(column), BigInteger)
+                if isinstance(column.type, BigInteger)
+                else func.sum(column)
+            ).label(column.name)
+            for column in NodesRollupsDBE.__table__.columns
+            if column.name not in ("project_id", "focus", "timestamp")
+        ],
+        _timestamp.label("timestamp"),
+    )
+    query = query.filter_by(project_id=project_id, focus=focus)
+    query = query.filter(
+        NodesRollupsDBE.timestamp >= oldest,
+        NodesRollupsDBE.timestamp < newest,
+    )
+    query = query.group_by(_timestamp)
+    # Buckets without nodes are left out, as with raw nodes
+    query = query.having(func.sum(NodesRollupsDBE.count) > 0)
+
+    return (await session.execute(query)).all()
+
+
+def _is_minute(*timestamps: datetime) -> bool:
+    # Rollups serve windows bounded by whole minutes only
+    return all(
+        timestamp.second == 0 and timestamp.microsecond == 0 for timestamp in timestamps
+    )
+
+
+def _upsert_nodes_statement():
+    # INSERT ... ON CONFLICT (project_id, node_id) DO UPDATE, executed once per row of
+    # parameters. JSONB columns are bound as text and cast, since they are encoded.
+    table = NodesDBE.__table__
+
+    values = {}
+    for column in table.columns:
+        if column.computed is not None:
+            continue
+        elif isinstance(column.type, JSONB):
+            values[column.name] = cast(bindparam(column.name, type_=String), JSONB)
+        elif column.name == "created_at":
+            values[column.name] = func.coalesce(
+                bindparam(column.name, type_=column.type),
+                func.current_timestamp(),
+            )
+        else:
+            values[column.name] = bindparam(column.name, type_=column.type)
+
+    statement = postgresql.insert(table).values(values)
+
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.project_id, table.c.node_id, table.c.created_at],
+        set_={
+            column.name: statement.excluded[column.name]
+            for column in table.columns
+            if column.name not in ("project_id", "node_id", "created_at")
+            and column.computed is None
+        },
+    )
+
+
+def _encode_cursor(created_at: datetime, key: UUID) -> str:
+    return urlsafe_b64encode(
+        dumps([created_at.isoformat(), str(key)]).encode()
+    ).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        created_at, key = loads(urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), UUID(key)
+    except (ValueError, TypeError) as e:
+        raise FilteringException("Invalid cursor.") from e
+
+
+async def _estimate_count(session, query: select) -> Optional[int]:
+    # The number of rows expected by the planner, from the table statistics
+    explain_query = "EXPLAIN (FORMAT JSON) " + str(
+        query.compile(
+            dialect=postgresql.dialect(),
+            compile_kwargs={"literal_binds": True},
+        )
+    )
+
+    try:
+        # in a savepoint, so that a failure does not abort the transaction
+        async with session.begin_nested():
+            connection = await session.connection()
+            plan = (await connection.exec_driver_sql(explain_query)).scalar()
+    except Exception:  # pylint: disable=broad-except
+        print_exc()
+        return None
+
+    if isinstance(plan, str):
+        plan = loads(plan)
+
+    return int(plan[0]["Plan"]["Plan Rows"])
 
 
 def _chunk(
@@ -637,10 +1224,25 @@ def _chunk(
     size: Optional[int] = None,
     next: Optional[datetime] = None,  # pylint: disable=W0621:redefined-builtin
     stop: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    key: Column = NodesDBE.node_id,
 ) -> select:
+    # 0. WHERE (created_at, key) < cursor LIMIT size
+    # -> stable thanks to the unique (created_at, key) order
+    if cursor:
+        cursor_created_at, cursor_key = _decode_cursor(cursor)
+
+        query = query.filter(
+            tuple_(NodesDBE.created_at, key) < tuple_(cursor_created_at, cursor_key)
+        )
+        if stop:
+            query = query.filter(NodesDBE.created_at >= stop)
+        if size:
+            query = query.limit(size)
+
     # 1. LIMIT size OFFSET (page - 1) * size
     # -> unstable if windowing.newest is not set
-    if page and size:
+    elif page and size:
         limit = size
         offset = (page - 1) * size
 
@@ -700,6 +1302,17 @@ _FLAT_KEYS = {
     "node.type": "node_type",
     "node.name": "node_name",
     "parent.id": "parent_id",
+    # TYPED KEYS
+    "metrics.unit.duration.total": "unit_duration",
+    "metrics.unit.costs.total": "unit_costs",
+    "metrics.unit.tokens.total": "unit_tokens",
+    "metrics.acc.duration.total": "acc_duration",
+    "metrics.acc.costs.total": "acc_costs",
+    "metrics.acc.tokens.total": "acc_tokens",
+    "refs.application.id": "application_id",
+    "refs.variant.id": "variant_id",
+    "refs.environment.slug": "environment_slug",
+    "status.code": "status_code",
 }
 
 _NESTED_FIELDS = ("data",)
@@ -800,6 +1413,17 @@ def _filters(filtering: FilteringDTO) -> list:
                     _conditions.append(attribute.contains(value))
                 elif condition.operator == StringOperator.LIKE:
                     _conditions.append(attribute.like(value))
+                elif condition.operator == StringOperator.SEARCH:
+                    if attribute is NodesDBE.content:
+                        document = NodesDBE.content_search
+                    else:
+                        document = func.to_tsvector(_SEARCH_CONFIG, attribute)
+
+                    _conditions.append(
+                        document.op("@@")(
+                            func.websearch_to_tsquery(_SEARCH_CONFIG, value)
+                        )
+                    )
                 elif condition.operator == StringOperator.MATCHES:
                     if condition.options:
                         case_sensitive = condition.options.case_sensitive
@@ -835,6 +1459,27 @@ def _filters(filtering: FilteringDTO) -> list:
     return _conditions
 
 
+def _search(filtering: Optional[FilteringDTO]) -> Optional[str]:
+    # The terms of the first search on the content, used to rank the results
+    if filtering is None:
+        return None
+
+    for condition in filtering.conditions:
+        if isinstance(condition, FilteringDTO):
+            search = _search(condition)
+            if search is not None:
+                return search
+
+        elif (
+            isinstance(condition, ConditionDTO)
+            and condition.key == "content"
+            and condition.operator == StringOperator.SEARCH
+        ):
+            return condition.value
+
+    return None
+
+
 def _to_minutes(
     window_text: str,
 ) -> int:
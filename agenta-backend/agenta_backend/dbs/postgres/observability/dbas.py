@@ -1,5 +1,7 @@
 from sqlalchemy import Column, UUID, TIMESTAMP, Enum as SQLEnum, String
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import BigInteger, Numeric, Computed
+from sqlalchemy.orm import mapped_column
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 
 from agenta_backend.core.observability.dtos import TreeType, NodeType
 
@@ -55,6 +57,47 @@ class AttributesDBA:
     refs = Column(JSONB(none_as_null=True), nullable=True)
 
 
+def _number(field: str, key: str, integer: bool = False) -> Computed:
+    # JSON numbers only, so that malformed metrics never fail an insert
+    return Computed(
+        f"CASE WHEN jsonb_typeof({field} -> '{key}') = 'number'"
+        f" THEN ({field} ->> '{key}')::numeric{'::bigint' if integer else ''} END",
+        persisted=True,
+    )
+
+
+def _uuid(field: str, key: str) -> Computed:
+    # UUIDs only, so that malformed references never fail an insert
+    return Computed(
+        f"CASE WHEN ({field} ->> '{key}') ~* '^[0-9a-f]{{8}}-?[0-9a-f]{{4}}-?"
+        f"[0-9a-f]{{4}}-?[0-9a-f]{{4}}-?[0-9a-f]{{12}}$'"
+        f" THEN ({field} ->> '{key}')::uuid END",
+        persisted=True,
+    )
+
+
+def _text(field: str, key: str) -> Computed:
+    return Computed(f"{field} ->> '{key}'", persisted=True)
+
+
+class TypedAttributesDBA:
+    __abstract__ = True
+
+    # Generated from the JSONB columns, to filter and aggregate without casts
+    unit_duration = Column(Numeric, _number("metrics", "unit.duration.total"))
+    unit_costs = Column(Numeric, _number("metrics", "unit.costs.total"))
+    unit_tokens = Column(BigInteger, _number("metrics", "unit.tokens.total", True))
+    acc_duration = Column(Numeric, _number("metrics", "acc.duration.total"))
+    acc_costs = Column(Numeric, _number("metrics", "acc.costs.total"))
+    acc_tokens = Column(BigInteger, _number("metrics", "acc.tokens.total", True))
+
+    application_id = Column(UUID(as_uuid=True), _uuid("refs", "application.id"))
+    variant_id = Column(UUID(as_uuid=True), _uuid("refs", "variant.id"))
+    environment_slug = Column(String, _text("refs", "environment.slug"))
+
+    status_code = Column(String, _text("status", "code"))
+
+
 class EventsDBA:
     __abstract__ = True
 
@@ -71,6 +114,17 @@ class FullTextSearchDBA:
     __abstract__ = True
 
     content = Column(String, nullable=True)
+    # Generated from the content, truncated to stay below the 1MB limit of tsvectors,
+    # and deferred since only used for searching and ranking
+    content_search = mapped_column(
+        TSVECTOR,
+        Computed(
+            "to_tsvector('simple'::regconfig, left(coalesce(content, ''), 262144))",
+            persisted=True,
+        ),
+        nullable=True,
+        deferred=True,
+    )
 
 
 class OTelDBA:
@@ -89,9 +143,39 @@ class SpanDBA(
     TimeDBA,
     StatusDBA,
     AttributesDBA,
+    TypedAttributesDBA,
     EventsDBA,
     LinksDBA,
     FullTextSearchDBA,
     OTelDBA,
 ):
     __abstract__ = True
+
+
+class RollupDBA:
+    __abstract__ = True
+
+    focus = Column(String, nullable=False)
+    timestamp = Column(TIMESTAMP(timezone=True), nullable=False)
+
+
+class RollupMetricsDBA:
+    __abstract__ = True
+
+    count = Column(BigInteger, nullable=False, default=0)
+    duration = Column(Numeric, nullable=True)
+    cost = Column(Numeric, nullable=True)
+    tokens = Column(BigInteger, nullable=True)
+
+    error_count = Column(BigInteger, nullable=False, default=0)
+    error_duration = Column(Numeric, nullable=True)
+    error_cost = Column(Numeric, nullable=True)
+    error_tokens = Column(BigInteger, nullable=True)
+
+
+class NodesRollupDBA(
+    ProjectScopeDBA,
+    RollupDBA,
+    RollupMetricsDBA,
+):
+    __abstract__ = True
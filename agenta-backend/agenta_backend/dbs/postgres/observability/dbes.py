@@ -2,7 +2,7 @@ from sqlalchemy import PrimaryKeyConstraint, Index
 
 
 from agenta_backend.dbs.postgres.shared.base import Base
-from agenta_backend.dbs.postgres.observability.dbas import SpanDBA
+from agenta_backend.dbs.postgres.observability.dbas import SpanDBA, NodesRollupDBA
 
 
 class NodesDBE(Base, SpanDBA):
@@ -12,7 +12,8 @@ class NodesDBE(Base, SpanDBA):
         PrimaryKeyConstraint(
             "project_id",
             "node_id",
-        ),  # focus = node
+            "created_at",
+        ),  # focus = node, and partitioning
         Index(
             "index_project_id_tree_id",
             "project_id",
@@ -23,9 +24,69 @@ class NodesDBE(Base, SpanDBA):
             "project_id",
             "root_id",
         ),  # focus = root
+        Index(
+            "index_project_id_parent_id",
+            "project_id",
+            "parent_id",
+        ),  # descendants
         Index(
             "index_project_id_node_id",
             "project_id",
             "created_at",
+            "node_id",
         ),  # sorting and pagination
+        Index(
+            "index_project_id_application_id",
+            "project_id",
+            "application_id",
+            "created_at",
+        ),  # filtering
+        Index(
+            "index_project_id_variant_id",
+            "project_id",
+            "variant_id",
+            "created_at",
+        ),  # filtering
+        Index(
+            "index_project_id_environment_slug",
+            "project_id",
+            "environment_slug",
+            "created_at",
+        ),  # filtering
+        Index(
+            "index_project_id_status_code",
+            "project_id",
+            "status_code",
+            "created_at",
+        ),  # filtering
+        Index(
+            "index_project_id_acc_costs",
+            "project_id",
+            "acc_costs",
+        ),  # filtering
+        Index(
+            "index_project_id_acc_duration",
+            "project_id",
+            "acc_duration",
+        ),  # filtering
+        Index(
+            "index_content_search",
+            "content_search",
+            postgresql_using="gin",
+        ),  # searching
+        {
+            "postgresql_partition_by": "RANGE (created_at)",
+        },  # partitioning, see ObservabilityDAO.create_partitions()
+    )
+
+
+class NodesRollupsDBE(Base, NodesRollupDBA):
+    __tablename__ = "nodes_rollups"
+
+    __table_args__ = (
+        PrimaryKeyConstraint(
+            "project_id",
+            "focus",
+            "timestamp",
+        ),  # focus = node | tree, timestamp = minute
     )
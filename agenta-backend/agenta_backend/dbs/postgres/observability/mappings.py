@@ -1,7 +1,9 @@
-from typing import List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional
 from json import dumps, loads
 from datetime import datetime
 
+from pydantic_core import to_json
+
 from agenta_backend.core.shared.dtos import LifecycleDTO
 from agenta_backend.core.observability.dtos import (
     RootDTO,
@@ -131,9 +133,74 @@ def map_span_dto_to_dbe(
     return span_dbe
 
 
+def _to_jsonb(value: Any) -> Optional[str]:
+    return to_json(value).decode() if value is not None else None
+
+
+def map_span_dto_to_row(
+    project_id: str,
+    span_dto: SpanDTO,
+) -> Dict[str, Any]:
+    """
+    Maps a span to the parameters of a bulk insert into the nodes table, with the JSONB
+    columns already encoded to JSON, once.
+    """
+
+    data = _to_jsonb(span_dto.data)
+
+    return {
+        # SCOPE
+        "project_id": project_id,
+        # LIFECYCLE
+        "created_at": span_dto.lifecycle.created_at if span_dto.lifecycle else None,
+        "updated_at": span_dto.lifecycle.updated_at if span_dto.lifecycle else None,
+        "updated_by_id": (
+            span_dto.lifecycle.updated_by_id if span_dto.lifecycle else None
+        ),
+        # ROOT
+        "root_id": span_dto.root.id,
+        # TREE
+        "tree_id": span_dto.tree.id,
+        "tree_type": span_dto.tree.type,
+        # NODE
+        "node_id": span_dto.node.id,
+        "node_type": span_dto.node.type,
+        "node_name": span_dto.node.name,
+        # PARENT
+        "parent_id": span_dto.parent.id if span_dto.parent else None,
+        # TIME
+        "time_start": span_dto.time.start,
+        "time_end": span_dto.time.end,
+        # STATUS
+        "status": (
+            _to_jsonb(span_dto.status.model_dump(exclude_none=True))
+            if span_dto.status
+            else None
+        ),
+        # ATTRIBUTES
+        "data": data,
+        "metrics": _to_jsonb(span_dto.metrics),
+        "meta": _to_jsonb(span_dto.meta),
+        "refs": _to_jsonb(span_dto.refs),
+        # EVENTS
+        "exception": (
+            span_dto.exception.model_dump_json() if span_dto.exception else None
+        ),
+        # LINKS
+        "links": (
+            "[" + ",".join(link.model_dump_json() for link in span_dto.links) + "]"
+            if span_dto.links
+            else None
+        ),
+        # FULL TEXT SEARCH
+        "content": data if data is not None else "null",
+        # OTEL
+        "otel": span_dto.otel.model_dump_json() if span_dto.otel else None,
+    }
+
+
 def map_bucket_dbes_to_dtos(
-    total_bucket_dbes: List[NodesDBE],
-    error_bucket_dbes: List[NodesDBE],
+    bucket_dbes: List[NodesDBE],
     window: int,
     timestamps: Optional[List[datetime]] = None,
 ) -> Tuple[List[BucketDTO], int]:
@@ -144,17 +211,18 @@ def map_bucket_dbes_to_dtos(
             cost=bucket.cost,
             tokens=bucket.tokens,
         )
-        for bucket in total_bucket_dbes
+        for bucket in bucket_dbes
     }
 
     error_metrics = {
         bucket.timestamp: MetricsDTO(
-            count=bucket.count,
-            duration=bucket.duration,
-            cost=bucket.cost,
-            tokens=bucket.tokens,
+            count=bucket.error_count,
+            duration=bucket.error_duration,
+            cost=bucket.error_cost,
+            tokens=bucket.error_tokens,
         )
-        for bucket in error_bucket_dbes
+        for bucket in bucket_dbes
+        if bucket.error_count
     }
 
     total_timestamps = timestamps
@@ -0,0 +1,149 @@
+import os
+import logging
+from typing import List, Tuple
+from uuid import UUID
+
+import redis.asyncio as redis
+from redis.exceptions import ResponseError
+
+from agenta_backend.core.observability.interfaces import ObservabilityQueueInterface
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+OTLP_STREAM_KEY = "observability:otlp"
+OTLP_CONSUMER_GROUP = "observability-ingestors"
+
+# Payloads that are not acknowledged within the visibility timeout (e.g. because the
+# worker died) are redelivered, at most OTLP_MAX_DELIVERIES times
+OTLP_VISIBILITY_TIMEOUT_MS = int(
+    os.environ.get("AGENTA_OTLP_VISIBILITY_TIMEOUT_MS", 60000)
+)
+OTLP_MAX_DELIVERIES = int(os.environ.get("AGENTA_OTLP_MAX_DELIVERIES", 5))
+OTLP_BLOCK_MS = 5000
+
+
+class RedisObservabilityQueue(ObservabilityQueueInterface):
+    """
+    Durable ingestion queue backed by a Redis stream and a consumer group.
+
+    Acknowledged payloads are deleted from the stream, so that its length is the
+    number of payloads that are not ingested yet.
+    """
+
+    def __init__(self, url: str = os.environ.get("REDIS_URL", "")):
+        self.client = redis.from_url(url=url)
+        self.group_created = False
+
+    async def _ensure_group(self) -> None:
+        if self.group_created:
+            return
+
+        try:
+            await self.client.xgroup_create(
+                OTLP_STREAM_KEY, OTLP_CONSUMER_GROUP, id="0", mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+        self.group_created = True
+
+    async def enqueue(
+        self,
+        *,
+        project_id: UUID,
+        otlp_stream: bytes,
+    ) -> None:
+        await self.client.xadd(
+            OTLP_STREAM_KEY,
+            {"project_id": str(project_id), "otlp_stream": otlp_stream},
+        )
+
+    async def dequeue(
+        self,
+        *,
+        consumer: str,
+        count: int,
+    ) -> List[Tuple[str, UUID, bytes]]:
+        await self._ensure_group()
+
+        # Reclaim the payloads of the consumers that did not acknowledge them in time
+        _, entries, *_ = await self.client.xautoclaim(
+            OTLP_STREAM_KEY,
+            OTLP_CONSUMER_GROUP,
+            consumer,
+            min_idle_time=OTLP_VISIBILITY_TIMEOUT_MS,
+            count=count,
+        )
+        if entries:
+            entries = await self._drop_undeliverable(entries)
+
+        if not entries:
+            response = await self.client.xreadgroup(
+                OTLP_CONSUMER_GROUP,
+                consumer,
+                {OTLP_STREAM_KEY: ">"},
+                count=count,
+                block=OTLP_BLOCK_MS,
+            )
+            entries = response[0][1] if response else []
+
+        return [
+            (
+                message_id.decode(),
+                UUID(fields[b"project_id"].decode()),
+                fields[b"otlp_stream"],
+            )
+            for message_id, fields in entries
+            if fields  # deleted while pending
+        ]
+
+    async def _drop_undeliverable(self, entries: List) -> List:
+        pending = await self.client.xpending_range(
+            OTLP_STREAM_KEY,
+            OTLP_CONSUMER_GROUP,
+            min=entries[0][0],
+            max=entries[-1][0],
+            count=len(entries),
+        )
+        undeliverable = {
+            message["message_id"]
+            for message in pending
+            if message["times_delivered"] > OTLP_MAX_DELIVERIES
+        }
+        if undeliverable:
+            logger.error(
+                f"Dropping {len(undeliverable)} OTLP payloads delivered more than "
+                f"{OTLP_MAX_DELIVERIES} times"
+            )
+            await self.ack(
+                message_ids=[message_id.decode() for message_id in undeliverable]
+            )
+
+        return [entry for entry in entries if entry[0] not in undeliverable]
+
+    async def ack(
+        self,
+        *,
+        message_ids: List[str],
+    ) -> None:
+        if not message_ids:
+            return
+
+        pipeline = self.client.pipeline()
+        pipeline.xack(OTLP_STREAM_KEY, OTLP_CONSUMER_GROUP, *message_ids)
+        pipeline.xdel(OTLP_STREAM_KEY, *message_ids)
+        await pipeline.execute()
+
+    async def nack(
+        self,
+        *,
+        message_ids: List[str],
+    ) -> None:
+        # Unacknowledged payloads are reclaimed after the visibility timeout
+        pass
+
+    async def size(self) -> int:
+        return await self.client.xlen(OTLP_STREAM_KEY)
@@ -1,3 +1,4 @@
+import os
 from contextlib import asynccontextmanager
 
 from agenta_backend import celery_config
@@ -38,6 +39,8 @@ from celery import Celery
 from agenta_backend.dbs.postgres.observability.dao import ObservabilityDAO
 from agenta_backend.core.observability.service import ObservabilityService
 from agenta_backend.apis.fastapi.observability.router import ObservabilityRouter
+from agenta_backend.core.observability.ingestion import LocalObservabilityQueue
+from agenta_backend.core.observability.retention import ObservabilityRetention
 
 
 origins = [
@@ -71,8 +74,18 @@ async def lifespan(application: FastAPI, cache=True):
     if await check_if_templates_table_exist():
         await templates_manager.update_and_sync_templates(cache=cache)
 
+    await observability_retention.start()
+
+    if observability.ingestor:
+        await observability.ingestor.start()
+
     yield
 
+    if observability.ingestor:
+        await observability.ingestor.stop()
+
+    await observability_retention.stop()
+
 
 app = FastAPI(lifespan=lifespan, openapi_tags=open_api_tags_metadata)
 
@@ -136,9 +149,30 @@ if isCloudEE():
 
     observability_legacy_receiver = cloud.observability_legacy_receiver
 
+# OTLP ingestion: "redis" (default when Redis is configured) and "local" queue the
+# received traces and ingest them in the background, "sync" ingests them in the request
+observability_queue = None
+otlp_ingestion_queue = os.environ.get(
+    "AGENTA_OTLP_INGESTION_QUEUE", "redis" if os.environ.get("REDIS_URL") else "sync"
+)
+if otlp_ingestion_queue == "redis":
+    from agenta_backend.dbs.redis.observability.queue import RedisObservabilityQueue
+
+    observability_queue = RedisObservabilityQueue()
+elif otlp_ingestion_queue == "local":
+    observability_queue = LocalObservabilityQueue()
+
+observability_service = ObservabilityService(ObservabilityDAO())
+
+# Partitions of the nodes, created ahead of time and dropped after their retention
+observability_retention = ObservabilityRetention(
+    observability_service=observability_service,
+)
+
 observability = ObservabilityRouter(
-    ObservabilityService(ObservabilityDAO()),
+    observability_service,
     observability_legacy_receiver=observability_legacy_receiver,
+    observability_queue=observability_queue,
 )
 
 app.include_router(
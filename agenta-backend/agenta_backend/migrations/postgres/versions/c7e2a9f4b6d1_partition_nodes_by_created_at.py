@@ -0,0 +1,141 @@
+"""Partitioned the 'nodes' table by 'created_at'
+
+Revision ID: c7e2a9f4b6d1
+Revises: b5d1f7a3c8e2
+Create Date: 2024-11-28 16:24:08.947316
+
+"""
+
+from datetime import timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c7e2a9f4b6d1"
+down_revision: Union[str, None] = "b5d1f7a3c8e2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("index_project_id_tree_id", ["project_id", "tree_id"], "btree"),
+    ("index_project_id_root_id", ["project_id", "root_id"], "btree"),
+    ("index_project_id_parent_id", ["project_id", "parent_id"], "btree"),
+    ("index_project_id_node_id", ["project_id", "created_at", "node_id"], "btree"),
+    (
+        "index_project_id_application_id",
+        ["project_id", "application_id", "created_at"],
+        "btree",
+    ),
+    (
+        "index_project_id_variant_id",
+        ["project_id", "variant_id", "created_at"],
+        "btree",
+    ),
+    (
+        "index_project_id_environment_slug",
+        ["project_id", "environment_slug", "created_at"],
+        "btree",
+    ),
+    (
+        "index_project_id_status_code",
+        ["project_id", "status_code", "created_at"],
+        "btree",
+    ),
+    ("index_project_id_acc_costs", ["project_id", "acc_costs"], "btree"),
+    ("index_project_id_acc_duration", ["project_id", "acc_duration"], "btree"),
+    ("index_content_search", ["content_search"], "gin"),
+]
+
+COLUMNS = (
+    "project_id, created_at, updated_at, updated_by_id, root_id, tree_id, tree_type, "
+    "node_id, node_name, node_type, parent_id, time_start, time_end, status, data, "
+    "metrics, meta, refs, exception, links, content, otel"
+)
+
+PARTITIONS_AHEAD = 4  # weeks
+
+
+def upgrade() -> None:
+    # The existing table becomes the first partition, 'nodes_legacy', covering all
+    # nodes created before the next week. Its indexes are kept and attached to those
+    # of the partitioned table, so that only its primary key is rebuilt, and it is
+    # dropped as a whole once older than the retention.
+    op.execute("ALTER TABLE nodes RENAME TO nodes_legacy")
+    for name, _, _ in INDEXES:
+        op.execute(f"ALTER INDEX {name} RENAME TO nodes_legacy_{name}")
+
+    op.execute(
+        "CREATE UNIQUE INDEX nodes_legacy_pkey_partitioned "
+        "ON nodes_legacy (project_id, node_id, created_at)"
+    )
+    op.execute("ALTER TABLE nodes_legacy DROP CONSTRAINT nodes_pkey")
+    op.execute(
+        "ALTER TABLE nodes_legacy ADD CONSTRAINT nodes_legacy_pkey "
+        "PRIMARY KEY USING INDEX nodes_legacy_pkey_partitioned"
+    )
+
+    op.execute(
+        "CREATE TABLE nodes "
+        "(LIKE nodes_legacy INCLUDING DEFAULTS INCLUDING GENERATED) "
+        "PARTITION BY RANGE (created_at)"
+    )
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_primary_key(
+        "nodes_pkey", "nodes", ["project_id", "node_id", "created_at"]
+    )
+    for name, columns, using in INDEXES:
+        op.create_index(name, "nodes", columns, unique=False, postgresql_using=using)
+    # ### end Alembic commands ###
+
+    boundary = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT (date_trunc('week', greatest(max(created_at), now()) "
+                "AT TIME ZONE 'UTC') AT TIME ZONE 'UTC') + interval '1 week' "
+                "FROM nodes_legacy"
+            )
+        )
+        .scalar()
+    )
+
+    # Validated with a single scan of the legacy table
+    op.execute(
+        "ALTER TABLE nodes ATTACH PARTITION nodes_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{boundary.isoformat()}')"
+    )
+
+    # The next partitions are then created ahead of time by the backend
+    for week in range(PARTITIONS_AHEAD):
+        lower = boundary + timedelta(weeks=week)
+        upper = lower + timedelta(weeks=1)
+
+        op.execute(
+            f"CREATE TABLE nodes_p{lower:%Y%m%d} PARTITION OF nodes "
+            f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+
+
+def downgrade() -> None:
+    # The nodes of all partitions are moved back to the legacy partition, which must
+    # not have been dropped by the retention
+    op.execute("ALTER TABLE nodes DETACH PARTITION nodes_legacy")
+    op.execute(
+        f"INSERT INTO nodes_legacy ({COLUMNS}) "
+        f"SELECT {COLUMNS} FROM nodes "
+        "ON CONFLICT DO NOTHING"
+    )
+    op.execute("DROP TABLE nodes")
+
+    op.execute("ALTER TABLE nodes_legacy DROP CONSTRAINT nodes_legacy_pkey")
+    op.execute("ALTER TABLE nodes_legacy RENAME TO nodes")
+    op.execute(
+        "ALTER TABLE nodes ADD CONSTRAINT nodes_pkey PRIMARY KEY (project_id, node_id)"
+    )
+    for name, _, _ in INDEXES:
+        op.execute(f"ALTER INDEX nodes_legacy_{name} RENAME TO {name}")
@@ -0,0 +1,90 @@
+"""Added typed, indexed columns for the hot attributes of the 'nodes' table
+
+Revision ID: f2a9c4d7e1b3
+Revises: e1f6b3a9c2d5
+Create Date: 2024-11-25 11:18:36.402817
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2a9c4d7e1b3"
+down_revision: Union[str, None] = "e1f6b3a9c2d5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_UUID_PATTERN = "'^[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}$'"
+
+
+def _number(field: str, key: str, integer: bool = False) -> sa.Computed:
+    return sa.Computed(
+        f"CASE WHEN jsonb_typeof({field} -> '{key}') = 'number'"
+        f" THEN ({field} ->> '{key}')::numeric{'::bigint' if integer else ''} END",
+        persisted=True,
+    )
+
+
+def _uuid(field: str, key: str) -> sa.Computed:
+    return sa.Computed(
+        f"CASE WHEN ({field} ->> '{key}') ~* {_UUID_PATTERN}"
+        f" THEN ({field} ->> '{key}')::uuid END",
+        persisted=True,
+    )
+
+
+def _text(field: str, key: str) -> sa.Computed:
+    return sa.Computed(f"{field} ->> '{key}'", persisted=True)
+
+
+_COLUMNS = [
+    ("unit_duration", sa.Numeric(), _number("metrics", "unit.duration.total")),
+    ("unit_costs", sa.Numeric(), _number("metrics", "unit.costs.total")),
+    ("unit_tokens", sa.BigInteger(), _number("metrics", "unit.tokens.total", True)),
+    ("acc_duration", sa.Numeric(), _number("metrics", "acc.duration.total")),
+    ("acc_costs", sa.Numeric(), _number("metrics", "acc.costs.total")),
+    ("acc_tokens", sa.BigInteger(), _number("metrics", "acc.tokens.total", True)),
+    ("application_id", sa.UUID(), _uuid("refs", "application.id")),
+    ("variant_id", sa.UUID(), _uuid("refs", "variant.id")),
+    ("environment_slug", sa.String(), _text("refs", "environment.slug")),
+    ("status_code", sa.String(), _text("status", "code")),
+]
+
+_INDEXES = [
+    ("index_project_id_application_id", ["project_id", "application_id", "created_at"]),
+    ("index_project_id_variant_id", ["project_id", "variant_id", "created_at"]),
+    (
+        "index_project_id_environment_slug",
+        ["project_id", "environment_slug", "created_at"],
+    ),
+    ("index_project_id_status_code", ["project_id", "status_code", "created_at"]),
+    ("index_project_id_acc_costs", ["project_id", "acc_costs"]),
+    ("index_project_id_acc_duration", ["project_id", "acc_duration"]),
+]
+
+
+def upgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    # Stored generated columns are computed for the existing rows when added, which
+    # rewrites the 'nodes' table once.
+    for name, type_, computed in _COLUMNS:
+        op.add_column("nodes", sa.Column(name, type_, computed, nullable=True))
+
+    for name, columns in _INDEXES:
+        op.create_index(name, "nodes", columns, unique=False)
+    # ### end Alembic commands ###
+
+
+def downgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    for name, _ in reversed(_INDEXES):
+        op.drop_index(name, table_name="nodes")
+
+    for name, _, _ in reversed(_COLUMNS):
+        op.drop_column("nodes", name)
+    # ### end Alembic commands ###
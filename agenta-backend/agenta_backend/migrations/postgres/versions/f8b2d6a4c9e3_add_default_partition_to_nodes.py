@@ -0,0 +1,40 @@
+"""Added a default partition to the 'nodes' table
+
+Revision ID: f8b2d6a4c9e3
+Revises: d9f3b7e2a5c1
+Create Date: 2024-12-02 09:13:41.204658
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f8b2d6a4c9e3"
+down_revision: Union[str, None] = "d9f3b7e2a5c1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS = (
+    "project_id, created_at, updated_at, updated_by_id, root_id, tree_id, tree_type, "
+    "node_id, node_name, node_type, parent_id, time_start, time_end, status, data, "
+    "metrics, meta, refs, exception, links, content, otel"
+)
+
+
+def upgrade() -> None:
+    # Nodes created outside of the weekly partitions (e.g. when the backend did not
+    # create them ahead of time) are written to the default partition rather than
+    # rejected, and are moved to the partitions of their weeks once these are created
+    op.execute("CREATE TABLE nodes_default PARTITION OF nodes DEFAULT")
+
+
+def downgrade() -> None:
+    # The nodes of the default partition are moved back to the weekly partitions,
+    # which must cover them
+    op.execute("ALTER TABLE nodes DETACH PARTITION nodes_default")
+    op.execute(f"INSERT INTO nodes ({COLUMNS}) SELECT {COLUMNS} FROM nodes_default")
+    op.execute("DROP TABLE nodes_default")
@@ -270,6 +270,8 @@ class LLMRunRateLimit(BaseModel):
     max_retries: int
     retry_delay: int
     delay_between_batches: int
+    requests_per_second: Optional[float] = None
+    tokens_per_second: Optional[float] = None
 
 
 class LMProvidersEnum(str, Enum):
@@ -295,6 +297,7 @@ class NewEvaluation(BaseModel):
     rate_limit: LLMRunRateLimit
     lm_providers_keys: Optional[Dict[str, str]] = None
     correct_answer_column: Optional[str] = None
+    use_invocation_cache: bool = False
 
     @field_validator("lm_providers_keys", mode="after")
     def validate_lm_providers_keys(cls, value):
@@ -283,7 +283,7 @@ def app_variant_db_to_pydantic(
     return app_variant
 
 
-async def app_variant_db_to_output(app_variant_db: AppVariantDB) -> AppVariantResponse:
+def app_variant_db_to_output(app_variant_db: AppVariantDB) -> AppVariantResponse:
     if isinstance(app_variant_db.base_id, uuid.UUID) and isinstance(
         app_variant_db.base.deployment_id, uuid.UUID
     ):
@@ -346,7 +346,7 @@ async def app_variant_db_revision_to_output(
     )
 
 
-async def environment_db_to_output(
+def environment_db_to_output(
     environment_db: AppEnvironmentDB,
 ) -> EnvironmentOutput:
     deployed_app_variant_id = (
@@ -354,10 +354,9 @@ async def environment_db_to_output(
         if environment_db.deployed_app_variant_id and isinstance(environment_db.deployed_app_variant_id, uuid.UUID)  # type: ignore
         else None
     )
-    if deployed_app_variant_id:
-        deployed_app_variant = await db_manager.get_app_variant_instance_by_id(
-            deployed_app_variant_id, str(environment_db.project_id)
-        )
+    # The deployed app variant is expected to be loaded with the environment
+    deployed_app_variant = environment_db.deployed_app_variant
+    if deployed_app_variant_id and deployed_app_variant:
         deployed_variant_name = deployed_app_variant.variant_name
         revision = deployed_app_variant.revision
     else:
@@ -378,7 +377,7 @@ async def environment_db_to_output(
     return environment_output
 
 
-async def environment_db_and_revision_to_extended_output(
+def environment_db_and_revision_to_extended_output(
     environment_db: AppEnvironmentDB,
     app_environment_revisions_db: List[AppEnvironmentRevisionDB],
 ) -> EnvironmentOutput:
@@ -387,10 +386,9 @@ async def environment_db_and_revision_to_extended_output(
         if isinstance(environment_db.deployed_app_variant_id, uuid.UUID)
         else None
     )
-    if deployed_app_variant_id:
-        deployed_app_variant = await db_manager.get_app_variant_instance_by_id(
-            deployed_app_variant_id, str(environment_db.project_id)
-        )
+    # The deployed app variant and the revisions' modifiers are expected to be loaded
+    deployed_app_variant = environment_db.deployed_app_variant
+    if deployed_app_variant_id and deployed_app_variant:
         deployed_variant_name = deployed_app_variant.variant_name
     else:
         deployed_variant_name = None
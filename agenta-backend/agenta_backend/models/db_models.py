@@ -9,6 +9,7 @@ from sqlalchemy import (
     Boolean,
     ForeignKey,
     Enum,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy_json import mutable_json_type
@@ -636,6 +637,14 @@ class EvaluationEvaluatorConfigDB(Base):
 class EvaluationScenarioDB(Base):
     __tablename__ = "evaluation_scenarios"
 
+    __table_args__ = (
+        Index(
+            "index_evaluation_id_testcase_index",
+            "evaluation_id",
+            "testcase_index",
+        ),  # resuming evaluations
+    )
+
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
@@ -665,6 +674,7 @@ class EvaluationScenarioDB(Base):
     note = Column(String)
     latency = Column(Integer)
     cost = Column(Integer)
+    testcase_index = Column(Integer, nullable=True)  # index of the testset row
     created_at = Column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
@@ -684,6 +694,14 @@ class EvaluationScenarioDB(Base):
 class IDsMappingDB(Base):
     __tablename__ = "ids_mapping"
 
+    __table_args__ = (
+        Index(
+            "index_table_name_objectid",
+            "table_name",
+            "objectid",
+        ),  # resolving legacy object ids
+    )
+
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
@@ -23,6 +23,7 @@ class InvokationResult(BaseModel):
     result: Result
     cost: Optional[float] = None
     latency: Optional[float] = None
+    status_code: Optional[int] = None
 
 
 class EvaluationScenarioResult(BaseModel):
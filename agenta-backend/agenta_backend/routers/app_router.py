@@ -117,7 +117,7 @@ async def list_app_variants(
 
         app_variants = await db_manager.list_app_variants(app_id=app_id)
         return [
-            await converters.app_variant_db_to_output(app_variant)
+            converters.app_variant_db_to_output(app_variant)
             for app_variant in app_variants
         ]
 
@@ -178,7 +178,7 @@ async def get_variant_by_env(
         # Check if the fetched app variant is None and raise exception if it is
         if app_variant_db is None:
             raise HTTPException(status_code=500, detail="App Variant not found")
-        return await converters.app_variant_db_to_output(app_variant_db)
+        return converters.app_variant_db_to_output(app_variant_db)
     except ValueError as e:
         # Handle ValueErrors and return 400 status code
         raise HTTPException(status_code=400, detail=str(e))
@@ -401,7 +401,7 @@ async def add_variant_from_image(
             app_name=app.app_name, project_id=str(app.project_id)
         )
 
-        return await converters.app_variant_db_to_output(app_variant_db)
+        return converters.app_variant_db_to_output(app_variant_db)
     except Exception as e:
         logger.exception(f"An error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -616,7 +616,7 @@ async def create_app_and_variant_from_template(
         )
 
         logger.debug("End: Successfully created app and variant")
-        return await converters.app_variant_db_to_output(app_variant_db)
+        return converters.app_variant_db_to_output(app_variant_db)
 
     except Exception as e:
         import traceback
@@ -672,10 +672,7 @@ async def list_environments(
             environments_db, key=lambda env: (fixed_order + [env.name]).index(env.name)
         )
 
-        return [
-            await converters.environment_db_to_output(env)
-            for env in sorted_environments
-        ]
+        return [converters.environment_db_to_output(env) for env in sorted_environments]
     except Exception as e:
         logger.exception(f"An error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -728,7 +725,7 @@ async def list_app_environment_revisions(
                 {"detail": "No revisions found for app environment"}, status_code=404
             )
 
-        return await converters.environment_db_and_revision_to_extended_output(
+        return converters.environment_db_and_revision_to_extended_output(
             app_environment, app_environment_revisions
         )
     except Exception as e:
@@ -138,6 +138,7 @@ async def create_evaluation(
                 evaluation_id=evaluation.id,
                 rate_limit_config=payload.rate_limit.model_dump(),
                 lm_providers_keys=llm_provider_keys,
+                use_invocation_cache=payload.use_invocation_cache,
             )
             evaluations.append(evaluation)
 
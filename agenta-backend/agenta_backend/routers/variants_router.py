@@ -1,13 +1,14 @@
+import json
 import logging
 from typing import Any, Optional, Union, List, Dict
 
 from docker.errors import DockerException
-from fastapi.responses import JSONResponse
-from fastapi import HTTPException, Request, Body, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import HTTPException, Request, Response, Body, status
 
 from agenta_backend.models import converters
 from agenta_backend.utils.common import APIRouter, isCloudEE
-from agenta_backend.services import app_manager, db_manager
+from agenta_backend.services import app_manager, db_manager, config_events
 
 if isCloudEE():
     from agenta_backend.commons.utils.permissions import (
@@ -107,7 +108,7 @@ async def add_variant_from_base_and_config(
         app_variant_db = await db_manager.get_app_variant_instance_by_id(
             str(db_app_variant.id), str(db_app_variant.project_id)
         )
-        return await converters.app_variant_db_to_output(app_variant_db)
+        return converters.app_variant_db_to_output(app_variant_db)
 
     except Exception as e:
         import traceback
@@ -419,7 +420,7 @@ async def get_variant(
                     status_code=403,
                 )
 
-        return await converters.app_variant_db_to_output(app_variant)
+        return converters.app_variant_db_to_output(app_variant)
     except Exception as e:
         logger.exception(f"An error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -610,6 +611,7 @@ async def configs_add(
 @handle_exceptions()
 async def configs_fetch(
     request: Request,
+    response: Response,
     variant_ref: Optional[ReferenceRequestModel] = None,
     environment_ref: Optional[ReferenceRequestModel] = None,
     application_ref: Optional[ReferenceRequestModel] = None,
@@ -646,6 +648,17 @@ async def configs_fetch(
             detail="Config not found.",
         )
 
+    # The variant and environment revisions change with every commit and deployment
+    etag = '"{}:{}"'.format(
+        (config.variant_ref.id if config.variant_ref else None) or "",
+        (config.environment_ref.id if config.environment_ref else None) or "",
+    )
+
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    response.headers["ETag"] = etag
+
     return config
 
 
@@ -800,3 +813,53 @@ async def configs_history(
     )
 
     return configs
+
+
+CONFIG_EVENTS_HEARTBEAT = 15  # seconds
+
+
+@router.get(
+    "/configs/events",
+    operation_id="configs_events",
+    response_class=StreamingResponse,
+)
+async def configs_events(
+    request: Request,
+):
+    """
+    Streams the config events of the project as server-sent events: one event per
+    commit, deployment or removal of a variant, and a comment as a heartbeat when
+    there are no events.
+    """
+
+    if not config_events.CONFIG_EVENTS:
+        raise HTTPException(
+            status_code=501,
+            detail="Config events require Redis.",
+        )
+
+    # Subscribed before responding, so that no event is missed once connected
+    pubsub = await config_events.subscribe_config_events(
+        project_id=request.state.project_id
+    )
+
+    async def stream():
+        yield ": connected\n\n"
+
+        async for event in config_events.read_config_events(
+            pubsub=pubsub,
+            timeout=CONFIG_EVENTS_HEARTBEAT,
+        ):
+            if await request.is_disconnected():
+                break
+
+            if event is None:
+                yield ": heartbeat\n\n"
+            else:
+                yield f"event: config\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
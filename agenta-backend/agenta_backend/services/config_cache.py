@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Config cache settings: the cache is shared by the workers through Redis, and its
+# entries are invalidated whenever a variant is committed or deployed, or after
+# CONFIG_CACHE_TTL seconds for the changes made outside of the backend
+CONFIG_CACHE = str(os.environ.get("AGENTA_CONFIG_CACHE", True)).lower() in (
+    "true",
+    "1",
+    "t",
+) and bool(os.environ.get("REDIS_URL"))
+CONFIG_CACHE_TTL = int(os.environ.get("AGENTA_CONFIG_CACHE_TTL", 60))
+
+CONFIG_CACHE_PREFIX = "config_cache:"
+CONFIG_CACHE_GENERATION_PREFIX = "config_cache_generation:"
+
+_redis_client = None
+
+
+def get_redis_client():
+    """
+    Returns the Redis client of the config cache, created once per process so that its
+    connection pool is reused across requests.
+    """
+
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.from_url(url=os.environ.get("REDIS_URL", ""))
+    return _redis_client
+
+
+def make_cache_key(project_id: str) -> str:
+    """
+    Returns the cache key of the configs of a project, the prefix followed by the
+    project ID. Its fields are the configs of the project, by the hash of their refs
+    (see make_cache_field), so that all of them are invalidated at once.
+
+    Args:
+        project_id (str): The ID of the project.
+
+    Returns:
+        str: The cache key.
+    """
+
+    return CONFIG_CACHE_PREFIX + str(project_id)
+
+
+def make_generation_key(project_id: str) -> str:
+    """
+    Returns the key of the cache generation of a project, which is incremented
+    whenever its configs are invalidated.
+
+    Args:
+        project_id (str): The ID of the project.
+
+    Returns:
+        str: The generation key.
+    """
+
+    return CONFIG_CACHE_GENERATION_PREFIX + str(project_id)
+
+
+def make_cache_field(refs: Dict[str, Any], generation: int) -> str:
+    """
+    Returns the cache field of a config, within the cache key of its project.
+
+    The field depends on the cache generation, so that a config resolved before an
+    invalidation, and cached after it, is never read again.
+
+    Args:
+        refs (Dict[str, Any]): The references the config is fetched by.
+        generation (int): The cache generation the config is resolved in.
+
+    Returns:
+        str: The cache field.
+    """
+
+    digest = hashlib.sha256(
+        json.dumps(refs, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return f"{generation}:{digest}"
+
+
+async def get_cache_generation(project_id: str) -> Optional[int]:
+    """
+    Returns the current cache generation of a project, to be read before resolving a
+    config and passed along when reading and caching it.
+
+    Errors of the cache are logged, and the config is then neither read from nor
+    written to the cache.
+
+    Args:
+        project_id (str): The ID of the project.
+
+    Returns:
+        Optional[int]: The cache generation, or None if unknown.
+    """
+
+    if not CONFIG_CACHE:
+        return None
+
+    try:
+        generation = await get_redis_client().get(make_generation_key(project_id))
+    except RedisError as e:
+        logger.warning(f"Could not read the config cache generation: {e}")
+        return None
+
+    return int(generation or 0)
+
+
+async def get_cached_config(
+    project_id: str, refs: Dict[str, Any], generation: Optional[int]
+) -> Optional[Dict[str, Any]]:
+    """
+    Returns the cached config fetched by the given references.
+
+    Errors of the cache are logged and treated as misses.
+
+    Args:
+        project_id (str): The ID of the project.
+        refs (Dict[str, Any]): The references the config is fetched by.
+        generation (Optional[int]): The cache generation, see get_cache_generation.
+
+    Returns:
+        Optional[Dict[str, Any]]: The cached config, or None on a miss.
+    """
+
+    if not CONFIG_CACHE or generation is None:
+        return None
+
+    try:
+        cached_data = await get_redis_client().hget(
+            make_cache_key(project_id), make_cache_field(refs, generation)
+        )
+    except RedisError as e:
+        logger.warning(f"Could not read the config cache: {e}")
+        return None
+
+    if cached_data is None:
+        return None
+
+    cached_data = json.loads(cached_data)
+
+    if time.time() - cached_data["cached_at"] > CONFIG_CACHE_TTL:
+        return None
+
+    return cached_data["config"]
+
+
+async def set_cached_config(
+    project_id: str,
+    refs: Dict[str, Any],
+    config: Dict[str, Any],
+    generation: Optional[int],
+) -> None:
+    """
+    Caches the config fetched by the given references.
+
+    Errors of the cache are logged and ignored.
+
+    Args:
+        project_id (str): The ID of the project.
+        refs (Dict[str, Any]): The references the config is fetched by.
+        config (Dict[str, Any]): The config, encodable to JSON.
+        generation (Optional[int]): The cache generation read before resolving the \
+            config, see get_cache_generation.
+    """
+
+    if not CONFIG_CACHE or generation is None:
+        return
+
+    try:
+        key = make_cache_key(project_id)
+        pipeline = get_redis_client().pipeline()
+        pipeline.hset(
+            key,
+            make_cache_field(refs, generation),
+            json.dumps({"cached_at": time.time(), "config": config}),
+        )
+        pipeline.expire(key, CONFIG_CACHE_TTL)
+        await pipeline.execute()
+
+    except RedisError as e:
+        logger.warning(f"Could not write the config cache: {e}")
+
+
+async def invalidate_cached_configs(project_id: str) -> None:
+    """
+    Invalidates the cached configs of a project, by moving it to the next cache
+    generation, so that the configs being resolved meanwhile are not read either.
+
+    Errors of the cache are logged and ignored, the configs then expire after
+    CONFIG_CACHE_TTL seconds.
+
+    Args:
+        project_id (str): The ID of the project.
+    """
+
+    if not CONFIG_CACHE:
+        return
+
+    try:
+        pipeline = get_redis_client().pipeline()
+        pipeline.incr(make_generation_key(project_id))
+        pipeline.delete(make_cache_key(project_id))
+        await pipeline.execute()
+    except RedisError as e:
+        logger.warning(f"Could not invalidate the config cache: {e}")
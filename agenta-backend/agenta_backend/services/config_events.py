@@ -0,0 +1,139 @@
+import os
+import json
+import logging
+from typing import Any, AsyncGenerator, Dict, Optional
+
+import redis.asyncio as redis
+from redis.asyncio.client import PubSub
+from redis.exceptions import RedisError
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Config events are published to a Redis channel per project, whenever a variant is
+# committed or deployed, so that the SDK caches are invalidated as soon as a config
+# changes, rather than when they expire
+CONFIG_EVENTS = bool(os.environ.get("REDIS_URL"))
+
+CONFIG_EVENTS_PREFIX = "config_events:"
+
+_redis_client = None
+
+
+def get_redis_client():
+    """
+    Returns the Redis client of the config events, created once per process so that
+    its connection pool is reused across requests.
+    """
+
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.from_url(url=os.environ.get("REDIS_URL", ""))
+    return _redis_client
+
+
+def make_channel(project_id: str) -> str:
+    """
+    Returns the channel of the config events of a project.
+
+    Args:
+        project_id (str): The ID of the project.
+
+    Returns:
+        str: The channel.
+    """
+
+    return CONFIG_EVENTS_PREFIX + str(project_id)
+
+
+async def publish_config_event(
+    project_id: str,
+    application_id: str,
+    variant_slug: Optional[str] = None,
+    environment_slug: Optional[str] = None,
+    revision: Optional[int] = None,
+) -> None:
+    """
+    Publishes a change of the configs of a project: the commit, deployment or removal
+    of a variant.
+
+    Errors are logged and ignored, the SDK caches then expire the changed configs.
+
+    Args:
+        project_id (str): The ID of the project.
+        application_id (str): The ID of the app.
+        variant_slug (Optional[str]): The name of the variant.
+        environment_slug (Optional[str]): The name of the environment, if deployed.
+        revision (Optional[int]): The new revision of the variant or environment.
+    """
+
+    if not CONFIG_EVENTS:
+        return
+
+    event = {
+        "project_id": str(project_id),
+        "application_id": str(application_id),
+        "variant_slug": variant_slug,
+        "environment_slug": environment_slug,
+        "revision": revision,
+    }
+
+    try:
+        await get_redis_client().publish(make_channel(project_id), json.dumps(event))
+    except RedisError as e:
+        logger.warning(f"Could not publish the config event: {e}")
+
+
+async def subscribe_config_events(project_id: str) -> PubSub:
+    """
+    Subscribes to the config events of a project, so that the events published from
+    now on are received, even before they are read.
+
+    Args:
+        project_id (str): The ID of the project.
+
+    Returns:
+        PubSub: The subscription, to read the events from, see read_config_events.
+    """
+
+    pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+
+    try:
+        await pubsub.subscribe(make_channel(project_id))
+    except BaseException:
+        await pubsub.close()
+        raise
+
+    return pubsub
+
+
+async def read_config_events(
+    pubsub: PubSub,
+    timeout: float,
+) -> AsyncGenerator[Optional[Dict[str, Any]], None]:
+    """
+    Yields the config events of a subscription as they are published, and None after
+    `timeout` seconds without events, so that the subscriber can send a heartbeat or
+    stop. The subscription is closed when the generator is.
+
+    Args:
+        pubsub (PubSub): The subscription, see subscribe_config_events.
+        timeout (float): The time to wait for an event, in seconds.
+
+    Yields:
+        Optional[Dict[str, Any]]: The config event, or None.
+    """
+
+    try:
+        while True:
+            message = await pubsub.get_message(timeout=timeout)
+
+            if message is None:
+                yield None
+            elif message["type"] == "message":
+                yield json.loads(message["data"])
+
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.close()
@@ -2,20 +2,25 @@ import os
 import uuid
 import logging
 from enum import Enum
+from datetime import datetime, timezone
 from pathlib import Path
 from urllib.parse import urlparse
-from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
 
+from bson import ObjectId
 from fastapi import HTTPException
 
+import uuid_utils.compat as uuid_utils
 from sqlalchemy.future import select
-from sqlalchemy import func, or_, asc
+from sqlalchemy import func, or_, asc, insert, delete
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload, aliased, load_only
 
 from agenta_backend.models import converters
 from agenta_backend.utils.common import isCloudEE
+from agenta_backend.services import config_cache, config_events
 from agenta_backend.services.json_importer_helper import get_json
 
 from agenta_backend.dbs.postgres.shared.engine import engine
@@ -97,6 +102,13 @@ logger.setLevel(logging.DEBUG)
 # Define parent directory
 PARENT_DIRECTORY = Path(os.path.dirname(__file__)).parent
 
+# Legacy object ids are mapped to UUIDs once and for all by the migration to Postgres,
+# so the mappings are cached, up to OBJECT_UUIDS_CACHE_SIZE of them, the least
+# recently used ones being evicted first
+OBJECT_UUIDS_CACHE_SIZE = int(os.environ.get("AGENTA_OBJECT_UUIDS_CACHE_SIZE", 10000))
+
+_object_uuids: OrderedDict = OrderedDict()
+
 
 async def fetch_project_by_id(
     project_id: str,
@@ -406,6 +418,116 @@ async def fetch_app_environment_revision_by_version(
             return app_environment_revision, version
 
 
+async def fetch_app_environment_config(
+    project_id: str,
+    environment_revision_id: Optional[str] = None,
+    app_id: Optional[str] = None,
+    app_name: Optional[str] = None,
+    environment_name: Optional[str] = None,
+    version: Optional[int] = None,
+) -> Optional[Tuple[Any, ...]]:
+    """Fetches an app environment revision, with its environment and version, and
+    the variant revision, variant, app and deployment it deploys, in a single query.
+
+    The revision is fetched by its ID, or by the ID or name of its app, the name of
+    its environment and its version, the latest one if no version is given.
+
+    Args:
+        project_id (str): The ID of the project.
+        environment_revision_id (Optional[str]): The ID of the environment revision.
+        app_id (Optional[str]): The ID of the app.
+        app_name (Optional[str]): The name of the app.
+        environment_name (Optional[str]): The name of the environment.
+        version (Optional[int]): The version of the environment revision.
+
+    Returns:
+        Optional[Tuple]: The environment, environment revision, version, variant \
+            revision, variant, app and deployment, the last four being None if they \
+            are missing, or None if no revision was found.
+    """
+
+    if version and version < 0:
+        raise Exception("version cannot be negative")
+
+    revisions = (
+        select(
+            AppEnvironmentRevisionDB,
+            func.row_number()
+            .over(
+                partition_by=AppEnvironmentRevisionDB.environment_id,
+                order_by=AppEnvironmentRevisionDB.created_at.asc(),
+            )
+            .label("version"),
+        )
+        .filter_by(project_id=uuid.UUID(project_id))
+        .subquery()
+    )
+    environment_revision = aliased(AppEnvironmentRevisionDB, revisions)
+
+    # Outer joins, so that a revision deploying nothing is not skipped for an older one
+    query = (
+        select(
+            AppEnvironmentDB,
+            environment_revision,
+            revisions.c.version,
+            AppVariantRevisionsDB,
+            AppVariantDB,
+            AppDB,
+            DeploymentDB,
+        )
+        .join(
+            environment_revision,
+            environment_revision.environment_id == AppEnvironmentDB.id,
+        )
+        .outerjoin(
+            AppVariantRevisionsDB,
+            AppVariantRevisionsDB.id
+            == environment_revision.deployed_app_variant_revision_id,
+        )
+        .outerjoin(AppVariantDB, AppVariantDB.id == AppVariantRevisionsDB.variant_id)
+        .outerjoin(AppDB, AppDB.id == AppVariantDB.app_id)
+        .outerjoin(VariantBaseDB, VariantBaseDB.id == AppVariantDB.base_id)
+        .outerjoin(DeploymentDB, DeploymentDB.id == VariantBaseDB.deployment_id)
+        .filter(AppEnvironmentDB.project_id == uuid.UUID(project_id))
+    )
+
+    if environment_revision_id:
+        query = query.filter(
+            environment_revision.id == uuid.UUID(environment_revision_id)
+        )
+
+    elif (app_id or app_name) and environment_name:
+        query = query.filter(AppEnvironmentDB.name == environment_name)
+
+        if app_id:
+            query = query.filter(AppEnvironmentDB.app_id == uuid.UUID(app_id))
+        else:
+            query = query.filter(
+                AppEnvironmentDB.app_id.in_(
+                    select(AppDB.id).filter_by(
+                        app_name=app_name, project_id=uuid.UUID(project_id)
+                    )
+                )
+            )
+
+        if version and version > 0:
+            query = query.filter(revisions.c.version == version)
+        else:
+            query = query.order_by(environment_revision.created_at.desc()).limit(1)
+
+    else:
+        return None
+
+    async with engine.session() as session:
+        result = await session.execute(query)
+        row = result.first()
+
+    if row is None:
+        return None
+
+    return tuple(row)
+
+
 async def fetch_base_by_id(base_id: str) -> Optional[VariantBaseDB]:
     """
     Fetches a base by its ID.
@@ -1373,6 +1495,13 @@ async def remove_app_variant_from_db(app_variant_db: AppVariantDB, project_id: s
         await session.delete(app_variant_db)
         await session.commit()
 
+    await config_cache.invalidate_cached_configs(project_id)
+    await config_events.publish_config_event(
+        project_id=project_id,
+        application_id=str(app_variant_db.app_id),
+        variant_slug=app_variant_db.config_name,
+    )
+
 
 async def deploy_to_environment(
     environment_name: str, variant_id: str, **user_org_data
@@ -1436,6 +1565,15 @@ async def deploy_to_environment(
 
         await session.commit()
 
+    await config_cache.invalidate_cached_configs(str(app_variant_db.project_id))
+    await config_events.publish_config_event(
+        project_id=str(app_variant_db.project_id),
+        application_id=str(app_variant_db.app_id),
+        variant_slug=app_variant_db.config_name,
+        environment_slug=environment_db.name,
+        revision=environment_db.revision,
+    )
+
     return environment_db.name, environment_db.revision
 
 
@@ -1456,10 +1594,9 @@ async def fetch_app_environment_by_name_and_appid(
         query = select(AppEnvironmentDB).filter_by(
             app_id=uuid.UUID(app_id), name=environment_name
         )
-        if isCloudEE():
-            query = query.options(
-                joinedload(AppEnvironmentDB.deployed_app_variant.of_type(AppVariantDB)),  # type: ignore
-            )
+        query = query.options(
+            joinedload(AppEnvironmentDB.deployed_app_variant.of_type(AppVariantDB)),  # type: ignore
+        )
         result = await session.execute(query)
         app_environment = result.scalars().first()
         return app_environment
@@ -1547,10 +1684,9 @@ async def fetch_environment_revisions_for_environment(
         query = select(AppEnvironmentRevisionDB).filter_by(
             environment_id=environment.id
         )
-        if isCloudEE():
-            query = query.options(
-                joinedload(AppEnvironmentRevisionDB.modified_by.of_type(UserDB)).load_only(UserDB.username)  # type: ignore
-            )
+        query = query.options(
+            joinedload(AppEnvironmentRevisionDB.modified_by.of_type(UserDB)).load_only(UserDB.username)  # type: ignore
+        )
 
         result = await session.execute(
             query.order_by(asc(AppEnvironmentRevisionDB.created_at))
@@ -1651,7 +1787,8 @@ async def list_environments(app_id: str, **kwargs: dict):
                     AppVariantRevisionsDB.revision,  # type: ignore
                     AppVariantRevisionsDB.config_name,  # type: ignore
                     AppVariantRevisionsDB.config_parameters,  # type: ignore
-                )
+                ),
+                joinedload(AppEnvironmentDB.deployed_app_variant.of_type(AppVariantDB)).load_only(AppVariantDB.variant_name, AppVariantDB.revision),  # type: ignore
             )
             .filter_by(app_id=uuid.UUID(app_id), project_id=app_instance.project_id)
         )
@@ -1994,7 +2131,15 @@ async def update_variant_parameters(
         session.add(variant_revision)
         await session.commit()
 
-        return app_variant_db
+    await config_cache.invalidate_cached_configs(project_id)
+    await config_events.publish_config_event(
+        project_id=project_id,
+        application_id=str(app_variant_db.app_id),
+        variant_slug=app_variant_db.config_name,
+        revision=app_variant_db.revision,
+    )
+
+    return app_variant_db
 
 
 async def get_app_variant_instance_by_id(
@@ -2471,6 +2616,60 @@ async def fetch_evaluation_scenarios(evaluation_id: str, project_id: str):
         return evaluation_scenarios
 
 
+async def fetch_evaluated_testcase_indexes(
+    evaluation_id: str, project_id: str
+) -> Set[int]:
+    """
+    Fetches the indexes of the testset rows that already have an evaluation scenario.
+
+    Args:
+        evaluation_id (str):  The evaluation identifier
+        project_id (str): The ID of the project
+
+    Returns:
+        Set[int]: The indexes of the evaluated testset rows.
+    """
+
+    async with engine.session() as session:
+        result = await session.execute(
+            select(EvaluationScenarioDB.testcase_index)
+            .filter_by(
+                evaluation_id=uuid.UUID(evaluation_id), project_id=uuid.UUID(project_id)
+            )
+            .filter(EvaluationScenarioDB.testcase_index.is_not(None))
+        )
+        return set(result.scalars().all())
+
+
+async def fetch_evaluation_scenarios_outputs_and_results(
+    evaluation_id: str, project_id: str
+):
+    """
+    Fetches the outputs and results of the evaluation scenarios, without their inputs.
+
+    Args:
+        evaluation_id (str):  The evaluation identifier
+        project_id (str): The ID of the project
+
+    Returns:
+        The evaluation scenarios, with only their outputs and results loaded.
+    """
+
+    async with engine.session() as session:
+        result = await session.execute(
+            select(EvaluationScenarioDB)
+            .filter_by(
+                evaluation_id=uuid.UUID(evaluation_id), project_id=uuid.UUID(project_id)
+            )
+            .options(
+                load_only(EvaluationScenarioDB.id, EvaluationScenarioDB.outputs),  # type: ignore
+                joinedload(EvaluationScenarioDB.results),
+            )
+        )
+        evaluation_scenarios = result.unique().scalars().all()
+        return evaluation_scenarios
+
+
 async def fetch_evaluation_scenario_by_id(
     evaluation_scenario_id: str,
 ) -> Optional[EvaluationScenarioDB]:
@@ -3026,10 +3225,105 @@ async def create_new_evaluation_scenario(
         return evaluation_scenario
 
 
+async def create_new_evaluation_scenarios(
+    project_id: str,
+    evaluation_id: str,
+    variant_id: str,
+    evaluation_scenarios: List[Dict[str, Any]],
+    chunk_size: int = 500,
+) -> List[str]:
+    """Create many evaluation scenarios and their results with multi-row INSERTs.
+
+    Unlike create_new_evaluation_scenario, the IDs of the scenarios are generated
+    client-side, so the scenarios and their results are written with one INSERT
+    per table and per chunk, without refreshing the rows in between.
+
+    Args:
+        project_id (str): The ID of the project
+        evaluation_id (str): The ID of the evaluation
+        variant_id (str): The ID of the app variant
+        evaluation_scenarios (List[Dict[str, Any]]): The evaluation scenarios. Each one \
+            holds the inputs, outputs, correct_answers, is_pinned, note and results \
+            arguments of create_new_evaluation_scenario, and optionally the \
+            testcase_index of the testset row it was created from.
+        chunk_size (int): The maximum number of scenarios written per INSERT
+
+    Returns:
+        List[str]: The IDs of the created evaluation scenarios.
+    """
+
+    evaluation_scenarios_ids: List[str] = []
+    for start in range(0, len(evaluation_scenarios), chunk_size):
+        scenarios_rows = []
+        results_rows = []
+        for evaluation_scenario in evaluation_scenarios[start : start + chunk_size]:
+            now = datetime.now(timezone.utc)
+            evaluation_scenario_id = uuid_utils.uuid7()
+            correct_answers = evaluation_scenario.get("correct_answers")
+            scenarios_rows.append(
+                {
+                    "id": evaluation_scenario_id,
+                    "project_id": uuid.UUID(project_id),
+                    "evaluation_id": uuid.UUID(evaluation_id),
+                    "variant_id": uuid.UUID(variant_id),
+                    "inputs": [
+                        input.model_dump() for input in evaluation_scenario["inputs"]
+                    ],
+                    "outputs": [
+                        output.model_dump() for output in evaluation_scenario["outputs"]
+                    ],
+                    "correct_answers": (
+                        [
+                            correct_answer.model_dump()
+                            for correct_answer in correct_answers
+                        ]
+                        if correct_answers is not None
+                        else []
+                    ),
+                    "is_pinned": evaluation_scenario.get("is_pinned", False),
+                    "note": evaluation_scenario.get("note", ""),
+                    "testcase_index": evaluation_scenario.get("testcase_index"),
+                    "created_at": now,
+                    "updated_at": now,
+                }
+            )
+            results_rows.extend(
+                {
+                    "id": uuid_utils.uuid7(),
+                    "evaluation_scenario_id": evaluation_scenario_id,
+                    "evaluator_config_id": uuid.UUID(result.evaluator_config),
+                    "result": result.result.model_dump(),
+                }
+                for result in evaluation_scenario["results"]
+            )
+            evaluation_scenarios_ids.append(str(evaluation_scenario_id))
+
+        async with engine.session() as session:
+            await session.execute(insert(EvaluationScenarioDB).values(scenarios_rows))
+
+            # a scenario has one result per evaluator, so chunk them as well
+            for results_start in range(0, len(results_rows), chunk_size):
+                await session.execute(
+                    insert(EvaluationScenarioResultDB).values(
+                        results_rows[results_start : results_start + chunk_size]
+                    )
+                )
+
+            await session.commit()
+
+    return evaluation_scenarios_ids
+
+
 async def update_evaluation_with_aggregated_results(
     evaluation_id: str, aggregated_results: List[AggregatedResult]
 ):
     async with engine.session() as session:
+        # Replace the results of a previous run of the evaluation, if any
+        await session.execute(
+            delete(EvaluationAggregatedResultDB).where(
+                EvaluationAggregatedResultDB.evaluation_id == uuid.UUID(evaluation_id)
+            )
+        )
         for result in aggregated_results:
             aggregated_result = EvaluationAggregatedResultDB(
                 evaluation_id=uuid.UUID(evaluation_id),
@@ -3327,18 +3621,8 @@ async def get_object_uuid(object_id: str, table_name: str) -> str:
 
     """
 
-    from bson import ObjectId
-    from bson.errors import InvalidId
-
-    try:
-        # Ensure the object_id is a valid MongoDB ObjectId
-        if isinstance(ObjectId(object_id), ObjectId):
-            object_uuid_as_str = await fetch_corresponding_object_uuid(
-                table_name=table_name, object_id=object_id
-            )
-    except InvalidId:
-        # Use the object_id directly if it is not a valid MongoDB ObjectId
-        object_uuid_as_str = object_id
+    object_uuids = await get_object_uuids(object_ids=[object_id], table_name=table_name)
+    object_uuid_as_str = object_uuids.get(object_id)
 
     assert (
         object_uuid_as_str is not None
@@ -3346,24 +3630,74 @@ async def get_object_uuid(object_id: str, table_name: str) -> str:
     return object_uuid_as_str
 
 
-async def fetch_corresponding_object_uuid(table_name: str, object_id: str) -> str:
+async def get_object_uuids(object_ids: List[str], table_name: str) -> Dict[str, str]:
     """
-    Fetches a corresponding object uuid.
+    Resolves the given object ids to UUIDs, like get_object_uuid, fetching the UUIDs
+    of the MongoDB ObjectIds that are not cached in a single query.
 
     Args:
-        table_name (str):  The table name
-        object_id (str):   The object identifier
+        object_ids (List[str]): The IDs of the objects, MongoDB ObjectIds or PostgreSQL UUIDs.
+        table_name (str): The name of the table to fetch the UUIDs from.
 
     Returns:
-        The corresponding object uuid as string.
+        Dict[str, str]: The corresponding object UUIDs by object id, without the \
+            MongoDB ObjectIds that have no corresponding UUID.
+    """
+
+    object_uuids = {}
+    missing_object_ids = []
+
+    for object_id in object_ids:
+        # Use the object_id directly if it is not a valid MongoDB ObjectId
+        if not ObjectId.is_valid(object_id):
+            if object_id is not None:
+                object_uuids[object_id] = object_id
+            continue
+
+        key = (table_name, object_id)
+        if key in _object_uuids:
+            _object_uuids.move_to_end(key)
+            object_uuids[object_id] = _object_uuids[key]
+        else:
+            missing_object_ids.append(object_id)
+
+    if missing_object_ids:
+        fetched_object_uuids = await fetch_corresponding_object_uuids(
+            table_name=table_name, object_ids=missing_object_ids
+        )
+
+        for object_id, object_uuid in fetched_object_uuids.items():
+            _object_uuids[(table_name, object_id)] = object_uuid
+            object_uuids[object_id] = object_uuid
+
+        while len(_object_uuids) > OBJECT_UUIDS_CACHE_SIZE:
+            _object_uuids.popitem(last=False)
+
+    return object_uuids
+
+
+async def fetch_corresponding_object_uuids(
+    table_name: str, object_ids: List[str]
+) -> Dict[str, str]:
+    """
+    Fetches the corresponding object uuids of several objects.
+
+    Args:
+        table_name (str):        The table name
+        object_ids (List[str]):  The object identifiers
+
+    Returns:
+        The corresponding object uuids as strings, by object identifier.
     """
 
     async with engine.session() as session:
         result = await session.execute(
-            select(IDsMappingDB).filter_by(table_name=table_name, objectid=object_id)
+            select(IDsMappingDB.objectid, IDsMappingDB.uuid).filter(
+                IDsMappingDB.table_name == table_name,
+                IDsMappingDB.objectid.in_(object_ids),
+            )
         )
-        object_mapping = result.scalars().first()
-        return str(object_mapping.uuid)
+        return {objectid: str(uuid) for objectid, uuid in result.all()}
 
 
 async def fetch_default_project() -> ProjectDB:
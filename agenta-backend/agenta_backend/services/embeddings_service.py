@@ -0,0 +1,227 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from openai import AsyncOpenAI, BadRequestError, UnprocessableEntityError
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+EMBEDDINGS_MODEL = "text-embedding-3-small"
+
+# Embeddings settings: the maximum number of texts embedded per request, the time
+# waited for other evaluations to join a batch, and the number of ground truth
+# embeddings kept in memory across evaluations
+EMBEDDINGS_BATCH_SIZE = int(os.environ.get("AGENTA_EMBEDDINGS_BATCH_SIZE", 100))
+EMBEDDINGS_BATCH_DELAY = float(os.environ.get("AGENTA_EMBEDDINGS_BATCH_DELAY", 0.01))
+EMBEDDINGS_CACHE_SIZE = int(os.environ.get("AGENTA_EMBEDDINGS_CACHE_SIZE", 5000))
+
+# Errors of the embeddings requests caused by one of their texts (e.g. a text that is
+# too long to embed), rather than by the service (e.g. rate limits, timeouts)
+EMBEDDINGS_INPUT_ERRORS = (BadRequestError, UnprocessableEntityError)
+
+_embeddings_cache: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+
+
+def get_cached_embedding(
+    text: str, model: str = EMBEDDINGS_MODEL
+) -> Optional[np.ndarray]:
+    embedding = _embeddings_cache.get((model, text))
+    if embedding is not None:
+        _embeddings_cache.move_to_end((model, text))
+    return embedding
+
+
+def set_cached_embedding(
+    text: str, embedding: np.ndarray, model: str = EMBEDDINGS_MODEL
+) -> None:
+    _embeddings_cache[(model, text)] = embedding
+    _embeddings_cache.move_to_end((model, text))
+    while len(_embeddings_cache) > EMBEDDINGS_CACHE_SIZE:
+        _embeddings_cache.popitem(last=False)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scales the rows of a matrix to unit norm, leaving the zero rows unchanged.
+    """
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+async def embed_texts(
+    client: AsyncOpenAI,
+    texts: List[str],
+    cached: Optional[List[bool]] = None,
+    model: str = EMBEDDINGS_MODEL,
+) -> np.ndarray:
+    """
+    Embeds texts with one embeddings request per chunk of EMBEDDINGS_BATCH_SIZE texts.
+
+    Args:
+        client (AsyncOpenAI): The OpenAI client.
+        texts (List[str]): The texts to embed.
+        cached (Optional[List[bool]]): Whether the embedding of each text is read from \
+            and stored to the embeddings cache, none by default.
+        model (str): The embeddings model.
+
+    Returns:
+        np.ndarray: The normalized embeddings, one row per text.
+    """
+
+    cached = cached or [False] * len(texts)
+    embeddings: List[Optional[np.ndarray]] = [
+        get_cached_embedding(text, model) if is_cached else None
+        for text, is_cached in zip(texts, cached)
+    ]
+
+    # Embed each distinct text that is not cached once
+    missing_texts = list(
+        dict.fromkeys(
+            text for text, embedding in zip(texts, embeddings) if embedding is None
+        )
+    )
+    missing_embeddings: Dict[str, np.ndarray] = {}
+    for start in range(0, len(missing_texts), EMBEDDINGS_BATCH_SIZE):
+        chunk = missing_texts[start : start + EMBEDDINGS_BATCH_SIZE]
+        response = await client.embeddings.create(model=model, input=chunk)
+        vectors = normalize(
+            np.array(
+                [
+                    data.embedding
+                    for data in sorted(response.data, key=lambda data: data.index)
+                ],
+                dtype=np.float32,
+            )
+        )
+        missing_embeddings.update(zip(chunk, vectors))
+
+    for index, (text, is_cached) in enumerate(zip(texts, cached)):
+        if embeddings[index] is None:
+            embeddings[index] = missing_embeddings[text]
+            if is_cached:
+                set_cached_embedding(text, missing_embeddings[text], model)
+
+    return np.stack(embeddings)  # type: ignore
+
+
+async def semantic_similarity_batch(
+    client: AsyncOpenAI,
+    predictions: List[str],
+    ground_truths: List[str],
+) -> List[float]:
+    """
+    Computes the cosine similarity of the embeddings of each prediction and its ground
+    truth. The ground truths embeddings are cached, since they are shared across the
+    evaluations of a testset.
+
+    Args:
+        client (AsyncOpenAI): The OpenAI client.
+        predictions (List[str]): The outputs of the LLM app.
+        ground_truths (List[str]): The correct answers.
+
+    Returns:
+        List[float]: The similarity scores.
+    """
+
+    embeddings = await embed_texts(
+        client,
+        predictions + ground_truths,
+        cached=[False] * len(predictions) + [True] * len(ground_truths),
+    )
+    predictions_embeddings = embeddings[: len(predictions)]
+    ground_truths_embeddings = embeddings[len(predictions) :]
+    scores = np.einsum("ij,ij->i", predictions_embeddings, ground_truths_embeddings)
+    return [float(score) for score in scores]
+
+
+class SemanticSimilarityBatcher:
+    """
+    Coalesces the semantic similarity computations requested by concurrent evaluations
+    into batches of up to EMBEDDINGS_BATCH_SIZE rows, each batch waiting at most
+    EMBEDDINGS_BATCH_DELAY seconds for other rows to join it.
+    """
+
+    def __init__(self, api_key: str):
+        self.client = AsyncOpenAI(api_key=api_key)
+        self.pending: List[Tuple[str, str, asyncio.Future]] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def score(self, prediction: str, ground_truth: str) -> float:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((prediction, ground_truth, future))
+
+        if len(self.pending) >= EMBEDDINGS_BATCH_SIZE:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(EMBEDDINGS_BATCH_DELAY, self.flush)
+
+        return await future
+
+    def flush(self) -> None:
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.ensure_future(self._score_batch(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _score_batch(self, batch: List[Tuple[str, str, asyncio.Future]]):
+        try:
+            scores = await semantic_similarity_batch(
+                self.client,
+                [prediction for prediction, _, _ in batch],
+                [ground_truth for _, ground_truth, _ in batch],
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            # A single invalid row (e.g. too long to embed) fails the whole batch,
+            # which is split until the rows that fail are isolated. Other errors
+            # would fail the halves too, hence fail the whole batch at once.
+            if isinstance(e, EMBEDDINGS_INPUT_ERRORS) and len(batch) > 1:
+                middle = len(batch) // 2
+                await asyncio.gather(
+                    self._score_batch(batch[:middle]),
+                    self._score_batch(batch[middle:]),
+                )
+                return
+
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future), score in zip(batch, scores):
+            if not future.done():
+                future.set_result(score)
+
+
+_semantic_similarity_batchers: Dict[str, SemanticSimilarityBatcher] = {}
+_semantic_similarity_batchers_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_semantic_similarity_batcher(api_key: str) -> SemanticSimilarityBatcher:
+    """
+    Returns the semantic similarity batcher of an OpenAI API key, shared by the
+    evaluations running on the current event loop.
+    """
+
+    global _semantic_similarity_batchers_loop
+
+    loop = asyncio.get_running_loop()
+    if _semantic_similarity_batchers_loop is not loop:
+        _semantic_similarity_batchers.clear()
+        _semantic_similarity_batchers_loop = loop
+
+    if api_key not in _semantic_similarity_batchers:
+        _semantic_similarity_batchers[api_key] = SemanticSimilarityBatcher(api_key)
+    return _semantic_similarity_batchers[api_key]
@@ -1,17 +1,20 @@
+import os
 import re
 import json
+import math
 import asyncio
 import litellm
 import logging
 import traceback
-from typing import Any, Dict, Union
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 import httpx
-import numpy as np
+import billiard
 from openai import OpenAI, AsyncOpenAI
-from numpy._core._multiarray_umath import array
 from autoevals.ragas import Faithfulness, ContextRelevancy
 
+from agenta_backend.services import embeddings_service
 from agenta_backend.services.security import sandbox
 from agenta_backend.models.shared_models import Error, Result
 from agenta_backend.models.api.evaluation_model import (
@@ -20,6 +23,7 @@ from agenta_backend.models.api.evaluation_model import (
     EvaluatorMappingInputInterface,
     EvaluatorMappingOutputInterface,
 )
+from agenta_backend.utils import string_distance
 from agenta_backend.utils.traces import (
     remove_trace_prefix,
     process_distributed_trace_into_trace_tree,
@@ -30,6 +34,17 @@ from agenta_backend.utils.traces import (
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# Texts whose total length exceeds LEVENSHTEIN_PROCESS_POOL_MIN_LENGTH characters are
+# scored in a pool of EVALUATION_PROCESS_POOL_SIZE processes
+LEVENSHTEIN_PROCESS_POOL_MIN_LENGTH = int(
+    os.environ.get("AGENTA_LEVENSHTEIN_PROCESS_POOL_MIN_LENGTH", 20000)
+)
+EVALUATION_PROCESS_POOL_SIZE = int(
+    os.environ.get("AGENTA_EVALUATION_PROCESS_POOL_SIZE", os.cpu_count() or 1)
+)
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
 
 def validate_string_output(
     evaluator_key: str, output: Union[str, Dict[str, Any]]
@@ -296,13 +311,13 @@ async def auto_webhook_test(
 
 
 async def webhook_test(input: EvaluatorInputInterface) -> EvaluatorOutputInterface:
-    with httpx.Client() as client:
+    async with httpx.AsyncClient() as client:
         payload = {
             "correct_answer": input.inputs["ground_truth"],
             "output": input.inputs["prediction"],
             "inputs": input.inputs,
         }
-        response = client.post(url=input.settings["webhook_url"], json=payload)
+        response = await client.post(url=input.settings["webhook_url"], json=payload)
         response.raise_for_status()
         response_data = response.json()
         score = response_data.get("score", None)
@@ -1126,6 +1141,55 @@ async def rag_context_relevancy(
         )
 
 
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Returns the process pool used to score long texts.
+
+    Its processes are started with billiard, the multiprocessing fork of Celery, which
+    unlike multiprocessing lets the daemonic Celery prefork workers have children.
+    """
+
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=EVALUATION_PROCESS_POOL_SIZE,
+            mp_context=billiard.get_context(),
+        )
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    """
+    Shuts the process pool down, if started.
+    """
+
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
+
+
+async def compute_levenshtein_distance(
+    prediction: str, ground_truth: str, max_distance: Optional[int] = None
+) -> int:
+    """
+    Computes the Levenshtein distance, in the process pool for long texts.
+    """
+
+    if len(prediction) + len(ground_truth) < LEVENSHTEIN_PROCESS_POOL_MIN_LENGTH:
+        return string_distance.levenshtein_distance(
+            prediction, ground_truth, max_distance
+        )
+
+    return await asyncio.get_running_loop().run_in_executor(
+        get_process_pool(),
+        string_distance.levenshtein_distance,
+        prediction,
+        ground_truth,
+        max_distance,
+    )
+
+
 async def levenshtein_distance(
     input: EvaluatorInputInterface,
 ) -> EvaluatorOutputInterface:
@@ -1135,19 +1199,16 @@ async def levenshtein_distance(
     if len(ground_truth) == 0:
         return len(prediction)
 
-    previous_row = range(len(ground_truth) + 1)
-    for i, c1 in enumerate(prediction):
-        current_row = [i + 1]
-        for j, c2 in enumerate(ground_truth):
-            insertions = previous_row[j + 1] + 1
-            deletions = current_row[j] + 1
-            substitutions = previous_row[j] + (c1 != c2)
-            current_row.append(min(insertions, deletions, substitutions))
-        previous_row = current_row
-
-    distance = previous_row[-1]
+    threshold = input.settings.get("threshold")
+    max_distance = None
+    if isinstance(threshold, (int, float)) and not isinstance(threshold, bool):
+        # The exact distance is not needed beyond the threshold
+        max_distance = math.floor(threshold)
+
+    distance = await compute_levenshtein_distance(
+        prediction, ground_truth, max_distance
+    )
     if "threshold" in input.settings:
-        threshold = input.settings["threshold"]
         is_within_threshold = distance <= threshold
         return {"outputs": {"success": is_within_threshold}}
 
@@ -1265,20 +1326,11 @@ async def semantic_similarity(
             "No OpenAI key was found. Semantic evaluator requires a valid OpenAI API key to function. Please configure your OpenAI API and try again."
         )
 
-    openai = AsyncOpenAI(api_key=openai_api_key)
-
-    async def encode(text: str):
-        response = await openai.embeddings.create(
-            model="text-embedding-3-small", input=text
-        )
-        return np.array(response.data[0].embedding)
-
-    def cosine_similarity(output_vector: array, correct_answer_vector: array) -> float:
-        return np.dot(output_vector, correct_answer_vector)
-
-    output_vector = await encode(input.inputs["prediction"])
-    correct_answer_vector = await encode(input.inputs["ground_truth"])
-    similarity_score = cosine_similarity(output_vector, correct_answer_vector)
+    # Concurrent evaluations share batched embeddings requests
+    batcher = embeddings_service.get_semantic_similarity_batcher(openai_api_key)
+    similarity_score = await batcher.score(
+        input.inputs["prediction"], input.inputs["ground_truth"]
+    )
     return {"outputs": {"score": similarity_score}}
 
 
@@ -1356,6 +1408,25 @@ RUN_EVALUATOR_FUNCTIONS = {
     "rag_context_relevancy": measure_context_coherence,
 }
 
+# Concurrency classes of the evaluators that call external services. Evaluations run
+# them concurrently, with one concurrency limit per class. The other evaluators are
+# cheap and run inline.
+EVALUATOR_CONCURRENCY_CLASSES = {
+    "auto_ai_critique": "llm",
+    "rag_faithfulness": "llm",
+    "rag_context_relevancy": "llm",
+    "auto_semantic_similarity": "embeddings",
+    "auto_webhook_test": "webhook",
+}
+
+
+def get_evaluator_concurrency_class(evaluator_key: str) -> Optional[str]:
+    """
+    Returns the concurrency class of an evaluator, or None if it runs inline.
+    """
+
+    return EVALUATOR_CONCURRENCY_CLASSES.get(evaluator_key)
+
 
 async def evaluate(
     evaluator_key: str,
@@ -1395,6 +1466,251 @@ async def evaluate(
         )
 
 
+def _bulk_exact_match(
+    predictions: List[str], ground_truths: List[str], settings_values: Dict[str, Any]
+) -> List[bool]:
+    return [
+        prediction == ground_truth
+        for prediction, ground_truth in zip(predictions, ground_truths)
+    ]
+
+
+def _bulk_regex_test(
+    predictions: List[str], _: List[None], settings_values: Dict[str, Any]
+) -> List[bool]:
+    pattern = re.compile(settings_values["regex_pattern"], re.IGNORECASE)
+    should_match = settings_values["regex_should_match"]
+    return [
+        bool(pattern.search(prediction)) == should_match for prediction in predictions
+    ]
+
+
+def _bulk_case(
+    predictions: List[str], substrings: List[str], settings_values: Dict[str, Any]
+) -> Tuple[List[str], List[str]]:
+    if settings_values.get("case_sensitive", True):
+        return predictions, substrings
+    return (
+        [prediction.lower() for prediction in predictions],
+        [substring.lower() for substring in substrings],
+    )
+
+
+def _bulk_substrings(settings_values: Dict[str, Any]) -> List[str]:
+    return [
+        substring.strip()
+        for substring in settings_values.get("substrings", "").split(",")
+    ]
+
+
+def _bulk_starts_with(
+    predictions: List[str], _: List[None], settings_values: Dict[str, Any]
+) -> List[bool]:
+    predictions, (prefix,) = _bulk_case(
+        predictions, [settings_values.get("prefix", "")], settings_values
+    )
+    return [prediction.startswith(prefix) for prediction in predictions]
+
+
+def _bulk_ends_with(
+    predictions: List[str], _: List[None], settings_values: Dict[str, Any]
+) -> List[bool]:
+    predictions, (suffix,) = _bulk_case(
+        predictions, [settings_values.get("suffix", "")], settings_values
+    )
+    return [prediction.endswith(suffix) for prediction in predictions]
+
+
+def _bulk_contains(
+    predictions: List[str], _: List[None], settings_values: Dict[str, Any]
+) -> List[bool]:
+    predictions, (substring,) = _bulk_case(
+        predictions, [settings_values.get("substring", "")], settings_values
+    )
+    return [substring in prediction for prediction in predictions]
+
+
+def _bulk_contains_any(
+    predictions: List[str], _: List[None], settings_values: Dict[str, Any]
+) -> List[bool]:
+    predictions, substrings = _bulk_case(
+        predictions, _bulk_substrings(settings_values), settings_values
+    )
+    return [
+        any(substring in prediction for substring in substrings)
+        for prediction in predictions
+    ]
+
+
+def _bulk_contains_all(
+    predictions: List[str], _: List[None], settings_values: Dict[str, Any]
+) -> List[bool]:
+    predictions, substrings = _bulk_case(
+        predictions, _bulk_substrings(settings_values), settings_values
+    )
+    return [
+        all(substring in prediction for substring in substrings)
+        for prediction in predictions
+    ]
+
+
+def _bulk_similarity_match(
+    predictions: List[str], ground_truths: List[str], settings_values: Dict[str, Any]
+) -> List[bool]:
+    threshold = settings_values["similarity_threshold"]
+    results = []
+    for prediction, ground_truth in zip(predictions, ground_truths):
+        prediction_words, ground_truth_words = (
+            set(prediction.split()),
+            set(ground_truth.split()),
+        )
+        similarity = len(prediction_words & ground_truth_words) / len(
+            prediction_words | ground_truth_words
+        )
+        results.append(similarity > threshold)
+    return results
+
+
+async def _bulk_levenshtein_distance(
+    predictions: List[str], ground_truths: List[str], settings_values: Dict[str, Any]
+) -> List[Union[int, bool]]:
+    threshold = settings_values.get("threshold")
+    max_distance = None
+    if isinstance(threshold, (int, float)) and not isinstance(threshold, bool):
+        # The exact distance is not needed beyond the threshold
+        max_distance = math.floor(threshold)
+
+    length = sum(len(prediction) for prediction in predictions) + sum(
+        len(ground_truth) for ground_truth in ground_truths
+    )
+    if length < LEVENSHTEIN_PROCESS_POOL_MIN_LENGTH:
+        distances = string_distance.levenshtein_distances(
+            predictions, ground_truths, max_distance
+        )
+    else:
+        # The column is split in one chunk per process of the pool
+        chunk_size = math.ceil(len(predictions) / max(1, EVALUATION_PROCESS_POOL_SIZE))
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    get_process_pool(),
+                    string_distance.levenshtein_distances,
+                    predictions[start : start + chunk_size],
+                    ground_truths[start : start + chunk_size],
+                    max_distance,
+                )
+                for start in range(0, len(predictions), chunk_size)
+            )
+        )
+        distances = [distance for chunk in chunks for distance in chunk]
+
+    if "threshold" in settings_values:
+        return [distance <= threshold for distance in distances]
+    return distances
+
+
+# Deterministic evaluators that can score whole columns with evaluate_bulk: their
+# column kernel, the type of their results and whether they need the correct answer
+BULK_EVALUATORS: Dict[str, Tuple[Callable, str, bool]] = {
+    "auto_exact_match": (_bulk_exact_match, "bool", True),
+    "auto_regex_test": (_bulk_regex_test, "bool", False),
+    "auto_starts_with": (_bulk_starts_with, "text", False),
+    "auto_ends_with": (_bulk_ends_with, "bool", False),
+    "auto_contains": (_bulk_contains, "bool", False),
+    "auto_contains_any": (_bulk_contains_any, "bool", False),
+    "auto_contains_all": (_bulk_contains_all, "bool", False),
+    "auto_similarity_match": (_bulk_similarity_match, "bool", True),
+    "auto_levenshtein_distance": (_bulk_levenshtein_distance, "number", True),
+}
+
+
+async def evaluate_bulk(
+    evaluator_key: str,
+    outputs: List[Union[str, Dict[str, Any]]],
+    data_points: List[Dict[str, Any]],
+    settings_values: Dict[str, Any],
+    app_params: Optional[Dict[str, Any]] = None,
+) -> List[Result]:
+    """
+    Scores a whole column of app outputs with a deterministic evaluator.
+
+    The outputs are scored by the column kernel of the evaluator, which parses the
+    settings once per column, the Levenshtein distances of long texts being computed
+    in chunks across the process pool. The rows the kernel cannot score (e.g. outputs
+    that are not strings or missing correct answers) are scored by `evaluate`, so the
+    results, errors included, are the same as the ones of `evaluate` row by row.
+
+    Args:
+        evaluator_key (str): The key of the evaluator, one of BULK_EVALUATORS.
+        outputs (List[Union[str, Dict[str, Any]]]): The outputs of the app.
+        data_points (List[Dict[str, Any]]): The testset data points of the outputs.
+        settings_values (Dict[str, Any]): The settings of the evaluator.
+        app_params (Optional[Dict[str, Any]]): The parameters of the app variant.
+
+    Returns:
+        List[Result]: The result of each row.
+    """
+
+    if evaluator_key not in BULK_EVALUATORS:
+        raise NotImplementedError(f"Evaluator {evaluator_key} cannot run in bulk")
+
+    kernel, result_type, needs_ground_truth = BULK_EVALUATORS[evaluator_key]
+
+    results: List[Optional[Result]] = [None] * len(outputs)
+    indexes, predictions, ground_truths = [], [], []
+    for index, (output, data_point) in enumerate(zip(outputs, data_points)):
+        prediction = output.get("data", "") if isinstance(output, dict) else output
+        if not isinstance(prediction, str):
+            continue
+
+        ground_truth = None
+        if needs_ground_truth:
+            try:
+                ground_truth = get_correct_answer(data_point, settings_values)
+            except ValueError:
+                continue
+            if not isinstance(ground_truth, str) or not ground_truth:
+                continue
+
+        indexes.append(index)
+        predictions.append(prediction)
+        ground_truths.append(ground_truth)
+
+    try:
+        values = kernel(predictions, ground_truths, settings_values)
+        if asyncio.iscoroutine(values):
+            values = await values
+    except Exception:  # pylint: disable=broad-except
+        # e.g. invalid settings, whose errors are then reported row by row
+        indexes, values = [], []
+
+    for index, value in zip(indexes, values):
+        results[index] = Result(type=result_type, value=value)
+
+    remaining_indexes = [
+        index for index, result in enumerate(results) if result is None
+    ]
+    remaining_results = await asyncio.gather(
+        *(
+            evaluate(
+                evaluator_key=evaluator_key,
+                inputs=data_points[index],
+                output=outputs[index],
+                data_point=data_points[index],
+                app_params=app_params or {},
+                settings_values=settings_values,
+                lm_providers_keys={},
+            )
+            for index in remaining_indexes
+        )
+    )
+    for index, result in zip(remaining_indexes, remaining_results):
+        results[index] = result
+
+    return results
+
+
 async def run(
     evaluator_key: str, evaluator_input: EvaluatorInputInterface
 ) -> EvaluatorOutputInterface:
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+import redis.asyncio as redis
+from pydantic import ValidationError
+from redis.exceptions import RedisError
+
+from agenta_backend.models.shared_models import InvokationResult
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Invocation cache settings: the time to live of the cached results and the maximum
+# number of cached results, the least recently stored ones are evicted first
+INVOCATION_CACHE_TTL = int(
+    os.environ.get("AGENTA_INVOCATION_CACHE_TTL", 7 * 24 * 60 * 60)
+)
+INVOCATION_CACHE_MAX_ENTRIES = int(
+    os.environ.get("AGENTA_INVOCATION_CACHE_MAX_ENTRIES", 100000)
+)
+
+INVOCATION_CACHE_PREFIX = "invocation_cache:"
+INVOCATION_CACHE_INDEX = "invocation_cache_index"
+
+_redis_client = None
+
+
+def get_redis_client():
+    """
+    Returns the Redis client of the invocation cache, created once per process so that
+    its connection pool is reused across invocations.
+    """
+
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.from_url(url=os.environ.get("REDIS_URL", ""))
+    return _redis_client
+
+
+def get_cache_namespace(project_id: str, image: Any) -> Optional[str]:
+    """
+    Returns the cache namespace of the deployed code of an app variant, i.e. its image,
+    within its project, so that the results are never shared across projects.
+
+    Args:
+        project_id (str): The ID of the project of the app variant.
+        image (ImageDB): The image of the app variant.
+
+    Returns:
+        Optional[str]: The namespace, or None if the image is unknown.
+    """
+
+    if image is None or not (image.docker_id or image.tags):
+        return None
+
+    return f"{project_id}:{image.docker_id}:{image.tags}"
+
+
+def make_cache_key(namespace: str, payload: Dict[str, Any]) -> str:
+    """
+    Returns the cache key of an invocation.
+
+    Args:
+        namespace (str): The cache namespace of the app, see get_cache_namespace.
+        payload (Dict[str, Any]): The payload sent to the app, which holds both the \
+            parameters of the app variant and the inputs of the data point.
+
+    Returns:
+        str: The cache key.
+    """
+
+    digest = hashlib.sha256(
+        json.dumps(
+            {"namespace": namespace, "payload": payload},
+            sort_keys=True,
+            default=str,
+        ).encode("utf-8")
+    ).hexdigest()
+    return INVOCATION_CACHE_PREFIX + digest
+
+
+async def get_cached_invocation(key: str) -> Optional[InvokationResult]:
+    """
+    Returns the cached result of an invocation, with no cost nor latency since the app
+    is not called again.
+
+    Errors of the cache and corrupt entries are logged and treated as misses.
+
+    Args:
+        key (str): The cache key, see make_cache_key.
+
+    Returns:
+        Optional[InvokationResult]: The cached result, or None on a miss.
+    """
+
+    try:
+        cached_data = await get_redis_client().get(key)
+    except RedisError as e:
+        logger.warning(f"Could not read the invocation cache: {e}")
+        return None
+
+    if cached_data is None:
+        return None
+
+    try:
+        cached_result = InvokationResult.model_validate_json(cached_data)
+    except ValidationError as e:
+        logger.warning(f"Could not read the invocation cache entry {key}: {e}")
+        return None
+
+    return cached_result.model_copy(update={"cost": 0.0, "latency": 0.0})
+
+
+async def set_cached_invocation(key: str, invocation_result: InvokationResult) -> None:
+    """
+    Caches the result of an invocation, and evicts the oldest results when the cache
+    holds more than INVOCATION_CACHE_MAX_ENTRIES results.
+
+    Failed invocations are not cached. Errors of the cache are logged and ignored.
+
+    Args:
+        key (str): The cache key, see make_cache_key.
+        invocation_result (InvokationResult): The result of the invocation.
+    """
+
+    if invocation_result.result.error:
+        return
+
+    try:
+        now = time.time()
+        r = get_redis_client()
+        pipeline = r.pipeline()
+        pipeline.set(key, invocation_result.model_dump_json(), ex=INVOCATION_CACHE_TTL)
+        pipeline.zadd(INVOCATION_CACHE_INDEX, {key: now})
+        # Forget the results that expired
+        pipeline.zremrangebyscore(
+            INVOCATION_CACHE_INDEX, "-inf", now - INVOCATION_CACHE_TTL
+        )
+        pipeline.zcard(INVOCATION_CACHE_INDEX)
+        *_, size = await pipeline.execute()
+
+        if size > INVOCATION_CACHE_MAX_ENTRIES:
+            evicted = await r.zpopmin(
+                INVOCATION_CACHE_INDEX, size - INVOCATION_CACHE_MAX_ENTRIES
+            )
+            if evicted:
+                await r.delete(*(evicted_key for evicted_key, _ in evicted))
+
+    except RedisError as e:
+        logger.warning(f"Could not write the invocation cache: {e}")
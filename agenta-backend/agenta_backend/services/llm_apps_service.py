@@ -1,14 +1,20 @@
+import os
 import json
+import time
+import heapq
 import logging
 import asyncio
 import traceback
 import aiohttp
+from collections import deque
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
 
 
 from agenta_backend.models.shared_models import InvokationResult, Result, Error
 from agenta_backend.utils import common
+from agenta_backend.services import invocation_cache
+from agenta_backend.utils.rate_limiter import AIMDLimiter, ThroughputMeter, TokenBucket
 
 from agenta_backend.utils.common import isCloudEE
 
@@ -20,6 +26,75 @@ if isCloudEE():
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+# HTTP status codes for which the app is considered overloaded, and the invocation retried
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+# Interval between two reports of the invocation progress (in seconds)
+INVOCATION_PROGRESS_INTERVAL = 10
+
+# Connection pool of the HTTP client session used to invoke the apps
+APP_HTTP_CONNECTION_LIMIT = int(os.environ.get("AGENTA_APP_HTTP_CONNECTION_LIMIT", 100))
+APP_HTTP_CONNECTION_LIMIT_PER_HOST = int(
+    os.environ.get("AGENTA_APP_HTTP_CONNECTION_LIMIT_PER_HOST", 0)
+)  # 0 means no limit per host
+APP_HTTP_KEEPALIVE_TIMEOUT = float(
+    os.environ.get("AGENTA_APP_HTTP_KEEPALIVE_TIMEOUT", 30)
+)  # in seconds
+APP_HTTP_DNS_CACHE_TTL = int(
+    os.environ.get("AGENTA_APP_HTTP_DNS_CACHE_TTL", 300)
+)  # in seconds
+
+_client_session: Optional[aiohttp.ClientSession] = None
+_client_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_client_session() -> aiohttp.ClientSession:
+    """
+    Returns the HTTP client session shared by the app invocations of the running event loop.
+
+    The session pools its connections, keeps them alive between requests and caches
+    DNS lookups, so that invoking a deployment for every testset row does not open a
+    new connection (and TLS handshake) per row. It lives as long as the event loop,
+    i.e. the Celery worker, until close_client_session is called.
+
+    Returns:
+        aiohttp.ClientSession: The shared client session.
+    """
+
+    global _client_session, _client_session_loop
+
+    loop = asyncio.get_running_loop()
+    if (
+        _client_session is None
+        or _client_session.closed
+        or _client_session_loop is not loop  # sessions are bound to their event loop
+    ):
+        connector = aiohttp.TCPConnector(
+            limit=APP_HTTP_CONNECTION_LIMIT,
+            limit_per_host=APP_HTTP_CONNECTION_LIMIT_PER_HOST,
+            keepalive_timeout=APP_HTTP_KEEPALIVE_TIMEOUT,
+            use_dns_cache=True,
+            ttl_dns_cache=APP_HTTP_DNS_CACHE_TTL,
+        )
+        _client_session = aiohttp.ClientSession(connector=connector)
+        _client_session_loop = loop
+
+    return _client_session
+
+
+async def close_client_session() -> None:
+    """
+    Closes the HTTP client session shared by the app invocations, if any.
+    """
+
+    global _client_session, _client_session_loop
+
+    if _client_session is not None and not _client_session.closed:
+        await _client_session.close()
+
+    _client_session = None
+    _client_session_loop = None
+
 
 def get_nested_value(d: dict, keys: list, default=None):
     """
@@ -175,6 +250,7 @@ async def invoke_app(
     openapi_parameters: List[Dict],
     user_id: str,
     project_id: str,
+    cache_namespace: Optional[str] = None,
 ) -> InvokationResult:
     """
     Invokes an app for one datapoint using the openapi_parameters to determine
@@ -185,6 +261,9 @@ async def invoke_app(
         datapoint (Any): The data to be sent to the app.
         parameters (Dict): The parameters required by the app taken from the db.
         openapi_parameters (List[Dict]): The OpenAPI parameters of the app.
+        cache_namespace (Optional[str]): The cache namespace of the deployed app (see \
+            invocation_cache.get_cache_namespace). When set, the result is looked up \
+            in and stored to the invocation cache.
 
     Returns:
         InvokationResult: The output of the app.
@@ -195,6 +274,14 @@ async def invoke_app(
     url = f"{uri}/generate"
     payload = await make_payload(datapoint, parameters, openapi_parameters)
 
+    cache_key = None
+    if cache_namespace is not None:
+        cache_key = invocation_cache.make_cache_key(cache_namespace, payload)
+        cached_result = await invocation_cache.get_cached_invocation(cache_key)
+        if cached_result is not None:
+            logger.debug(f"Invocation cache hit for app {uri}")
+            return cached_result
+
     headers = None
 
     if isCloudEE():
@@ -202,71 +289,78 @@ async def invoke_app(
 
         headers = {"Authorization": f"Secret {secret_token}"}
 
-    async with aiohttp.ClientSession() as client:
-        app_response = {}
+    client = get_client_session()
+    app_response = {}
+    status_code = None
 
-        try:
-            logger.debug(f"Invoking app {uri} with payload {payload}")
-            response = await client.post(
-                url,
-                json=payload,
-                headers=headers,
-                timeout=900,
-            )
+    try:
+        logger.debug(f"Invoking app {uri} with payload {payload}")
+        async with client.post(
+            url,
+            json=payload,
+            headers=headers,
+            timeout=900,
+        ) as response:
             app_response = await response.json()
             response.raise_for_status()
 
-            value, kind, cost, latency = extract_result_from_response(app_response)
+        value, kind, cost, latency = extract_result_from_response(app_response)
 
-            return InvokationResult(
-                result=Result(
-                    type=kind,
-                    value=value,
-                    error=None,
-                ),
-                latency=latency,
-                cost=cost,
-            )
+        invocation_result = InvokationResult(
+            result=Result(
+                type=kind,
+                value=value,
+                error=None,
+            ),
+            latency=latency,
+            cost=cost,
+        )
+        if cache_key is not None:
+            await invocation_cache.set_cached_invocation(cache_key, invocation_result)
 
-        except aiohttp.ClientResponseError as e:
-            error_message = app_response.get("detail", {}).get(
-                "error", f"HTTP error {e.status}: {e.message}"
-            )
-            stacktrace = app_response.get("detail", {}).get(
-                "traceback", "".join(traceback.format_exception_only(type(e), e))
-            )
-            logger.error(f"HTTP error occurred during request: {error_message}")
-            common.capture_exception_in_sentry(e)
-        except aiohttp.ServerTimeoutError as e:
-            error_message = "Request timed out"
-            stacktrace = "".join(traceback.format_exception_only(type(e), e))
-            logger.error(error_message)
-            common.capture_exception_in_sentry(e)
-        except aiohttp.ClientConnectionError as e:
-            error_message = f"Connection error: {str(e)}"
-            stacktrace = "".join(traceback.format_exception_only(type(e), e))
-            logger.error(error_message)
-            common.capture_exception_in_sentry(e)
-        except json.JSONDecodeError as e:
-            error_message = "Failed to decode JSON from response"
-            stacktrace = "".join(traceback.format_exception_only(type(e), e))
-            logger.error(error_message)
-            common.capture_exception_in_sentry(e)
-        except Exception as e:
-            error_message = f"Unexpected error: {str(e)}"
-            stacktrace = "".join(traceback.format_exception_only(type(e), e))
-            logger.error(error_message)
-            common.capture_exception_in_sentry(e)
+        return invocation_result
 
-        return InvokationResult(
-            result=Result(
-                type="error",
-                error=Error(
-                    message=error_message,
-                    stacktrace=stacktrace,
-                ),
-            )
+    except aiohttp.ClientResponseError as e:
+        status_code = e.status
+        error_message = app_response.get("detail", {}).get(
+            "error", f"HTTP error {e.status}: {e.message}"
+        )
+        stacktrace = app_response.get("detail", {}).get(
+            "traceback", "".join(traceback.format_exception_only(type(e), e))
         )
+        logger.error(f"HTTP error occurred during request: {error_message}")
+        common.capture_exception_in_sentry(e)
+    except aiohttp.ServerTimeoutError as e:
+        error_message = "Request timed out"
+        stacktrace = "".join(traceback.format_exception_only(type(e), e))
+        logger.error(error_message)
+        common.capture_exception_in_sentry(e)
+    except aiohttp.ClientConnectionError as e:
+        error_message = f"Connection error: {str(e)}"
+        stacktrace = "".join(traceback.format_exception_only(type(e), e))
+        logger.error(error_message)
+        common.capture_exception_in_sentry(e)
+    except json.JSONDecodeError as e:
+        error_message = "Failed to decode JSON from response"
+        stacktrace = "".join(traceback.format_exception_only(type(e), e))
+        logger.error(error_message)
+        common.capture_exception_in_sentry(e)
+    except Exception as e:
+        error_message = f"Unexpected error: {str(e)}"
+        stacktrace = "".join(traceback.format_exception_only(type(e), e))
+        logger.error(error_message)
+        common.capture_exception_in_sentry(e)
+
+    return InvokationResult(
+        result=Result(
+            type="error",
+            error=Error(
+                message=error_message,
+                stacktrace=stacktrace,
+            ),
+        ),
+        status_code=status_code,
+    )
 
 
 async def run_with_retry(
@@ -278,6 +372,7 @@ async def run_with_retry(
     openapi_parameters: List[Dict],
     user_id: str,
     project_id: str,
+    cache_namespace: Optional[str] = None,
 ) -> InvokationResult:
     """
     Runs the specified app with retry mechanism.
@@ -289,6 +384,7 @@ async def run_with_retry(
         max_retry_count (int): The maximum number of retries.
         retry_delay (int): The delay between retries in seconds.
         openapi_parameters (List[Dict]): The OpenAPI parameters for the app.
+        cache_namespace (Optional[str]): The cache namespace of the app, see invoke_app.
 
     Returns:
         InvokationResult: The invokation result.
@@ -306,6 +402,7 @@ async def run_with_retry(
                 openapi_parameters,
                 user_id,
                 project_id,
+                cache_namespace=cache_namespace,
             )
             return result
         except aiohttp.ClientError as e:
@@ -338,90 +435,233 @@ async def run_with_retry(
     )
 
 
-async def batch_invoke(
+def get_tokens_from_response(value: Any) -> Optional[float]:
+    """
+    Retrieves the total number of LLM tokens used by an app invocation from its response.
+
+    Args:
+        value (Any): The value of the invocation result.
+
+    Returns:
+        Optional[float]: The total number of tokens, if the response reports it.
+    """
+
+    if not isinstance(value, dict):
+        return None
+
+    if value.get("version") == "3.0":
+        nodes = get_nested_value(value, ["tree", "nodes"], [])
+        if not nodes:
+            return None
+        tokens = get_nested_value(nodes[0], ["metrics", "acc", "tokens", "total"])
+    else:
+        tokens = get_nested_value(value, ["trace", "usage", "total_tokens"])
+
+    return tokens if isinstance(tokens, (int, float)) else None
+
+
+async def stream_invoke(
     uri: str,
     testset_data: List[Dict],
     parameters: Dict,
     rate_limit_config: Dict,
     user_id: str,
     project_id: str,
-) -> List[InvokationResult]:
+    openapi_parameters: Optional[List[Dict]] = None,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cache_namespace: Optional[str] = None,
+) -> AsyncIterator[Tuple[int, InvokationResult]]:
     """
-    Invokes the LLm apps in batches, processing the testset data.
+    Invokes the LLm app for each testset data point with a sliding window of
+    in-flight requests, and yields the results as soon as they complete.
+
+    The number of in-flight requests adapts to the app (AIMD): it grows back up to
+    `batch_size` on success and is halved when the app is overloaded (HTTP 429, 502,
+    503 or 504), in which case the data point is retried after `retry_delay` seconds,
+    up to `max_retries` times. Requests are further limited by token buckets of
+    `requests_per_second` and `tokens_per_second`. When `requests_per_second` is not
+    set, it is derived from `batch_size` and `delay_between_batches`.
 
     Args:
         uri (str): The URI of the LLm app.
         testset_data (List[Dict]): The testset data to be processed.
         parameters (Dict): The parameters for the LLm app.
         rate_limit_config (Dict): The rate limit configuration.
-
-    Returns:
-        List[InvokationResult]: The list of app outputs after running all batches.
+        user_id (str): The ID of the user.
+        project_id (str): The ID of the project.
+        openapi_parameters (Optional[List[Dict]]): The OpenAPI parameters of the app, fetched if not provided.
+        on_progress (Optional[Callable]): Called with the invocation statistics every INVOCATION_PROGRESS_INTERVAL seconds.
+        cache_namespace (Optional[str]): The cache namespace of the app, see invoke_app.
+
+    Yields:
+        Tuple[int, InvokationResult]: The index of the data point and its app output, in completion order.
     """
-    batch_size = rate_limit_config[
-        "batch_size"
-    ]  # Number of testset to make in each batch
+
+    max_in_flight = max(
+        1, rate_limit_config["batch_size"]
+    )  # Maximum number of in-flight requests
     max_retries = rate_limit_config[
         "max_retries"
     ]  # Maximum number of times to retry the failed llm call
     retry_delay = rate_limit_config[
         "retry_delay"
     ]  # Delay before retrying the failed llm call (in seconds)
-    delay_between_batches = rate_limit_config[
+    delay_between_batches = rate_limit_config.get(
         "delay_between_batches"
-    ]  # Delay between batches (in seconds)
+    )  # Legacy: delay between batches (in seconds), used to derive the request rate
+    requests_per_second = rate_limit_config.get("requests_per_second") or (
+        max_in_flight / delay_between_batches if delay_between_batches else None
+    )
+    tokens_per_second = rate_limit_config.get("tokens_per_second")
 
-    list_of_app_outputs: List[
-        InvokationResult
-    ] = []  # Outputs after running all batches
+    if openapi_parameters is None:
+        headers = None
+        if isCloudEE():
+            secret_token = await sign_secret_token(user_id, project_id, None)
 
-    headers = None
-    if isCloudEE():
-        secret_token = await sign_secret_token(user_id, project_id, None)
+            headers = {"Authorization": f"Secret {secret_token}"}
 
-        headers = {"Authorization": f"Secret {secret_token}"}
+        openapi_parameters = await get_parameters_from_openapi(
+            uri + "/openapi.json",
+            headers,
+        )
 
-    openapi_parameters = await get_parameters_from_openapi(
-        uri + "/openapi.json",
-        headers,
-    )
+    limiter = AIMDLimiter(max_limit=max_in_flight, cooldown=max(retry_delay, 1))
+    requests_bucket = TokenBucket(rate=requests_per_second, capacity=max_in_flight)
+    tokens_bucket = TokenBucket(rate=tokens_per_second)
+    throughput = ThroughputMeter()
+
+    queue: Deque[Tuple[int, int]] = deque(
+        (index, 0) for index in range(len(testset_data))
+    )  # (index, attempt) of the data points waiting to be invoked
+    delayed: List[Tuple[float, int, int]] = []  # heap of throttled data points
+    in_flight: Dict[asyncio.Future, Tuple[int, int]] = {}
+    completed = 0
+    reported_at = time.monotonic()
+
+    def get_stats() -> Dict[str, Any]:
+        return {
+            "total": len(testset_data),
+            "completed": completed,
+            "in_flight": len(in_flight),
+            "queued": len(queue) + len(delayed),
+            "concurrency": limiter.limit,
+            "throughput": round(throughput.rate(), 2),
+        }
 
-    async def run_batch(start_idx: int):
-        tasks = []
-        print(f"Preparing {start_idx} batch...")
-        end_idx = min(start_idx + batch_size, len(testset_data))
-        for index in range(start_idx, end_idx):
-            task = asyncio.ensure_future(
-                run_with_retry(
-                    uri,
-                    testset_data[index],
-                    parameters,
-                    max_retries,
-                    retry_delay,
-                    openapi_parameters,
-                    user_id,
-                    project_id,
+    try:
+        while queue or delayed or in_flight:
+            now = time.monotonic()
+            while delayed and delayed[0][0] <= now:
+                _, index, attempt = heapq.heappop(delayed)
+                queue.append((index, attempt))
+
+            # Fill the window up to the current concurrency limit
+            while queue and len(in_flight) < limiter.limit:
+                await requests_bucket.acquire()
+                await tokens_bucket.acquire(0)
+
+                index, attempt = queue.popleft()
+                task = asyncio.ensure_future(
+                    run_with_retry(
+                        uri,
+                        testset_data[index],
+                        parameters,
+                        max_retries,
+                        retry_delay,
+                        openapi_parameters,
+                        user_id,
+                        project_id,
+                        cache_namespace,
+                    )
                 )
+                in_flight[task] = (index, attempt)
+
+            if not in_flight:
+                # Only throttled data points are left, wait for the first one
+                await asyncio.sleep(max(delayed[0][0] - time.monotonic(), 0))
+                continue
+
+            done, _ = await asyncio.wait(
+                in_flight.keys(),
+                timeout=(max(delayed[0][0] - time.monotonic(), 0) if delayed else None),
+                return_when=asyncio.FIRST_COMPLETED,
             )
-            tasks.append(task)
 
-        # Gather results of all tasks
-        results = await asyncio.gather(*tasks)
+            for task in done:
+                index, attempt = in_flight.pop(task)
+                result: InvokationResult = task.result()
+
+                if result.status_code in RETRYABLE_STATUS_CODES:
+                    limiter.on_overload()
+                    if attempt < max_retries:
+                        logger.info(
+                            f"App overloaded (HTTP {result.status_code}), retrying data point {index} in {retry_delay} seconds"
+                        )
+                        heapq.heappush(
+                            delayed,
+                            (time.monotonic() + retry_delay, index, attempt + 1),
+                        )
+                        continue
+                else:
+                    limiter.on_success()
+
+                tokens = get_tokens_from_response(result.result.value)
+                if tokens:
+                    tokens_bucket.consume(tokens)
+
+                completed += 1
+                throughput.record()
+                yield index, result
+
+            if time.monotonic() - reported_at >= INVOCATION_PROGRESS_INTERVAL:
+                reported_at = time.monotonic()
+                stats = get_stats()
+                logger.info(f"Invocation progress: {stats}")
+                if on_progress is not None:
+                    on_progress(stats)
+
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+    logger.info(f"Invocation finished: {get_stats()}")
+
+
+async def batch_invoke(
+    uri: str,
+    testset_data: List[Dict],
+    parameters: Dict,
+    rate_limit_config: Dict,
+    user_id: str,
+    project_id: str,
+) -> List[InvokationResult]:
+    """
+    Invokes the LLm apps for the whole testset data, see stream_invoke.
+
+    Args:
+        uri (str): The URI of the LLm app.
+        testset_data (List[Dict]): The testset data to be processed.
+        parameters (Dict): The parameters for the LLm app.
+        rate_limit_config (Dict): The rate limit configuration.
 
-        for result in results:
-            list_of_app_outputs.append(result)
-            print(f"Adding outputs to batch {start_idx}")
+    Returns:
+        List[InvokationResult]: The list of app outputs, in the order of the testset data.
+    """
 
-        # Schedule the next batch with a delay
-        next_batch_start_idx = end_idx
-        if next_batch_start_idx < len(testset_data):
-            await asyncio.sleep(delay_between_batches)
-            await run_batch(next_batch_start_idx)
+    list_of_app_outputs: List[Optional[InvokationResult]] = [None] * len(testset_data)
 
-    # Start the first batch
-    await run_batch(0)
+    async for index, result in stream_invoke(
+        uri,
+        testset_data,
+        parameters,
+        rate_limit_config,
+        user_id,
+        project_id,
+    ):
+        list_of_app_outputs[index] = result
 
-    return list_of_app_outputs
+    return list_of_app_outputs  # type: ignore
 
 
 async def get_parameters_from_openapi(
@@ -476,8 +716,8 @@ async def _get_openai_json_from_uri(
     uri: str,
     headers: Optional[Dict[str, str]],
 ):
-    async with aiohttp.ClientSession() as client:
-        resp = await client.get(uri, headers=headers, timeout=5)
+    client = get_client_session()
+    async with client.get(uri, headers=headers, timeout=5) as resp:
         resp_text = await resp.text()
         json_data = json.loads(resp_text)
         return json_data
@@ -1,11 +1,11 @@
 from uuid import UUID, uuid4
 from datetime import datetime
 from logging import getLogger, INFO
-from typing import Any, Dict, Optional, Tuple, List
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, List
 
 from pydantic import BaseModel
 
-from agenta_backend.services import db_manager
+from agenta_backend.services import db_manager, config_cache
 from agenta_backend.utils.exceptions import suppress
 from agenta_backend.services.db_manager import (
     AppDB,
@@ -30,6 +30,7 @@ from agenta_backend.services.db_manager import (
     fetch_app_environment_revision,
     fetch_app_environment_by_name_and_appid,
     fetch_app_environment_revision_by_version,
+    fetch_app_environment_config,
     list_bases_for_app_id,
     add_variant_from_base_and_config,
     update_variant_parameters,
@@ -365,6 +366,134 @@ async def _fetch_environment(
     return app_environment, app_environment_revision
 
 
+async def _fetch_environment_config(
+    project_id: str,
+    environment_ref: ReferenceDTO,
+    application_ref: Optional[ReferenceDTO] = None,
+) -> Optional[ConfigDTO]:
+    logger.warning("[HELPERS] Fetching: environment config")
+
+    row = None
+
+    with suppress():
+        # by environment_id
+        if environment_ref.id:
+            row = await fetch_app_environment_config(
+                project_id=project_id,
+                environment_revision_id=environment_ref.id.hex,
+            )
+
+        # by application_id or application_slug, environment_slug, and ...
+        elif (
+            application_ref
+            and (application_ref.id or application_ref.slug)
+            and environment_ref.slug
+        ):
+            # ... environment_version or latest environment version
+            row = await fetch_app_environment_config(
+                project_id=project_id,
+                app_id=application_ref.id.hex if application_ref.id else None,
+                app_name=application_ref.slug,
+                environment_name=environment_ref.slug,
+                version=environment_ref.version,
+            )
+
+    if not row:
+        return None
+
+    (
+        app_environment,
+        app_environment_revision,
+        version,
+        app_variant_revision,
+        app_variant,
+        app,
+        deployment,
+    ) = row
+
+    if not (app_variant_revision and app_variant and app and deployment):
+        return None
+
+    return ConfigDTO(
+        params=app_variant_revision.config_parameters,
+        url=deployment.uri,
+        #
+        application_ref=ReferenceDTO(
+            slug=app.app_name,
+            version=None,
+            id=app.id,
+        ),
+        service_ref=ReferenceDTO(
+            slug=deployment.id.hex,
+            version=None,
+            id=UUID(deployment.container_name[-(32 + 4) :]),
+        ),
+        variant_ref=ReferenceDTO(
+            slug=app_variant.config_name,
+            version=app_variant_revision.revision,
+            id=app_variant_revision.id,
+        ),
+        environment_ref=ReferenceDTO(
+            slug=app_environment.name,
+            version=version,
+            id=app_environment_revision.id,
+        ),
+        #
+        variant_lifecycle=LifecycleDTO(
+            created_at=app_variant_revision.created_at.isoformat(),
+            updated_at=app_variant.updated_at.isoformat(),
+        ),
+        environment_lifecycle=LifecycleDTO(
+            created_at=app_environment_revision.created_at.isoformat(),
+            updated_at=app_environment_revision.created_at.isoformat(),
+        ),
+    )
+
+
+async def _fetch_cached_config(
+    project_id: str,
+    refs: Dict[str, Optional[ReferenceDTO]],
+    fetch: Callable[[], Awaitable[Optional[ConfigDTO]]],
+    user_id: Optional[str] = None,
+) -> Optional[ConfigDTO]:
+    # The refs are serialized before fetching, which may fill them in
+    refs = {
+        name: ref.model_dump(mode="json") if ref else None for name, ref in refs.items()
+    }
+
+    # The generation is read before resolving the config, so that a config invalidated
+    # meanwhile is cached under a generation that is no longer read
+    generation = await config_cache.get_cache_generation(project_id)
+
+    cached_config = await config_cache.get_cached_config(project_id, refs, generation)
+
+    if cached_config:
+        config = ConfigDTO(**cached_config)
+
+    else:
+        config = await fetch()
+
+        if not config:
+            return None
+
+        await config_cache.set_cached_config(
+            project_id, refs, config.model_dump(mode="json"), generation
+        )
+
+    # The lifecycles are attributed to the requesting user, hence are not cached
+    if user_id:
+        with suppress():
+            user = await get_user_with_uid(user_uid=user_id)
+
+            for lifecycle in (config.variant_lifecycle, config.environment_lifecycle):
+                if lifecycle:
+                    lifecycle.updated_by_id = str(user.id)
+                    # DEPRECATING
+                    lifecycle.updated_by = user.email
+
+    return config
+
+
 async def _create_variant(
     project_id: str,
     user_id: str,
@@ -626,11 +755,10 @@ async def fetch_configs_by_variant_ref(
     return configs_list
 
 
-async def fetch_config_by_variant_ref(
+async def _fetch_variant_config(
     project_id: str,
     variant_ref: ReferenceDTO,
     application_ref: Optional[ReferenceDTO] = None,
-    user_id: Optional[str] = None,
 ) -> Optional[ConfigDTO]:
     logger.warning("[FETCH]   Fetching: variant")
 
@@ -663,15 +791,6 @@ async def fetch_config_by_variant_ref(
     if not app:
         return None
 
-    _user_id = None
-    _user_email = None
-
-    if user_id:
-        with suppress():
-            user = await get_user_with_uid(user_uid=user_id)
-            _user_id = str(user.id)
-            _user_email = user.email
-
     config = ConfigDTO(
         params=app_variant_revision.config_parameters,
         url=deployment.uri,
@@ -696,70 +815,50 @@ async def fetch_config_by_variant_ref(
         variant_lifecycle=LifecycleDTO(
             created_at=app_variant_revision.created_at.isoformat(),
             updated_at=app_variant.updated_at.isoformat(),
-            updated_by_id=_user_id,
-            # DEPRECATING
-            updated_by=_user_email,
         ),
     )
     return config
 
 
-async def fetch_config_by_environment_ref(
+async def fetch_config_by_variant_ref(
     project_id: str,
-    environment_ref: ReferenceDTO,
+    variant_ref: ReferenceDTO,
     application_ref: Optional[ReferenceDTO] = None,
     user_id: Optional[str] = None,
 ) -> Optional[ConfigDTO]:
-    logger.warning("[FETCH]   Fetching: environment")
-
-    app_environment, app_environment_revision = await _fetch_environment(
+    config = await _fetch_cached_config(
         project_id=project_id,
-        environment_ref=environment_ref,
-        application_ref=application_ref,
+        refs={"variant_ref": variant_ref, "application_ref": application_ref},
+        fetch=lambda: _fetch_variant_config(
+            project_id=project_id,
+            variant_ref=variant_ref,
+            application_ref=application_ref,
+        ),
+        user_id=user_id,
     )
 
-    if not (app_environment and app_environment_revision):
-        return None
+    return config
 
-    environment_ref = ReferenceDTO(
-        slug=app_environment.name,
-        version=app_environment_revision.revision,
-        id=app_environment_revision.id,
-    )
 
-    variant_ref = ReferenceDTO(
-        slug=None,
-        version=None,
-        id=app_environment_revision.deployed_app_variant_revision_id,
-    )
+async def fetch_config_by_environment_ref(
+    project_id: str,
+    environment_ref: ReferenceDTO,
+    application_ref: Optional[ReferenceDTO] = None,
+    user_id: Optional[str] = None,
+) -> Optional[ConfigDTO]:
+    logger.warning("[FETCH]   Fetching: environment config")
 
-    config = await fetch_config_by_variant_ref(
+    config = await _fetch_cached_config(
         project_id=project_id,
-        variant_ref=variant_ref,
-        application_ref=application_ref,
+        refs={"environment_ref": environment_ref, "application_ref": application_ref},
+        fetch=lambda: _fetch_environment_config(
+            project_id=project_id,
+            environment_ref=environment_ref,
+            application_ref=application_ref,
+        ),
         user_id=user_id,
     )
-    if not config:
-        return None
 
-    config.environment_ref = environment_ref
-
-    _user_id = None
-    _user_email = None
-
-    if user_id:
-        with suppress():
-            user = await get_user_with_uid(user_uid=user_id)
-            _user_id = str(user.id)
-            _user_email = user.email
-
-    config.environment_lifecycle = LifecycleDTO(
-        created_at=app_environment_revision.created_at.isoformat(),
-        updated_at=app_environment_revision.created_at.isoformat(),
-        updated_by_id=_user_id,
-        # DEPRECATING
-        updated_by=_user_email,
-    )
     return config
 
 
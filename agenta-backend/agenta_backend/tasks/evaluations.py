@@ -1,9 +1,11 @@
+import os
 import asyncio
 import logging
 import traceback
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from celery import shared_task, states
+from celery import chord, shared_task, states
+from celery.signals import worker_process_shutdown
 
 from agenta_backend.utils.common import isCloudEE
 
@@ -13,6 +15,7 @@ if isCloudEE():
 from agenta_backend.services import (
     evaluators_service,
     llm_apps_service,
+    invocation_cache,
     deployment_manager,
     aggregation_service,
 )
@@ -28,8 +31,9 @@ from agenta_backend.models.shared_models import (
     Result,
 )
 from agenta_backend.services.db_manager import (
-    create_new_evaluation_scenario,
-    fetch_app_by_id,
+    create_new_evaluation_scenarios,
+    fetch_evaluated_testcase_indexes,
+    fetch_evaluation_scenarios_outputs_and_results,
     fetch_app_variant_by_id,
     fetch_evaluator_config,
     fetch_testset_by_id,
@@ -57,6 +61,80 @@ ground_truth_keys_dict = {
     for evaluator in all_evaluators
 }
 
+# Evaluation pipeline settings: the number of concurrent workers of the scoring
+# and persistence stages and the capacity of the queues between the stages
+EVALUATION_SCORING_CONCURRENCY = int(
+    os.environ.get("AGENTA_EVALUATION_SCORING_CONCURRENCY", 10)
+)
+EVALUATION_PERSISTENCE_CONCURRENCY = int(
+    os.environ.get("AGENTA_EVALUATION_PERSISTENCE_CONCURRENCY", 2)
+)
+EVALUATION_QUEUE_SIZE = int(os.environ.get("AGENTA_EVALUATION_QUEUE_SIZE", 100))
+# Maximum number of rows buffered by a scoring worker, whose outputs are scored
+# column-wise by the deterministic evaluators (see evaluators_service.evaluate_bulk)
+EVALUATION_SCORING_BATCH_SIZE = int(
+    os.environ.get("AGENTA_EVALUATION_SCORING_BATCH_SIZE", 100)
+)
+# Maximum number of evaluation scenarios buffered by a persistence worker per write
+EVALUATION_PERSISTENCE_BATCH_SIZE = int(
+    os.environ.get("AGENTA_EVALUATION_PERSISTENCE_BATCH_SIZE", 100)
+)
+# Maximum number of concurrent runs of the evaluators of each concurrency class (see
+# evaluators_service.EVALUATOR_CONCURRENCY_CLASSES), across the rows of an evaluation
+EVALUATOR_CONCURRENCY_LIMITS = {
+    "llm": int(os.environ.get("AGENTA_EVALUATION_LLM_EVALUATOR_CONCURRENCY", 10)),
+    "embeddings": int(
+        os.environ.get("AGENTA_EVALUATION_EMBEDDINGS_EVALUATOR_CONCURRENCY", 20)
+    ),
+    "webhook": int(
+        os.environ.get("AGENTA_EVALUATION_WEBHOOK_EVALUATOR_CONCURRENCY", 20)
+    ),
+}
+# Number of testset rows evaluated by each shard task
+EVALUATION_SHARD_SIZE = int(os.environ.get("AGENTA_EVALUATION_SHARD_SIZE", 200))
+
+
+def split_rate_limit_config(
+    rate_limit_config: Dict[str, Any], shards_count: int
+) -> Dict[str, Any]:
+    """
+    Returns the rate limit configuration of each shard of an evaluation, so that the
+    shards running concurrently stay within the budget of the whole evaluation.
+
+    The request and token rates are divided across the shards. So is the number of
+    in-flight requests, at least one per shard. The request rate derived from
+    `batch_size` and `delay_between_batches` (see llm_apps_service.stream_invoke) is
+    computed from the budget of the evaluation before being divided.
+
+    Args:
+        rate_limit_config (Dict[str, Any]): The rate limit configuration of the evaluation.
+        shards_count (int): The number of shards of the evaluation.
+
+    Returns:
+        Dict[str, Any]: The rate limit configuration of each shard.
+    """
+
+    if shards_count <= 1 or not rate_limit_config:
+        return rate_limit_config
+
+    batch_size = max(1, rate_limit_config["batch_size"])
+    delay_between_batches = rate_limit_config.get("delay_between_batches")
+    requests_per_second = rate_limit_config.get("requests_per_second") or (
+        batch_size / delay_between_batches if delay_between_batches else None
+    )
+    tokens_per_second = rate_limit_config.get("tokens_per_second")
+
+    return {
+        **rate_limit_config,
+        "batch_size": max(1, batch_size // shards_count),
+        "requests_per_second": (
+            requests_per_second / shards_count if requests_per_second else None
+        ),
+        "tokens_per_second": (
+            tokens_per_second / shards_count if tokens_per_second else None
+        ),
+    }
+
 
 @shared_task(queue="agenta_backend.tasks.evaluations.evaluate", bind=True)
 def evaluate(
@@ -70,10 +148,21 @@ def evaluate(
     evaluation_id: str,
     rate_limit_config: Dict[str, int],
     lm_providers_keys: Dict[str, Any],
+    use_invocation_cache: bool = False,
 ):
     """
     Evaluates an app variant using the provided evaluators and testset, and saves the results in the database.
 
+    The testset is split into shards of EVALUATION_SHARD_SIZE rows that are evaluated in
+    parallel by `evaluate_shard` tasks, possibly on different workers, which share the
+    rate limits of the evaluation (see split_rate_limit_config). Once every shard
+    is done, the `aggregate_evaluation` callback of the chord aggregates the results and
+    sets the status of the evaluation.
+
+    The evaluation is resumable: the testset rows that already have an evaluation
+    scenario (e.g. saved before the worker running a shard crashed) are skipped, and
+    the aggregated results are computed from the scenarios saved in the database.
+
     Args:
         self: The task instance.
         app_id (str): The ID of the app.
@@ -84,6 +173,7 @@ def evaluate(
         evaluation_id (str): The ID of the evaluation.
         rate_limit_config (Dict[str, int]): Configuration for rate limiting.
         lm_providers_keys (Dict[str, Any]): Keys for language model providers.
+        use_invocation_cache (bool): Whether to reuse the cached outputs of the app for the same image, parameters and inputs.
 
     Returns:
         None
@@ -105,8 +195,131 @@ def evaluate(
             )
         )
 
+        # 1. Split the testset into shards
+        testset_db = loop.run_until_complete(fetch_testset_by_id(testset_id))
+        shard_size = max(1, EVALUATION_SHARD_SIZE)
+        testset_size = len(testset_db.csvdata)  # type: ignore
+        shards = [
+            (testcase_start, min(testcase_start + shard_size, testset_size))
+            for testcase_start in range(0, testset_size, shard_size)
+        ]
+        logger.info(
+            f"Evaluating {testset_size} rows of evaluation {evaluation_id} "
+            f"in {len(shards)} shards"
+        )
+
+        # 2. Evaluate the shards, then aggregate their results
+        shard_rate_limit_config = split_rate_limit_config(
+            rate_limit_config, len(shards)
+        )
+        chord(
+            evaluate_shard.s(
+                app_id=app_id,
+                user_id=user_id,
+                project_id=project_id,
+                variant_id=variant_id,
+                evaluators_config_ids=evaluators_config_ids,
+                testset_id=testset_id,
+                evaluation_id=evaluation_id,
+                rate_limit_config=shard_rate_limit_config,
+                lm_providers_keys=lm_providers_keys,
+                use_invocation_cache=use_invocation_cache,
+                testcase_start=testcase_start,
+                testcase_end=testcase_end,
+            )
+            for testcase_start, testcase_end in shards
+        )(
+            aggregate_evaluation.s(
+                project_id=project_id,
+                evaluators_config_ids=evaluators_config_ids,
+                evaluation_id=evaluation_id,
+            )
+        )
+
+    except Exception as e:
+        logger.error(f"An error occurred during evaluation: {e}")
+        traceback.print_exc()
+        loop.run_until_complete(
+            update_evaluation(
+                evaluation_id,
+                project_id,
+                {
+                    "status": Result(
+                        type="status",
+                        value="EVALUATION_FAILED",
+                        error=Error(
+                            message="Evaluation Failed",
+                            stacktrace=str(traceback.format_exc()),
+                        ),
+                    ).model_dump()
+                },
+            )
+        )
+        self.update_state(state=states.FAILURE)
+        return
+
+
+@shared_task(
+    queue="agenta_backend.tasks.evaluations.evaluate",
+    bind=True,
+    # Redeliver the task if the worker dies, it resumes from the saved scenarios
+    acks_late=True,
+    reject_on_worker_lost=True,
+)
+def evaluate_shard(
+    self,
+    app_id: str,
+    user_id: str,
+    project_id: str,
+    variant_id: str,
+    evaluators_config_ids: List[str],
+    testset_id: str,
+    evaluation_id: str,
+    rate_limit_config: Dict[str, int],
+    lm_providers_keys: Dict[str, Any],
+    testcase_start: int,
+    testcase_end: int,
+    use_invocation_cache: bool = False,
+) -> Dict[str, Any]:
+    """
+    Evaluates the testset rows [testcase_start, testcase_end) of an evaluation, and saves the evaluation scenarios in the database.
+
+    The progress of the shard is reported as the PROGRESS state of the task. Errors
+    are not raised but returned, so that the `aggregate_evaluation` callback always
+    runs and can fail the evaluation.
+
+    Note that the rate limit configuration applies to each shard.
+
+    Args:
+        self: The task instance.
+        app_id (str): The ID of the app.
+        user_id (str): The ID of the user.
+        project_id (str): The ID of the project.
+        variant_id (str): The ID of the app variant.
+        evaluators_config_ids (List[str]): The IDs of the evaluators configurations to be used.
+        testset_id (str): The ID of the testset.
+        evaluation_id (str): The ID of the evaluation.
+        rate_limit_config (Dict[str, int]): Configuration for rate limiting.
+        lm_providers_keys (Dict[str, Any]): Keys for language model providers.
+        testcase_start (int): The index of the first row of the shard.
+        testcase_end (int): The index after the last row of the shard.
+        use_invocation_cache (bool): Whether to reuse the cached outputs of the app for the same image, parameters and inputs.
+
+    Returns:
+        Dict[str, Any]: The shard, the number of rows evaluated and the error, if any.
+    """
+
+    loop = asyncio.get_event_loop()
+    shard = {"testcase_start": testcase_start, "testcase_end": testcase_end}
+
+    def report_progress(stats: Dict[str, Any]):
+        self.update_state(
+            state="PROGRESS",
+            meta={"evaluation_id": evaluation_id, **shard, **stats},
+        )
+
+    try:
         # 1. Fetch data from the database
-        app = loop.run_until_complete(fetch_app_by_id(app_id))
         app_variant_db = loop.run_until_complete(fetch_app_variant_by_id(variant_id))
         assert (
             app_variant_db is not None
@@ -125,28 +338,24 @@ def evaluate(
         )
         uri = deployment_manager.get_deployment_uri(uri=deployment_db.uri)  # type: ignore
 
-        # 2. Initialize vars
-        evaluators_aggregated_data = {
-            str(evaluator_config_db.id): {
-                "evaluator_key": evaluator_config_db.evaluator_key,
-                "results": [],
-            }
-            for evaluator_config_db in evaluator_config_dbs
-        }
-
-        # 3. Invoke the app
-        app_outputs: List[InvokationResult] = loop.run_until_complete(
-            llm_apps_service.batch_invoke(
-                uri,
-                testset_db.csvdata,  # type: ignore
-                app_variant_parameters,  # type: ignore
-                rate_limit_config,
-                user_id,
-                project_id,
-            )
+        # 2. Skip the testset rows evaluated by a previous run of the shard
+        evaluated_testcase_indexes = loop.run_until_complete(
+            fetch_evaluated_testcase_indexes(evaluation_id, project_id)
         )
+        testcase_indexes = [
+            index
+            for index in range(testcase_start, testcase_end)
+            if index not in evaluated_testcase_indexes
+        ]
+        if len(testcase_indexes) < testcase_end - testcase_start:
+            logger.info(
+                f"Resuming shard [{testcase_start}, {testcase_end}) of evaluation "
+                f"{evaluation_id}: {len(testcase_indexes)} rows left"
+            )
+        if not testcase_indexes:
+            return {**shard, "evaluated": 0, "error": None}
 
-        # 4. Evaluate the app outputs
+        # 3. Prepare the headers and the openapi parameters of the app
         secret_token = None
         headers = None
         if isCloudEE():
@@ -163,149 +372,113 @@ def evaluate(
             ),
         )
 
-        for data_point, app_output in zip(testset_db.csvdata, app_outputs):  # type: ignore
-            # 1. We prepare the inputs
-            logger.debug(f"Preparing inputs for data point: {data_point}")
-            list_inputs = get_app_inputs(app_variant_parameters, openapi_parameters)
-            logger.debug(f"List of inputs: {list_inputs}")
-
-            inputs = [
-                EvaluationScenarioInput(
-                    name=input_item["name"],
-                    type="text",
-                    value=data_point.get(
-                        (
-                            input_item["name"]
-                            if input_item["type"] != "messages"
-                            else "chat"
-                        ),
-                        "",
-                    ),  # TODO: We need to remove the hardcoding of chat as name for chat inputs from the FE
-                )
-                for input_item in list_inputs
-            ]
-            logger.debug(f"Inputs: {inputs}")
-
-            # 2. We skip the iteration if error invoking the llm-app
-            if app_output.result.error:
-                print("There is an error when invoking the llm app so we need to skip")
-                error_results = [
-                    EvaluationScenarioResult(
-                        evaluator_config=str(evaluator_config_db.id),
-                        result=Result(
-                            type=app_output.result.type,
-                            value=None,
-                            error=Error(
-                                message=app_output.result.error.message,
-                                stacktrace=app_output.result.error.stacktrace,
-                            ),
-                        ),
-                    )
+        # 4. Invoke the app, evaluate the app outputs and save the scenarios
+        loop.run_until_complete(
+            run_evaluation_pipeline(
+                uri=uri,
+                testset_data=testset_db.csvdata,  # type: ignore
+                app_variant_parameters=app_variant_parameters,  # type: ignore
+                openapi_parameters=openapi_parameters,
+                evaluator_config_dbs=evaluator_config_dbs,
+                evaluators_aggregated_data={
+                    str(evaluator_config_db.id): {
+                        "evaluator_key": evaluator_config_db.evaluator_key,
+                        "results": [],
+                    }
                     for evaluator_config_db in evaluator_config_dbs
-                ]
-
-                loop.run_until_complete(
-                    create_new_evaluation_scenario(
-                        project_id=project_id,
-                        evaluation_id=evaluation_id,
-                        variant_id=variant_id,
-                        inputs=inputs,
-                        outputs=[
-                            EvaluationScenarioOutput(
-                                result=Result(
-                                    type="error",
-                                    value=None,
-                                    error=Error(
-                                        message=app_output.result.error.message,
-                                        stacktrace=app_output.result.error.stacktrace,
-                                    ),
-                                )
-                            )
-                        ],
-                        correct_answers=None,
-                        is_pinned=False,
-                        note="",
-                        results=error_results,
+                },
+                rate_limit_config=rate_limit_config,
+                lm_providers_keys=lm_providers_keys,
+                user_id=user_id,
+                project_id=project_id,
+                evaluation_id=evaluation_id,
+                variant_id=variant_id,
+                testcase_indexes=testcase_indexes,
+                on_progress=report_progress,
+                cache_namespace=(
+                    invocation_cache.get_cache_namespace(
+                        project_id, app_variant_db.image
                     )
-                )
-                continue
+                    if use_invocation_cache
+                    else None
+                ),
+            )
+        )
 
-            # 3. We evaluate
-            evaluators_results: List[EvaluationScenarioResult] = []
+    except Exception as e:
+        logger.error(
+            f"An error occurred during the evaluation of shard "
+            f"[{testcase_start}, {testcase_end}): {e}"
+        )
+        traceback.print_exc()
+        return {
+            **shard,
+            "evaluated": 0,
+            "error": Error(
+                message="Evaluation Failed",
+                stacktrace=str(traceback.format_exc()),
+            ).model_dump(),
+        }
 
-            # Loop over each evaluator configuration to gather the correct answers and evaluate
-            ground_truth_column_names = []
-            for evaluator_config_db in evaluator_config_dbs:
-                ground_truth_keys = ground_truth_keys_dict.get(
-                    evaluator_config_db.evaluator_key, []
-                )
-                ground_truth_column_names.extend(
-                    evaluator_config_db.settings_values.get(key, "")
-                    for key in ground_truth_keys
-                )
-                logger.debug(f"Evaluating with evaluator: {evaluator_config_db}")
-
-                result = loop.run_until_complete(
-                    evaluators_service.evaluate(
-                        evaluator_key=evaluator_config_db.evaluator_key,
-                        output=app_output.result.value,
-                        data_point=data_point,
-                        settings_values=evaluator_config_db.settings_values,
-                        app_params=app_variant_parameters,  # type: ignore
-                        inputs=data_point,
-                        lm_providers_keys=lm_providers_keys,
-                    )
-                )
+    return {**shard, "evaluated": len(testcase_indexes), "error": None}
 
-                # Update evaluators aggregated data
-                evaluator_results: List[Result] = evaluators_aggregated_data[
-                    str(evaluator_config_db.id)
-                ]["results"]
-                evaluator_results.append(result)
 
-                result_object = EvaluationScenarioResult(
-                    evaluator_config=str(evaluator_config_db.id),
-                    result=result,
-                )
-                logger.debug(f"Result: {result_object}")
-                evaluators_results.append(result_object)
-
-            all_correct_answers = [
-                (
-                    CorrectAnswer(
-                        key=ground_truth_column_name,
-                        value=data_point[ground_truth_column_name],
-                    )
-                    if ground_truth_column_name in data_point
-                    else CorrectAnswer(key=ground_truth_column_name, value="")
-                )
-                for ground_truth_column_name in ground_truth_column_names
-            ]
+@shared_task(queue="agenta_backend.tasks.evaluations.evaluate", bind=True)
+def aggregate_evaluation(
+    self,
+    shards_results: List[Dict[str, Any]],
+    project_id: str,
+    evaluators_config_ids: List[str],
+    evaluation_id: str,
+):
+    """
+    Aggregates the results of the evaluation once all its shards are evaluated, and sets its status.
+
+    Args:
+        self: The task instance.
+        shards_results (List[Dict[str, Any]]): The results of the `evaluate_shard` tasks.
+        project_id (str): The ID of the project.
+        evaluators_config_ids (List[str]): The IDs of the evaluators configurations used.
+        evaluation_id (str): The ID of the evaluation.
 
-            # 4. We save the result of the eval scenario in the db
-            print("============ App Output ============: ", app_output.result.value)
+    Returns:
+        None
+    """
+
+    loop = asyncio.get_event_loop()
 
+    try:
+        failed_shards = [
+            shard_result for shard_result in shards_results if shard_result["error"]
+        ]
+        if failed_shards:
             loop.run_until_complete(
-                create_new_evaluation_scenario(
-                    project_id=project_id,
-                    evaluation_id=evaluation_id,
-                    variant_id=variant_id,
-                    inputs=inputs,
-                    outputs=[
-                        EvaluationScenarioOutput(
-                            result=Result(
-                                type="text", value=app_output.result.value["data"]
-                            ),
-                            latency=app_output.latency,
-                            cost=app_output.cost,
-                        )
-                    ],
-                    correct_answers=all_correct_answers,
-                    is_pinned=False,
-                    note="",
-                    results=evaluators_results,
+                update_evaluation(
+                    evaluation_id,
+                    project_id,
+                    {
+                        "status": Result(
+                            type="status",
+                            value="EVALUATION_FAILED",
+                            error=Error(**failed_shards[0]["error"]),
+                        ).model_dump()
+                    },
                 )
             )
+            self.update_state(state=states.FAILURE)
+            return
+
+        evaluator_config_dbs = []
+        for evaluator_config_id in evaluators_config_ids:
+            evaluator_config = loop.run_until_complete(
+                fetch_evaluator_config(evaluator_config_id)
+            )
+            evaluator_config_dbs.append(evaluator_config)
+
+        # Load the outputs and results of every saved scenario
+        evaluators_aggregated_data, app_outputs = loop.run_until_complete(
+            load_evaluation_results(evaluation_id, project_id, evaluator_config_dbs)
+        )
 
         # Add average cost and latency
         average_latency = aggregation_service.aggregate_float_from_llm_app_response(
@@ -329,29 +502,6 @@ def evaluate(
             )
         )
 
-    except Exception as e:
-        logger.error(f"An error occurred during evaluation: {e}")
-        traceback.print_exc()
-        loop.run_until_complete(
-            update_evaluation(
-                evaluation_id,
-                project_id,
-                {
-                    "status": Result(
-                        type="status",
-                        value="EVALUATION_FAILED",
-                        error=Error(
-                            message="Evaluation Failed",
-                            stacktrace=str(traceback.format_exc()),
-                        ),
-                    ).model_dump()
-                },
-            )
-        )
-        self.update_state(state=states.FAILURE)
-        return
-
-    try:
         aggregated_results = loop.run_until_complete(
             aggregate_evaluator_results(evaluators_aggregated_data)
         )
@@ -406,6 +556,508 @@ def evaluate(
         return
 
 
+def prepare_scenario_inputs(
+    data_point: Dict[str, Any], list_inputs: List[Dict[str, str]]
+) -> List[EvaluationScenarioInput]:
+    """
+    Prepare the evaluation scenario inputs of a testset data point.
+
+    Args:
+        data_point (Dict[str, Any]): The testset data point.
+        list_inputs (List[Dict[str, str]]): The inputs of the app, as returned by get_app_inputs.
+
+    Returns:
+        List[EvaluationScenarioInput]: The evaluation scenario inputs.
+    """
+
+    return [
+        EvaluationScenarioInput(
+            name=input_item["name"],
+            type="text",
+            value=data_point.get(
+                (input_item["name"] if input_item["type"] != "messages" else "chat"),
+                "",
+            ),  # TODO: We need to remove the hardcoding of chat as name for chat inputs from the FE
+        )
+        for input_item in list_inputs
+    ]
+
+
+async def evaluate_app_outputs_in_bulk(
+    data_points: List[Dict[str, Any]],
+    app_outputs: List[InvokationResult],
+    app_variant_parameters: Dict[str, Any],
+    evaluator_config_dbs: List[Any],
+) -> List[Dict[str, Result]]:
+    """
+    Evaluate the app outputs of several testset data points column-wise, with the
+    deterministic evaluator configurations (see evaluators_service.BULK_EVALUATORS).
+
+    Args:
+        data_points (List[Dict[str, Any]]): The testset data points.
+        app_outputs (List[InvokationResult]): The outputs of the app for the data points.
+        app_variant_parameters (Dict[str, Any]): The parameters of the app variant.
+        evaluator_config_dbs (List[EvaluatorConfigDB]): The evaluators configurations.
+
+    Returns:
+        List[Dict[str, Result]]: The results of each data point, by evaluator configuration ID (none for failed invocations).
+    """
+
+    bulk_results: List[Dict[str, Result]] = [{} for _ in app_outputs]
+
+    # The outputs of failed invocations are not evaluated
+    positions = [
+        position
+        for position, app_output in enumerate(app_outputs)
+        if not app_output.result.error
+    ]
+    if not positions:
+        return bulk_results
+
+    for evaluator_config_db in evaluator_config_dbs:
+        if evaluator_config_db.evaluator_key not in evaluators_service.BULK_EVALUATORS:
+            continue
+
+        results = await evaluators_service.evaluate_bulk(
+            evaluator_key=evaluator_config_db.evaluator_key,
+            outputs=[app_outputs[position].result.value for position in positions],
+            data_points=[data_points[position] for position in positions],
+            settings_values=evaluator_config_db.settings_values,
+            app_params=app_variant_parameters,
+        )
+        for position, result in zip(positions, results):
+            bulk_results[position][str(evaluator_config_db.id)] = result
+
+    return bulk_results
+
+
+async def evaluate_app_output(
+    data_point: Dict[str, Any],
+    app_output: InvokationResult,
+    inputs: List[EvaluationScenarioInput],
+    app_variant_parameters: Dict[str, Any],
+    evaluator_config_dbs: List[Any],
+    evaluators_aggregated_data: Dict[str, Any],
+    lm_providers_keys: Dict[str, Any],
+    evaluator_semaphores: Optional[Dict[str, asyncio.Semaphore]] = None,
+    bulk_results: Optional[Dict[str, Result]] = None,
+) -> Dict[str, Any]:
+    """
+    Evaluate the app output of a testset data point with every evaluator configuration.
+
+    The cheap evaluators run inline, while the evaluators that call external services
+    run concurrently, each under the semaphore of its concurrency class. The results
+    already computed in bulk (see evaluate_app_outputs_in_bulk) are reused.
+
+    Args:
+        data_point (Dict[str, Any]): The testset data point.
+        app_output (InvokationResult): The output of the app for the data point.
+        inputs (List[EvaluationScenarioInput]): The evaluation scenario inputs.
+        app_variant_parameters (Dict[str, Any]): The parameters of the app variant.
+        evaluator_config_dbs (List[EvaluatorConfigDB]): The evaluators configurations.
+        evaluators_aggregated_data (Dict[str, Any]): The evaluators aggregated data, updated in place.
+        lm_providers_keys (Dict[str, Any]): Keys for language model providers.
+        evaluator_semaphores (Optional[Dict[str, asyncio.Semaphore]]): The semaphores of the evaluator concurrency classes, shared across rows.
+        bulk_results (Optional[Dict[str, Result]]): The results computed in bulk, by evaluator configuration ID.
+
+    Returns:
+        Dict[str, Any]: The fields of the evaluation scenario to save.
+    """
+
+    # 1. We skip the evaluation if error invoking the llm-app
+    if app_output.result.error:
+        logger.debug("There is an error when invoking the llm app so we need to skip")
+        error = Error(
+            message=app_output.result.error.message,
+            stacktrace=app_output.result.error.stacktrace,
+        )
+        return {
+            "inputs": inputs,
+            "outputs": [
+                EvaluationScenarioOutput(
+                    result=Result(type="error", value=None, error=error)
+                )
+            ],
+            "correct_answers": None,
+            "results": [
+                EvaluationScenarioResult(
+                    evaluator_config=str(evaluator_config_db.id),
+                    result=Result(type=app_output.result.type, value=None, error=error),
+                )
+                for evaluator_config_db in evaluator_config_dbs
+            ],
+        }
+
+    # 2. We evaluate
+    evaluators_results: List[EvaluationScenarioResult] = []
+    evaluator_semaphores = evaluator_semaphores or {}
+    bulk_results = bulk_results or {}
+
+    async def run_evaluator(evaluator_config_db) -> Result:
+        logger.debug(f"Evaluating with evaluator: {evaluator_config_db}")
+        return await evaluators_service.evaluate(
+            evaluator_key=evaluator_config_db.evaluator_key,
+            output=app_output.result.value,
+            data_point=data_point,
+            settings_values=evaluator_config_db.settings_values,
+            app_params=app_variant_parameters,  # type: ignore
+            inputs=data_point,
+            lm_providers_keys=lm_providers_keys,
+        )
+
+    async def run_limited_evaluator(evaluator_config_db) -> Result:
+        semaphore = evaluator_semaphores.get(
+            evaluators_service.get_evaluator_concurrency_class(
+                evaluator_config_db.evaluator_key
+            )
+        )
+        if semaphore is None:
+            return await run_evaluator(evaluator_config_db)
+
+        async with semaphore:
+            return await run_evaluator(evaluator_config_db)
+
+    # Start the network evaluators, then run the cheap ones while they are in flight
+    evaluator_tasks = {
+        str(evaluator_config_db.id): asyncio.ensure_future(
+            run_limited_evaluator(evaluator_config_db)
+        )
+        for evaluator_config_db in evaluator_config_dbs
+        if evaluators_service.get_evaluator_concurrency_class(
+            evaluator_config_db.evaluator_key
+        )
+    }
+    inline_results = {
+        str(evaluator_config_db.id): (
+            bulk_results[str(evaluator_config_db.id)]
+            if str(evaluator_config_db.id) in bulk_results
+            else await run_evaluator(evaluator_config_db)
+        )
+        for evaluator_config_db in evaluator_config_dbs
+        if str(evaluator_config_db.id) not in evaluator_tasks
+    }
+    evaluators_results_by_config = {
+        **inline_results,
+        **dict(
+            zip(
+                evaluator_tasks.keys(),
+                await asyncio.gather(*evaluator_tasks.values()),
+            )
+        ),
+    }
+
+    # Loop over each evaluator configuration to gather the correct answers and results
+    ground_truth_column_names = []
+    for evaluator_config_db in evaluator_config_dbs:
+        ground_truth_keys = ground_truth_keys_dict.get(
+            evaluator_config_db.evaluator_key, []
+        )
+        ground_truth_column_names.extend(
+            evaluator_config_db.settings_values.get(key, "")
+            for key in ground_truth_keys
+        )
+
+        result = evaluators_results_by_config[str(evaluator_config_db.id)]
+
+        # Update evaluators aggregated data
+        evaluator_results: List[Result] = evaluators_aggregated_data[
+            str(evaluator_config_db.id)
+        ]["results"]
+        evaluator_results.append(result)
+
+        result_object = EvaluationScenarioResult(
+            evaluator_config=str(evaluator_config_db.id),
+            result=result,
+        )
+        logger.debug(f"Result: {result_object}")
+        evaluators_results.append(result_object)
+
+    all_correct_answers = [
+        (
+            CorrectAnswer(
+                key=ground_truth_column_name,
+                value=data_point[ground_truth_column_name],
+            )
+            if ground_truth_column_name in data_point
+            else CorrectAnswer(key=ground_truth_column_name, value="")
+        )
+        for ground_truth_column_name in ground_truth_column_names
+    ]
+
+    return {
+        "inputs": inputs,
+        "outputs": [
+            EvaluationScenarioOutput(
+                result=Result(type="text", value=app_output.result.value["data"]),
+                latency=app_output.latency,
+                cost=app_output.cost,
+            )
+        ],
+        "correct_answers": all_correct_answers,
+        "results": evaluators_results,
+    }
+
+
+async def run_evaluation_pipeline(
+    uri: str,
+    testset_data: List[Dict[str, Any]],
+    app_variant_parameters: Dict[str, Any],
+    openapi_parameters: List[Dict],
+    evaluator_config_dbs: List[Any],
+    evaluators_aggregated_data: Dict[str, Any],
+    rate_limit_config: Dict[str, int],
+    lm_providers_keys: Dict[str, Any],
+    user_id: str,
+    project_id: str,
+    evaluation_id: str,
+    variant_id: str,
+    testcase_indexes: Optional[List[int]] = None,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cache_namespace: Optional[str] = None,
+) -> List[Optional[InvokationResult]]:
+    """
+    Invokes the app, evaluates its outputs and saves the evaluation scenarios as a
+    streaming pipeline.
+
+    The invocation stage keeps a sliding window of requests in flight (see
+    llm_apps_service.stream_invoke) while the other stages run their own pool of
+    workers. Each stage hands the rows over to the next one through a bounded queue,
+    so a row is scored and saved as soon as its invocation completes, and a slow
+    stage applies backpressure to the previous ones. The time of the evaluation is
+    therefore close to the time of the slowest stage instead of the sum of the three
+    stages.
+
+    Args:
+        uri (str): The URI of the app.
+        testset_data (List[Dict[str, Any]]): The testset data points.
+        app_variant_parameters (Dict[str, Any]): The parameters of the app variant.
+        openapi_parameters (List[Dict]): The OpenAPI parameters of the app.
+        evaluator_config_dbs (List[EvaluatorConfigDB]): The evaluators configurations.
+        evaluators_aggregated_data (Dict[str, Any]): The evaluators aggregated data, updated in place.
+        rate_limit_config (Dict[str, int]): Configuration for rate limiting.
+        lm_providers_keys (Dict[str, Any]): Keys for language model providers.
+        user_id (str): The ID of the user.
+        project_id (str): The ID of the project.
+        evaluation_id (str): The ID of the evaluation.
+        variant_id (str): The ID of the app variant.
+        testcase_indexes (Optional[List[int]]): The indexes of the testset rows to evaluate, all of them by default.
+        on_progress (Optional[Callable]): Called with the invocation statistics, see llm_apps_service.stream_invoke.
+        cache_namespace (Optional[str]): The invocation cache namespace of the app, see llm_apps_service.invoke_app.
+
+    Returns:
+        List[Optional[InvokationResult]]: The outputs of the app, in the order of the testset (None for the rows that were not evaluated).
+    """
+
+    scoring_concurrency = max(1, EVALUATION_SCORING_CONCURRENCY)
+    persistence_concurrency = max(1, EVALUATION_PERSISTENCE_CONCURRENCY)
+
+    list_inputs = get_app_inputs(app_variant_parameters, openapi_parameters)
+    logger.debug(f"List of inputs: {list_inputs}")
+
+    evaluator_semaphores = {
+        concurrency_class: asyncio.Semaphore(max(1, limit))
+        for concurrency_class, limit in EVALUATOR_CONCURRENCY_LIMITS.items()
+    }
+
+    if testcase_indexes is None:
+        testcase_indexes = list(range(len(testset_data)))
+
+    app_outputs: List[Optional[InvokationResult]] = [None] * len(testset_data)
+
+    scoring_queue: asyncio.Queue = asyncio.Queue(maxsize=EVALUATION_QUEUE_SIZE)
+    persistence_queue: asyncio.Queue = asyncio.Queue(maxsize=EVALUATION_QUEUE_SIZE)
+
+    async def invoke_worker():
+        async for position, app_output in llm_apps_service.stream_invoke(
+            uri,
+            [testset_data[index] for index in testcase_indexes],
+            app_variant_parameters,
+            rate_limit_config,
+            user_id,
+            project_id,
+            openapi_parameters=openapi_parameters,
+            on_progress=on_progress,
+            cache_namespace=cache_namespace,
+        ):
+            index = testcase_indexes[position]
+            app_outputs[index] = app_output
+            await scoring_queue.put((index, app_output))
+
+    async def scoring_worker():
+        finished = False
+        while not finished:
+            # Wait for a row, then buffer the ones that are already queued, so that
+            # the deterministic evaluators score their outputs column-wise
+            items = []
+            item = await scoring_queue.get()
+            while item is not None:
+                items.append(item)
+                if len(items) >= EVALUATION_SCORING_BATCH_SIZE or scoring_queue.empty():
+                    break
+                item = scoring_queue.get_nowait()
+
+            finished = item is None
+            if not items:
+                continue
+
+            bulk_results = await evaluate_app_outputs_in_bulk(
+                data_points=[testset_data[index] for index, _ in items],
+                app_outputs=[app_output for _, app_output in items],
+                app_variant_parameters=app_variant_parameters,
+                evaluator_config_dbs=evaluator_config_dbs,
+            )
+            for (index, app_output), row_bulk_results in zip(items, bulk_results):
+                data_point = testset_data[index]
+                scenario = await evaluate_app_output(
+                    data_point=data_point,
+                    app_output=app_output,
+                    inputs=prepare_scenario_inputs(data_point, list_inputs),
+                    app_variant_parameters=app_variant_parameters,
+                    evaluator_config_dbs=evaluator_config_dbs,
+                    evaluators_aggregated_data=evaluators_aggregated_data,
+                    lm_providers_keys=lm_providers_keys,
+                    evaluator_semaphores=evaluator_semaphores,
+                    bulk_results=row_bulk_results,
+                )
+                scenario["testcase_index"] = index
+                await persistence_queue.put(scenario)
+
+    async def persistence_worker():
+        finished = False
+        while not finished:
+            # Wait for a scenario, then buffer the ones that are already queued
+            scenarios = []
+            scenario = await persistence_queue.get()
+            while scenario is not None:
+                scenarios.append(scenario)
+                if (
+                    len(scenarios) >= EVALUATION_PERSISTENCE_BATCH_SIZE
+                    or persistence_queue.empty()
+                ):
+                    break
+                scenario = persistence_queue.get_nowait()
+
+            finished = scenario is None
+            if scenarios:
+                await create_new_evaluation_scenarios(
+                    project_id=project_id,
+                    evaluation_id=evaluation_id,
+                    variant_id=variant_id,
+                    evaluation_scenarios=scenarios,
+                )
+
+    async def run_stage(
+        worker,
+        concurrency: int,
+        next_queue: Optional[asyncio.Queue] = None,
+        next_concurrency: int = 0,
+    ):
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+        # Signal the end of the rows to each worker of the next stage
+        if next_queue is not None:
+            for _ in range(next_concurrency):
+                await next_queue.put(None)
+
+    stages = [
+        asyncio.ensure_future(
+            run_stage(
+                invoke_worker,
+                1,
+                scoring_queue,
+                scoring_concurrency,
+            )
+        ),
+        asyncio.ensure_future(
+            run_stage(
+                scoring_worker,
+                scoring_concurrency,
+                persistence_queue,
+                persistence_concurrency,
+            )
+        ),
+        asyncio.ensure_future(run_stage(persistence_worker, persistence_concurrency)),
+    ]
+
+    # Fail fast: if a stage raises, the other stages would block forever on their queues
+    done, pending = await asyncio.wait(stages, return_when=asyncio.FIRST_EXCEPTION)
+    for stage in pending:
+        stage.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    for stage in done:
+        stage.result()
+
+    return app_outputs
+
+
+async def load_evaluation_results(
+    evaluation_id: str, project_id: str, evaluator_config_dbs: List[Any]
+) -> Tuple[Dict[str, Any], List[InvokationResult]]:
+    """
+    Load the evaluators results and the app outputs of the saved evaluation scenarios.
+
+    Args:
+        evaluation_id (str): The ID of the evaluation.
+        project_id (str): The ID of the project.
+        evaluator_config_dbs (List[EvaluatorConfigDB]): The evaluators configurations.
+
+    Returns:
+        Tuple[Dict[str, Any], List[InvokationResult]]: The evaluators aggregated data and the app outputs.
+    """
+
+    evaluators_aggregated_data = {
+        str(evaluator_config_db.id): {
+            "evaluator_key": evaluator_config_db.evaluator_key,
+            "results": [],
+        }
+        for evaluator_config_db in evaluator_config_dbs
+    }
+    app_outputs: List[InvokationResult] = []
+
+    evaluation_scenarios = await fetch_evaluation_scenarios_outputs_and_results(
+        evaluation_id, project_id
+    )
+    for evaluation_scenario in evaluation_scenarios:
+        output = EvaluationScenarioOutput(**evaluation_scenario.outputs[0])
+        app_outputs.append(
+            InvokationResult(
+                result=output.result, latency=output.latency, cost=output.cost
+            )
+        )
+
+        # The results of failed invocations are not aggregated
+        if output.result.error:
+            continue
+
+        for scenario_result in evaluation_scenario.results:
+            evaluator_config_id = str(scenario_result.evaluator_config_id)
+            if evaluator_config_id in evaluators_aggregated_data:
+                evaluators_aggregated_data[evaluator_config_id]["results"].append(
+                    Result(**scenario_result.result)
+                )
+
+    return evaluators_aggregated_data, app_outputs
+
+
+@worker_process_shutdown.connect
+def close_app_client_session(**kwargs):
+    """
+    Closes the HTTP client session shared by the app invocations when the worker process exits.
+    """
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(llm_apps_service.close_client_session())
+
+
+@worker_process_shutdown.connect
+def shutdown_evaluators_process_pool(**kwargs):
+    """
+    Shuts the process pool of the evaluators down when the worker process exits.
+    """
+
+    evaluators_service.shutdown_process_pool()
+
+
 async def aggregate_evaluator_results(
     evaluators_aggregated_data: dict,
 ) -> List[AggregatedResult]:
@@ -0,0 +1,157 @@
+"""
+Benchmark of the raw-nodes analytics query against a seeded `nodes` table.
+
+Seeds a scratch project with a few million nodes spread over 30 days (10% of them with
+an exception), then compares the total and error buckets computed with two scans, as
+the analytics query used to, and with a single scan with conditional aggregates. The
+seeded nodes are deleted at the end.
+
+    POSTGRES_URI=postgresql+asyncpg://... \\
+        python -m agenta_backend.tests.benchmarks.bench_analytics_query --rows 3000000
+"""
+
+import time
+import asyncio
+import argparse
+from json import loads
+from uuid import uuid4
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, text
+from sqlalchemy.future import select
+from sqlalchemy.dialects import postgresql
+
+from agenta_backend.dbs.postgres.shared.engine import engine
+from agenta_backend.dbs.postgres.observability.dbes import NodesDBE
+from agenta_backend.dbs.postgres.observability.dao import _metrics_aggregates
+
+
+SEED_QUERY = """
+INSERT INTO nodes (
+    project_id, created_at, root_id, tree_id, node_id, node_name, parent_id,
+    time_start, time_end, metrics, exception
+)
+SELECT
+    :project_id,
+    CAST(:newest AS TIMESTAMPTZ) - random() * interval '30 days',
+    gen_random_uuid(),
+    gen_random_uuid(),
+    gen_random_uuid(),
+    'span',
+    CASE WHEN i % 5 = 0 THEN NULL ELSE gen_random_uuid() END,
+    now(),
+    now(),
+    jsonb_build_object(
+        'unit.duration.total', random() * 1000,
+        'unit.costs.total', random() / 100,
+        'unit.tokens.total', (random() * 1000)::int,
+        'acc.duration.total', random() * 5000,
+        'acc.costs.total', random() / 20,
+        'acc.tokens.total', (random() * 5000)::int
+    ),
+    CASE WHEN i % 10 = 0 THEN '{"type": "Error"}'::jsonb ELSE NULL END
+FROM generate_series(1, :rows) AS i
+"""
+
+
+def build_queries(project_id, oldest, newest, focus):
+    _timestamp = func.date_bin(
+        text("'1 hour'"),
+        NodesDBE.created_at,
+        oldest,
+    ).label("timestamp")
+
+    def scoped(query):
+        query = query.select_from(NodesDBE).filter_by(project_id=project_id)
+        query = query.filter(
+            NodesDBE.created_at >= oldest,
+            NodesDBE.created_at < newest,
+        )
+        if focus == "tree":
+            query = query.filter_by(parent_id=None)
+        return query.group_by("timestamp")
+
+    aggregates = _metrics_aggregates(focus)
+
+    total_query = scoped(select(*aggregates[:4], _timestamp))
+    error_query = scoped(select(*aggregates[:4], _timestamp)).filter(
+        NodesDBE.exception.isnot(None)
+    )
+    single_query = scoped(select(*aggregates, _timestamp))
+
+    return [total_query, error_query], [single_query]
+
+
+async def run(queries, repeat):
+    timings = []
+    buffers = 0
+
+    async with engine.session() as session:
+        connection = await session.connection()
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for query in queries:
+                await session.execute(query)
+            timings.append(time.perf_counter() - start)
+
+        for query in queries:
+            sql = str(
+                query.compile(
+                    dialect=postgresql.dialect(),
+                    compile_kwargs={"literal_binds": True},
+                )
+            )
+            plan = (
+                await connection.exec_driver_sql(
+                    "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql
+                )
+            ).scalar()
+            plan = (loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+            buffers += plan.get("Shared Hit Blocks", 0) + plan.get(
+                "Shared Read Blocks", 0
+            )
+
+    return min(timings), buffers
+
+
+async def main(rows: int, repeat: int):
+    project_id = uuid4()
+    newest = datetime.now(timezone.utc)
+    oldest = newest - timedelta(days=30)
+
+    async with engine.session() as session:
+        print(f"Seeding {rows} nodes...")
+        await session.execute(
+            text(SEED_QUERY),
+            {"project_id": project_id, "newest": newest, "rows": rows},
+        )
+        await session.commit()
+        await session.execute(text("ANALYZE nodes"))
+
+    try:
+        for focus in ("node", "tree"):
+            two_scans, single_scan = build_queries(project_id, oldest, newest, focus)
+
+            for name, queries in [("two scans", two_scans), ("FILTER", single_scan)]:
+                seconds, buffers = await run(queries, repeat)
+                print(
+                    f"focus={focus:<4} {name:>9}: {seconds * 1000:8.1f} ms,"
+                    f" {buffers} buffers, {len(queries)} round-trip(s)"
+                )
+    finally:
+        async with engine.session() as session:
+            await session.execute(
+                text("DELETE FROM nodes WHERE project_id = :project_id"),
+                {"project_id": project_id},
+            )
+            await session.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=3_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rows, args.repeat))
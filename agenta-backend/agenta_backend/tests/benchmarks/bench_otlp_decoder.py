@@ -0,0 +1,140 @@
+"""
+Micro-benchmark of the OTLP decoder of the observability receiver.
+
+Decodes OTLP payloads shaped like the traces exported by the SDK, with the current
+decoder and with the previous one, which found the type of each attribute value with
+MessageToDict and round-tripped the timestamps through ISO strings.
+
+    python -m agenta_backend.tests.benchmarks.bench_otlp_decoder
+"""
+
+import os
+import timeit
+from datetime import datetime
+
+from google.protobuf.json_format import MessageToDict
+
+import agenta_backend.apis.fastapi.observability.opentelemetry.traces_proto as Trace_Proto
+from agenta_backend.apis.fastapi.observability.opentelemetry.otlp import (
+    _parse_attributes,
+    _parse_timestamp,
+    parse_otlp_stream,
+)
+
+
+def _set_value(any_value, value):
+    if isinstance(value, bool):
+        any_value.bool_value = value
+    elif isinstance(value, int):
+        any_value.int_value = value
+    elif isinstance(value, float):
+        any_value.double_value = value
+    elif isinstance(value, list):
+        for item in value:
+            _set_value(any_value.array_value.values.add(), item)
+    else:
+        any_value.string_value = value
+
+
+def make_otlp_stream(spans: int = 50, trees: int = 10) -> bytes:
+    proto = Trace_Proto.TracesData()
+    scope_span = proto.resource_spans.add().scope_spans.add()
+
+    for index in range(spans):
+        span = scope_span.spans.add()
+        span.trace_id = os.urandom(16)
+        span.span_id = os.urandom(8)
+        if index % (spans // trees):
+            span.parent_span_id = os.urandom(8)
+        span.name = f"span_{index}"
+        span.kind = 1
+        span.start_time_unix_nano = 1_721_926_006_141_393_000 + index * 1_000_000
+        span.end_time_unix_nano = 1_721_926_012_513_890_000 + index * 1_000_000
+        span.status.code = 1
+
+        attributes = {
+            "ag.type.node": "chat",
+            "ag.data.inputs.country": "France",
+            "ag.data.inputs.messages": [f"message {i}" for i in range(4)],
+            "ag.data.outputs.__default__": "The capital of France is Paris. " * 8,
+            "ag.meta.configuration.model": "gpt-4o",
+            "ag.meta.configuration.temperature": 0.2,
+            "ag.meta.configuration.max_tokens": 512,
+            "ag.meta.configuration.stream": False,
+            "ag.metrics.unit.costs.total": 0.0012,
+            "ag.metrics.unit.tokens.prompt": 120,
+            "ag.metrics.unit.tokens.completion": 48,
+            "ag.metrics.unit.tokens.total": 168,
+            "ag.refs.application.id": "0190e436-818a-7c97-83b4-d7af4bd23e99",
+            "ag.refs.variant.id": "0190e436-818a-7c97-83b4-d7af4bd23e9a",
+        }
+        for key, value in attributes.items():
+            attribute = span.attributes.add()
+            attribute.key = key
+            _set_value(attribute.value, value)
+
+    return proto.SerializeToString()
+
+
+def parse_otlp_stream_with_message_to_dict(otlp_stream: bytes) -> list:
+    """
+    The previous decoder, limited to the attributes and the timestamps.
+    """
+
+    def _parse_attribute(attribute):
+        raw_value = attribute.value
+        value_type = list(MessageToDict(raw_value).keys())[0].replace("V", "_v")
+        return (attribute.key, getattr(raw_value, value_type))
+
+    def _parse_timestamp(timestamp_ns: int) -> datetime:
+        timestamp = timestamp_ns / 1_000_000_000
+        return datetime.fromisoformat(
+            datetime.fromtimestamp(timestamp).isoformat(timespec="microseconds")
+        )
+
+    proto = Trace_Proto.TracesData()
+    proto.ParseFromString(otlp_stream)
+
+    return [
+        (
+            _parse_timestamp(span.start_time_unix_nano),
+            _parse_timestamp(span.end_time_unix_nano),
+            dict(_parse_attribute(attribute) for attribute in span.attributes),
+        )
+        for resource_span in proto.resource_spans
+        for scope_span in resource_span.scope_spans
+        for span in scope_span.spans
+    ]
+
+
+def parse_otlp_stream_with_which_oneof(otlp_stream: bytes) -> list:
+    """
+    The current decoder, limited to the attributes and the timestamps.
+    """
+
+    proto = Trace_Proto.TracesData()
+    proto.ParseFromString(otlp_stream)
+
+    return [
+        (
+            _parse_timestamp(span.start_time_unix_nano),
+            _parse_timestamp(span.end_time_unix_nano),
+            _parse_attributes(span.attributes),
+        )
+        for resource_span in proto.resource_spans
+        for scope_span in resource_span.scope_spans
+        for span in scope_span.spans
+    ]
+
+
+if __name__ == "__main__":
+    otlp_stream = make_otlp_stream()
+    number = 200
+
+    for name, decoder in [
+        ("MessageToDict", parse_otlp_stream_with_message_to_dict),
+        ("WhichOneof", parse_otlp_stream_with_which_oneof),
+        ("parse_otlp_stream", parse_otlp_stream),
+    ]:
+        seconds = min(timeit.repeat(lambda: decoder(otlp_stream), number=number))
+        print(f"{name:>17}: {seconds / number * 1000:.2f} ms per 50-span payload")
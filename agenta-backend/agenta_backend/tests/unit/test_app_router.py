@@ -0,0 +1,124 @@
+import pytest
+from uuid import uuid4
+from types import SimpleNamespace
+from datetime import datetime, timezone
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from agenta_backend.routers import app_router
+from agenta_backend.services import db_manager
+
+
+def mock_engine(monkeypatch, app, rows):
+    session = AsyncMock()
+    session.execute.return_value = MagicMock(
+        **{
+            "unique.return_value.scalars.return_value.first.return_value": app,
+            "scalars.return_value.first.return_value": app,
+            "scalars.return_value.all.return_value": rows,
+        }
+    )
+
+    @asynccontextmanager
+    async def _session():
+        yield session
+
+    monkeypatch.setattr(db_manager.engine, "session", _session)
+
+    return session
+
+
+def make_variant(app_id, project_id, name):
+    return SimpleNamespace(
+        id=uuid4(),
+        app_id=app_id,
+        app=SimpleNamespace(app_name="rag"),
+        project_id=project_id,
+        variant_name=name,
+        config_name=name,
+        config_parameters={"temperature": 0.2},
+        base_name="app",
+        base_id=uuid4(),
+        base=SimpleNamespace(
+            deployment_id=uuid4(),
+            deployment=SimpleNamespace(uri="http://rag"),
+        ),
+        revision=2,
+        created_at=datetime.now(timezone.utc),
+        updated_at=datetime.now(timezone.utc),
+        modified_by_id=uuid4(),
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("count", [1, 10])
+async def test_list_environments_runs_a_fixed_number_of_queries(monkeypatch, count):
+    """
+    Test that listing the environments of an app runs the same number of queries
+    whatever the number of environments, their deployed variants being loaded with
+    them rather than one by one.
+    """
+
+    app_id, project_id = uuid4(), uuid4()
+    environments = [
+        SimpleNamespace(
+            name=f"environment-{i}",
+            app_id=app_id,
+            project_id=project_id,
+            deployed_app_variant_id=variant.id,
+            deployed_app_variant=variant,
+            deployed_app_variant_revision_id=uuid4(),
+        )
+        for i, variant in enumerate(
+            make_variant(app_id, project_id, f"variant-{i}") for i in range(count)
+        )
+    ]
+    session = mock_engine(
+        monkeypatch, SimpleNamespace(id=app_id, project_id=project_id), environments
+    )
+
+    environments_output = await app_router.list_environments(
+        app_id=str(app_id),
+        request=SimpleNamespace(state=SimpleNamespace(project_id=str(project_id))),
+    )
+
+    assert [environment.deployed_variant_name for environment in environments_output]
+    assert session.execute.await_count == 2  # app, environments
+    sql = str(
+        session.execute.await_args_list[-1]
+        .args[0]
+        .compile(dialect=postgresql.dialect())
+    )
+    assert "LEFT OUTER JOIN app_variants" in sql
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("count", [1, 10])
+async def test_list_app_variants_runs_a_fixed_number_of_queries(monkeypatch, count):
+    """
+    Test that listing the variants of an app runs the same number of queries whatever
+    the number of variants, their apps, bases and deployments being loaded with them.
+    """
+
+    app_id, project_id = uuid4(), uuid4()
+    variants = [make_variant(app_id, project_id, f"variant-{i}") for i in range(count)]
+    session = mock_engine(
+        monkeypatch, SimpleNamespace(id=app_id, project_id=project_id), variants
+    )
+
+    variants_output = await app_router.list_app_variants(
+        app_id=str(app_id),
+        request=SimpleNamespace(state=SimpleNamespace(project_id=str(project_id))),
+    )
+
+    assert len(variants_output) == count
+    assert session.execute.await_count == 2  # app, variants
+    sql = str(
+        session.execute.await_args_list[-1]
+        .args[0]
+        .compile(dialect=postgresql.dialect())
+    )
+    for table in ("app_db", "bases", "deployments"):
+        assert f"LEFT OUTER JOIN {table}" in sql
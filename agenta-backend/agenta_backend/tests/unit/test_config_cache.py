@@ -0,0 +1,64 @@
+import json
+import pytest
+from uuid import uuid4
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from agenta_backend.services import config_cache
+
+
+@pytest.mark.asyncio
+async def test_configs_resolved_before_an_invalidation_are_not_read_after_it():
+    """
+    Test that configs are cached under the cache generation read before resolving
+    them, and that invalidating the configs of a project moves it to the next
+    generation, so that a config resolved before the invalidation and cached after it
+    is not read again.
+    """
+
+    project_id = str(uuid4())
+    refs = {"environment_ref": {"slug": "production", "version": None, "id": None}}
+    hash_ = {}
+    generations = {}
+
+    redis_client = MagicMock()
+    redis_client.get = AsyncMock(side_effect=lambda key: generations.get(key))
+    redis_client.hget = AsyncMock(side_effect=lambda key, field: hash_.get(field))
+    pipeline = redis_client.pipeline.return_value
+    pipeline.hset.side_effect = lambda key, field, value: hash_.update({field: value})
+    pipeline.incr.side_effect = lambda key: generations.update(
+        {key: generations.get(key, 0) + 1}
+    )
+    pipeline.delete.side_effect = lambda key: hash_.clear()
+    pipeline.execute = AsyncMock()
+
+    with patch(
+        "agenta_backend.services.config_cache.get_redis_client",
+        return_value=redis_client,
+    ), patch("agenta_backend.services.config_cache.CONFIG_CACHE", True):
+        generation = await config_cache.get_cache_generation(project_id)
+        # The config is resolved, then invalidated before being cached
+        await config_cache.invalidate_cached_configs(project_id)
+        await config_cache.set_cached_config(
+            project_id, refs, {"params": {"temperature": 0.2}}, generation
+        )
+
+        assert generation == 0
+        assert (
+            await config_cache.get_cached_config(
+                project_id, refs, await config_cache.get_cache_generation(project_id)
+            )
+            is None
+        )
+
+        generation = await config_cache.get_cache_generation(project_id)
+        await config_cache.set_cached_config(
+            project_id, refs, {"params": {"temperature": 0.7}}, generation
+        )
+
+        assert generation == 1
+        assert await config_cache.get_cached_config(project_id, refs, generation) == {
+            "params": {"temperature": 0.7}
+        }
+
+    pipeline.incr.assert_called_once_with(f"config_cache_generation:{project_id}")
+    assert all(json.loads(value)["cached_at"] for value in hash_.values())
@@ -0,0 +1,61 @@
+import json
+import pytest
+from uuid import uuid4
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from agenta_backend.services import config_events
+
+
+@pytest.mark.asyncio
+async def test_config_events_are_published_to_and_read_from_the_project_channel():
+    """
+    Test that config events are published to the channel of their project, and that
+    subscribers read them from that channel, with None when no event is published
+    before the timeout.
+    """
+
+    project_id = str(uuid4())
+    event = {
+        "project_id": project_id,
+        "application_id": str(uuid4()),
+        "variant_slug": "default",
+        "environment_slug": "production",
+        "revision": 3,
+    }
+
+    redis_client = MagicMock()
+    redis_client.publish = AsyncMock()
+    pubsub = redis_client.pubsub.return_value
+    pubsub.subscribe = AsyncMock()
+    pubsub.unsubscribe = AsyncMock()
+    pubsub.close = AsyncMock()
+    pubsub.get_message = AsyncMock(
+        side_effect=[None, {"type": "message", "data": json.dumps(event).encode()}]
+    )
+
+    with patch(
+        "agenta_backend.services.config_events.get_redis_client",
+        return_value=redis_client,
+    ), patch("agenta_backend.services.config_events.CONFIG_EVENTS", True):
+        await config_events.publish_config_event(
+            project_id=project_id,
+            application_id=event["application_id"],
+            variant_slug="default",
+            environment_slug="production",
+            revision=3,
+        )
+
+        events = config_events.read_config_events(
+            await config_events.subscribe_config_events(project_id), timeout=15
+        )
+        received = [await events.__anext__(), await events.__anext__()]
+        await events.aclose()
+
+    channel, data = redis_client.publish.await_args.args
+    assert channel == f"config_events:{project_id}"
+    assert json.loads(data) == event
+
+    pubsub.subscribe.assert_awaited_once_with(channel)
+    assert received == [None, event]
+    pubsub.unsubscribe.assert_awaited_once()
+    pubsub.close.assert_awaited_once()
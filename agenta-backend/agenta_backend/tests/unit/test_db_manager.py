@@ -0,0 +1,35 @@
+import pytest
+from uuid import uuid4
+from unittest.mock import AsyncMock
+
+from agenta_backend.services import db_manager
+
+
+@pytest.mark.asyncio
+async def test_get_object_uuids_fetches_uncached_object_ids_at_once(monkeypatch):
+    """
+    Test that UUIDs are returned as is, that the UUIDs of legacy object ids are
+    fetched in a single query and cached, and that the least recently used ones are
+    evicted first.
+    """
+
+    object_ids = ["6741b3a9c2d5e1f6b3a9c2d5", "6741b3a9c2d5e1f6b3a9c2d6"]
+    object_uuids = {object_id: str(uuid4()) for object_id in object_ids}
+    uuid = str(uuid4())
+
+    fetch = AsyncMock(return_value=object_uuids)
+    monkeypatch.setattr(db_manager, "fetch_corresponding_object_uuids", fetch)
+    monkeypatch.setattr(db_manager, "_object_uuids", db_manager.OrderedDict())
+    monkeypatch.setattr(db_manager, "OBJECT_UUIDS_CACHE_SIZE", 1)
+
+    assert await db_manager.get_object_uuids(
+        object_ids=[uuid, *object_ids], table_name="app_db"
+    ) == {uuid: uuid, **object_uuids}
+    fetch.assert_awaited_once_with(table_name="app_db", object_ids=object_ids)
+
+    assert (
+        await db_manager.get_object_uuid(object_id=object_ids[1], table_name="app_db")
+        == object_uuids[object_ids[1]]
+    )
+    assert fetch.await_count == 1
+    assert list(db_manager._object_uuids) == [("app_db", object_ids[1])]
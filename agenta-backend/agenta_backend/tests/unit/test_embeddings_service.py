@@ -0,0 +1,142 @@
+import pytest
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+
+import httpx
+import numpy as np
+from openai import BadRequestError, RateLimitError
+
+from agenta_backend.services import embeddings_service
+
+
+def fake_embedding(text: str):
+    return [float(len(text)), float(text.count("a")) + 1.0, 2.0]
+
+
+def fake_openai_error(error_class, status_code: int):
+    return error_class(
+        message="error",
+        response=httpx.Response(
+            status_code,
+            request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"),
+        ),
+        body=None,
+    )
+
+
+def fake_embeddings_response(model, input):
+    return SimpleNamespace(
+        data=[
+            SimpleNamespace(index=index, embedding=fake_embedding(text))
+            for index, text in enumerate(input)
+        ]
+    )
+
+
+@pytest.mark.asyncio
+async def test_semantic_similarity_batcher_embeds_concurrent_rows_in_one_request():
+    """
+    Test that the semantic similarity of concurrent evaluations is computed with one
+    embeddings request, that the scores are the cosine similarities of the embeddings,
+    and that the embeddings of the ground truths are reused by later evaluations.
+    """
+
+    embeddings_service._embeddings_cache.clear()
+    predictions = [f"prediction {'a' * index}" for index in range(30)]
+    ground_truths = [f"ground truth {index % 3}" for index in range(30)]
+
+    create = AsyncMock(side_effect=fake_embeddings_response)
+    with patch.object(
+        embeddings_service,
+        "AsyncOpenAI",
+        return_value=SimpleNamespace(embeddings=SimpleNamespace(create=create)),
+    ):
+        batcher = embeddings_service.SemanticSimilarityBatcher("test_key")
+        scores = await asyncio.gather(
+            *(
+                batcher.score(prediction, ground_truth)
+                for prediction, ground_truth in zip(predictions, ground_truths)
+            )
+        )
+
+        assert create.await_count == 1
+        # Each distinct text is embedded once
+        assert len(create.await_args.kwargs["input"]) == 33
+        for prediction, ground_truth, score in zip(predictions, ground_truths, scores):
+            prediction_vector = np.array(fake_embedding(prediction))
+            ground_truth_vector = np.array(fake_embedding(ground_truth))
+            expected_score = np.dot(prediction_vector, ground_truth_vector) / (
+                np.linalg.norm(prediction_vector) * np.linalg.norm(ground_truth_vector)
+            )
+            assert score == pytest.approx(expected_score, rel=1e-5)
+
+        await batcher.score("another prediction", "ground truth 1")
+
+        assert create.await_count == 2
+        assert create.await_args.kwargs["input"] == ["another prediction"]
+
+
+@pytest.mark.asyncio
+async def test_semantic_similarity_batcher_fails_only_the_rows_that_fail():
+    """
+    Test that a row that cannot be embedded fails on its own, rather than failing
+    the other rows of its batch.
+    """
+
+    embeddings_service._embeddings_cache.clear()
+    predictions = [f"prediction {index}" for index in range(8)]
+    predictions[5] = "invalid prediction"
+
+    def create_embeddings(model, input):
+        if "invalid prediction" in input:
+            raise fake_openai_error(BadRequestError, 400)
+        return fake_embeddings_response(model, input)
+
+    create = AsyncMock(side_effect=create_embeddings)
+    with patch.object(
+        embeddings_service,
+        "AsyncOpenAI",
+        return_value=SimpleNamespace(embeddings=SimpleNamespace(create=create)),
+    ):
+        batcher = embeddings_service.SemanticSimilarityBatcher("test_key")
+        scores = await asyncio.gather(
+            *(batcher.score(prediction, "ground truth") for prediction in predictions),
+            return_exceptions=True,
+        )
+
+    assert [isinstance(score, BadRequestError) for score in scores] == [
+        index == 5 for index in range(8)
+    ]
+    # The batch is split in halves until the invalid row is isolated: 8, 4 + 4,
+    # 2 + 2, then 1 + 1 rows
+    assert create.await_count == 7
+
+
+@pytest.mark.asyncio
+async def test_semantic_similarity_batcher_fails_the_whole_batch_on_service_errors():
+    """
+    Test that an error of the embeddings service, such as a rate limit, fails the rows
+    of the batch at once, rather than splitting the batch into more failing requests.
+    """
+
+    embeddings_service._embeddings_cache.clear()
+
+    create = AsyncMock(side_effect=fake_openai_error(RateLimitError, 429))
+    with patch.object(
+        embeddings_service,
+        "AsyncOpenAI",
+        return_value=SimpleNamespace(embeddings=SimpleNamespace(create=create)),
+    ):
+        batcher = embeddings_service.SemanticSimilarityBatcher("test_key")
+        scores = await asyncio.gather(
+            *(
+                batcher.score(f"prediction {index}", "ground truth")
+                for index in range(8)
+            ),
+            return_exceptions=True,
+        )
+
+    assert all(isinstance(score, RateLimitError) for score in scores)
+    assert create.await_count == 1
+    assert not batcher.tasks
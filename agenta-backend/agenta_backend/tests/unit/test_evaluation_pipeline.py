@@ -0,0 +1,407 @@
+import pytest
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+
+from agenta_backend.services import evaluators_service
+from agenta_backend.models.shared_models import InvokationResult, Result, Error
+from agenta_backend.tasks.evaluations import (
+    aggregate_evaluation,
+    evaluate,
+    evaluate_app_output,
+    run_evaluation_pipeline,
+)
+
+
+@pytest.mark.asyncio
+async def test_run_evaluation_pipeline_scores_and_saves_every_row():
+    """
+    Test that the evaluation pipeline invokes, scores and saves every testset row.
+
+    This test mocks the app invocation, the evaluator and the scenario creation to
+    verify that each row flows through the three stages, that failed invocations are
+    saved as error scenarios without being evaluated, and that the app outputs are
+    returned in the order of the testset.
+    """
+
+    evaluator_config_db = SimpleNamespace(
+        id="evaluator-config-id",
+        evaluator_key="auto_custom_code_run",
+        settings_values={"correct_answer_key": "correct_answer"},
+    )
+    evaluators_aggregated_data = {
+        "evaluator-config-id": {"evaluator_key": "auto_custom_code_run", "results": []}
+    }
+    testset_data = [
+        {"country": f"country-{index}", "correct_answer": f"capital-{index}"}
+        for index in range(25)
+    ]
+
+    async def run_with_retry_side_effect(uri, data_point, *args):
+        if data_point["country"] == "country-3":
+            return InvokationResult(
+                result=Result(type="error", error=Error(message="App Error"))
+            )
+        return InvokationResult(
+            result=Result(type="object", value={"data": data_point["correct_answer"]}),
+            latency=0.1,
+            cost=0.01,
+        )
+
+    with patch(
+        "agenta_backend.services.llm_apps_service.run_with_retry",
+        new_callable=AsyncMock,
+    ) as mock_run_with_retry, patch(
+        "agenta_backend.services.evaluators_service.evaluate",
+        new_callable=AsyncMock,
+    ) as mock_evaluate, patch(
+        "agenta_backend.tasks.evaluations.create_new_evaluation_scenarios",
+        new_callable=AsyncMock,
+    ) as mock_create_new_evaluation_scenarios:
+        mock_run_with_retry.side_effect = run_with_retry_side_effect
+        mock_evaluate.return_value = Result(type="bool", value=True)
+
+        app_outputs = await run_evaluation_pipeline(
+            uri="http://example.com",
+            testset_data=testset_data,
+            app_variant_parameters={},
+            openapi_parameters=[{"name": "country", "type": "input"}],
+            evaluator_config_dbs=[evaluator_config_db],
+            evaluators_aggregated_data=evaluators_aggregated_data,
+            rate_limit_config={
+                "batch_size": 4,
+                "max_retries": 3,
+                "retry_delay": 1,
+                "delay_between_batches": 0,
+            },
+            lm_providers_keys={},
+            user_id="test_user",
+            project_id="test_project",
+            evaluation_id="test_evaluation",
+            variant_id="test_variant",
+        )
+
+        assert len(app_outputs) == 25
+        assert [
+            output.result.value for output in app_outputs if output.result.value
+        ] == [{"data": f"capital-{index}"} for index in range(25) if index != 3]
+        assert app_outputs[3].result.type == "error"
+        assert mock_evaluate.await_count == 24
+        assert len(evaluators_aggregated_data["evaluator-config-id"]["results"]) == 24
+        saved_scenarios = [
+            scenario
+            for call in mock_create_new_evaluation_scenarios.await_args_list
+            for scenario in call.kwargs["evaluation_scenarios"]
+        ]
+        assert len(saved_scenarios) == 25
+        assert (
+            sum(
+                scenario["outputs"][0].result.type == "error"
+                for scenario in saved_scenarios
+            )
+            == 1
+        )
+        assert sorted(
+            scenario["testcase_index"] for scenario in saved_scenarios
+        ) == list(range(25))
+
+
+@pytest.mark.asyncio
+async def test_run_evaluation_pipeline_only_evaluates_given_rows():
+    """
+    Test that the evaluation pipeline only evaluates the given testset rows.
+
+    This is how a resumed evaluation skips the rows saved by a previous run: only the
+    remaining rows are invoked, and their scenarios keep the index of their testset row.
+    """
+
+    evaluator_config_db = SimpleNamespace(
+        id="evaluator-config-id",
+        evaluator_key="auto_custom_code_run",
+        settings_values={"correct_answer_key": "correct_answer"},
+    )
+    testset_data = [
+        {"country": f"country-{index}", "correct_answer": f"capital-{index}"}
+        for index in range(10)
+    ]
+
+    with patch(
+        "agenta_backend.services.llm_apps_service.run_with_retry",
+        new_callable=AsyncMock,
+    ) as mock_run_with_retry, patch(
+        "agenta_backend.services.evaluators_service.evaluate",
+        new_callable=AsyncMock,
+    ) as mock_evaluate, patch(
+        "agenta_backend.tasks.evaluations.create_new_evaluation_scenarios",
+        new_callable=AsyncMock,
+    ) as mock_create_new_evaluation_scenarios:
+        mock_run_with_retry.side_effect = lambda uri, data_point, *args: (
+            InvokationResult(
+                result=Result(
+                    type="object", value={"data": data_point["correct_answer"]}
+                )
+            )
+        )
+        mock_evaluate.return_value = Result(type="bool", value=True)
+
+        app_outputs = await run_evaluation_pipeline(
+            uri="http://example.com",
+            testset_data=testset_data,
+            app_variant_parameters={},
+            openapi_parameters=[{"name": "country", "type": "input"}],
+            evaluator_config_dbs=[evaluator_config_db],
+            evaluators_aggregated_data={
+                "evaluator-config-id": {
+                    "evaluator_key": "auto_custom_code_run",
+                    "results": [],
+                }
+            },
+            rate_limit_config={
+                "batch_size": 4,
+                "max_retries": 3,
+                "retry_delay": 1,
+                "delay_between_batches": 0,
+            },
+            lm_providers_keys={},
+            user_id="test_user",
+            project_id="test_project",
+            evaluation_id="test_evaluation",
+            variant_id="test_variant",
+            testcase_indexes=[2, 5, 7],
+        )
+
+        assert mock_run_with_retry.await_count == 3
+        assert [index for index, output in enumerate(app_outputs) if output] == [
+            2,
+            5,
+            7,
+        ]
+        assert app_outputs[5].result.value == {"data": "capital-5"}
+        saved_scenarios = [
+            scenario
+            for call in mock_create_new_evaluation_scenarios.await_args_list
+            for scenario in call.kwargs["evaluation_scenarios"]
+        ]
+        assert sorted(scenario["testcase_index"] for scenario in saved_scenarios) == [
+            2,
+            5,
+            7,
+        ]
+
+
+@pytest.mark.asyncio
+async def test_run_evaluation_pipeline_scores_deterministic_evaluators_in_bulk():
+    """
+    Test that the deterministic evaluators score the outputs of the buffered rows
+    column-wise, rather than row by row, and that their results are aggregated.
+    """
+
+    evaluator_config_dbs = [
+        SimpleNamespace(
+            id="exact-match-config-id",
+            evaluator_key="auto_exact_match",
+            settings_values={"correct_answer_key": "correct_answer"},
+        ),
+        SimpleNamespace(
+            id="levenshtein-config-id",
+            evaluator_key="auto_levenshtein_distance",
+            settings_values={"correct_answer_key": "correct_answer"},
+        ),
+    ]
+    evaluators_aggregated_data = {
+        str(evaluator_config_db.id): {
+            "evaluator_key": evaluator_config_db.evaluator_key,
+            "results": [],
+        }
+        for evaluator_config_db in evaluator_config_dbs
+    }
+    testset_data = [
+        {"country": f"country-{index}", "correct_answer": f"capital-{index}"}
+        for index in range(25)
+    ]
+
+    with patch(
+        "agenta_backend.services.llm_apps_service.run_with_retry",
+        new_callable=AsyncMock,
+    ) as mock_run_with_retry, patch(
+        "agenta_backend.services.evaluators_service.evaluate",
+        new_callable=AsyncMock,
+    ) as mock_evaluate, patch(
+        "agenta_backend.services.evaluators_service.evaluate_bulk",
+        wraps=evaluators_service.evaluate_bulk,
+    ) as mock_evaluate_bulk, patch(
+        "agenta_backend.tasks.evaluations.create_new_evaluation_scenarios",
+        new_callable=AsyncMock,
+    ):
+        mock_run_with_retry.side_effect = lambda uri, data_point, *args: (
+            InvokationResult(
+                result=Result(
+                    type="object", value={"data": data_point["correct_answer"] + "!"}
+                )
+            )
+        )
+
+        await run_evaluation_pipeline(
+            uri="http://example.com",
+            testset_data=testset_data,
+            app_variant_parameters={},
+            openapi_parameters=[{"name": "country", "type": "input"}],
+            evaluator_config_dbs=evaluator_config_dbs,
+            evaluators_aggregated_data=evaluators_aggregated_data,
+            rate_limit_config={
+                "batch_size": 25,
+                "max_retries": 3,
+                "retry_delay": 1,
+                "delay_between_batches": 0,
+            },
+            lm_providers_keys={},
+            user_id="test_user",
+            project_id="test_project",
+            evaluation_id="test_evaluation",
+            variant_id="test_variant",
+        )
+
+    mock_evaluate.assert_not_awaited()
+    assert mock_evaluate_bulk.await_count < 2 * len(testset_data)
+    assert [
+        result.value
+        for result in evaluators_aggregated_data["exact-match-config-id"]["results"]
+    ] == [False] * 25
+    assert [
+        result.value
+        for result in evaluators_aggregated_data["levenshtein-config-id"]["results"]
+    ] == [1] * 25
+
+
+def test_evaluate_splits_the_testset_into_shards():
+    """
+    Test that the evaluate task fans out one shard task per range of testset rows, which
+    share the rate limits of the evaluation, with the aggregation task as the callback
+    of the chord.
+    """
+
+    testset_db = SimpleNamespace(csvdata=[{"country": "country"}] * 450)
+
+    with patch(
+        "agenta_backend.tasks.evaluations.fetch_testset_by_id",
+        new_callable=AsyncMock,
+    ) as mock_fetch_testset_by_id, patch(
+        "agenta_backend.tasks.evaluations.update_evaluation",
+        new_callable=AsyncMock,
+    ), patch(
+        "agenta_backend.tasks.evaluations.EVALUATION_SHARD_SIZE", 200
+    ), patch(
+        "agenta_backend.tasks.evaluations.chord"
+    ) as mock_chord:
+        mock_fetch_testset_by_id.return_value = testset_db
+
+        evaluate.run(
+            app_id="test_app",
+            user_id="test_user",
+            project_id="test_project",
+            variant_id="test_variant",
+            evaluators_config_ids=["evaluator-config-id"],
+            testset_id="test_testset",
+            evaluation_id="test_evaluation",
+            rate_limit_config={
+                "batch_size": 10,
+                "max_retries": 3,
+                "retry_delay": 3,
+                "delay_between_batches": 5,
+                "requests_per_second": None,
+                "tokens_per_second": 3000,
+            },
+            lm_providers_keys={},
+        )
+
+        shard_signatures = list(mock_chord.call_args.args[0])
+        assert [
+            (
+                signature.kwargs["testcase_start"],
+                signature.kwargs["testcase_end"],
+            )
+            for signature in shard_signatures
+        ] == [(0, 200), (200, 400), (400, 450)]
+        for signature in shard_signatures:
+            assert signature.kwargs["rate_limit_config"] == {
+                "batch_size": 3,
+                "max_retries": 3,
+                "retry_delay": 3,
+                "delay_between_batches": 5,
+                "requests_per_second": 2 / 3,
+                "tokens_per_second": 1000,
+            }
+        callback_signature = mock_chord.return_value.call_args.args[0]
+        assert callback_signature.task == aggregate_evaluation.name
+        assert callback_signature.kwargs["evaluation_id"] == "test_evaluation"
+
+
+@pytest.mark.asyncio
+async def test_evaluate_app_output_runs_network_evaluators_concurrently():
+    """
+    Test that the evaluators calling external services run concurrently, within the
+    limit of the semaphore of their concurrency class, and that the results keep the
+    order of the evaluator configurations.
+    """
+
+    evaluator_config_dbs = [
+        SimpleNamespace(
+            id=f"evaluator-config-{index}",
+            evaluator_key=evaluator_key,
+            settings_values={"correct_answer_key": "correct_answer"},
+        )
+        for index, evaluator_key in enumerate(
+            ["auto_ai_critique", "auto_custom_code_run", "auto_ai_critique"]
+        )
+    ]
+    evaluators_aggregated_data = {
+        str(evaluator_config_db.id): {
+            "evaluator_key": evaluator_config_db.evaluator_key,
+            "results": [],
+        }
+        for evaluator_config_db in evaluator_config_dbs
+    }
+    running = 0
+    max_running = 0
+
+    async def evaluate_side_effect(evaluator_key, **kwargs):
+        nonlocal running, max_running
+        if evaluator_key == "auto_custom_code_run":
+            return Result(type="bool", value=True)
+
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        return Result(type="text", value=evaluator_key)
+
+    with patch(
+        "agenta_backend.services.evaluators_service.evaluate",
+        new_callable=AsyncMock,
+    ) as mock_evaluate:
+        mock_evaluate.side_effect = evaluate_side_effect
+
+        scenario = await evaluate_app_output(
+            data_point={"country": "France", "correct_answer": "Paris"},
+            app_output=InvokationResult(
+                result=Result(type="object", value={"data": "Paris"})
+            ),
+            inputs=[],
+            app_variant_parameters={},
+            evaluator_config_dbs=evaluator_config_dbs,
+            evaluators_aggregated_data=evaluators_aggregated_data,
+            lm_providers_keys={},
+            evaluator_semaphores={"llm": asyncio.Semaphore(2)},
+        )
+
+    assert max_running == 2
+    assert [result.evaluator_config for result in scenario["results"]] == [
+        "evaluator-config-0",
+        "evaluator-config-1",
+        "evaluator-config-2",
+    ]
+    assert [result.result.value for result in scenario["results"]] == [
+        "auto_ai_critique",
+        True,
+        "auto_ai_critique",
+    ]
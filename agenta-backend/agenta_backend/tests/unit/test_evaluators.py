@@ -18,7 +18,11 @@ from agenta_backend.services.evaluators_service import (
     auto_semantic_similarity,
     rag_context_relevancy,
     rag_faithfulness,
+    evaluate,
+    evaluate_bulk,
 )
+from agenta_backend.services import evaluators_service
+from agenta_backend.utils import string_distance
 
 
 @pytest.mark.parametrize(
@@ -444,6 +448,102 @@ async def test_auto_levenshtein_distance(output, data_point, settings_values, ex
     assert result.value == expected
 
 
+@pytest.mark.parametrize(
+    "source, target, max_distance, expected",
+    [
+        ("", "", None, 0),
+        ("kitten", "sitting", None, 3),
+        ("sitting", "kitten", None, 3),
+        ("flaw", "lawn", None, 2),
+        ("hello world", "", None, 11),
+        ("prefix kitten suffix", "prefix sitting suffix", None, 3),
+        ("kitten", "sitting", 3, 3),
+        ("kitten", "sitting", 2, 3),
+        ("a" * 100, "b" * 100, 5, 6),
+        ("a" * 100, "a" * 10, 5, 6),
+    ],
+)
+def test_levenshtein_distance_kernel(source, target, max_distance, expected):
+    assert (
+        string_distance.levenshtein_distance(source, target, max_distance) == expected
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("process_pool_min_length", [20000, 0])
+async def test_evaluate_bulk_matches_evaluate(monkeypatch, process_pool_min_length):
+    monkeypatch.setattr(
+        evaluators_service,
+        "LEVENSHTEIN_PROCESS_POOL_MIN_LENGTH",
+        process_pool_min_length,
+    )
+
+    outputs = [
+        "hello world",
+        "Hola Mundo",
+        "hello world!" * 50,
+        {"data": "hello"},
+        1,
+        "hello",
+        "",
+    ]
+    data_points = [
+        {"correct_answer": "hello world"},
+        {"correct_answer": "hello world"},
+        {"correct_answer": "hello world" * 50},
+        {"correct_answer": "hello"},
+        {"correct_answer": "hello"},
+        {"other_answer": "hello"},
+        {"correct_answer": ""},
+    ]
+
+    for evaluator_key, settings_values in [
+        (
+            "auto_levenshtein_distance",
+            {"threshold": 5, "correct_answer_key": "correct_answer"},
+        ),
+        ("auto_levenshtein_distance", {"correct_answer_key": "correct_answer"}),
+        ("auto_exact_match", {"correct_answer_key": "correct_answer"}),
+        (
+            "auto_regex_test",
+            {"regex_pattern": "^hello", "regex_should_match": True},
+        ),
+        ("auto_regex_test", {"regex_pattern": "(", "regex_should_match": True}),
+        ("auto_starts_with", {"prefix": "HELLO", "case_sensitive": False}),
+        ("auto_ends_with", {"suffix": "world"}),
+        ("auto_contains", {"substring": "mundo", "case_sensitive": False}),
+        (
+            "auto_contains_any",
+            {"substrings": "world, mundo", "case_sensitive": False},
+        ),
+        ("auto_contains_all", {"substrings": "hello, world"}),
+        (
+            "auto_similarity_match",
+            {"similarity_threshold": 0.5, "correct_answer_key": "correct_answer"},
+        ),
+    ]:
+        results = await evaluate_bulk(
+            evaluator_key, outputs, data_points, settings_values
+        )
+        for output, data_point, result in zip(outputs, data_points, results):
+            expected = await evaluate(
+                evaluator_key=evaluator_key,
+                inputs=data_point,
+                output=output,
+                data_point=data_point,
+                app_params={},
+                settings_values=settings_values,
+                lm_providers_keys={},
+            )
+            assert result.type == expected.type
+            assert result.value == expected.value
+            assert (result.error and result.error.message) == (
+                expected.error and expected.error.message
+            )
+
+    evaluators_service.shutdown_process_pool()
+
+
 @pytest.mark.parametrize(
     "settings_values, expected_min, openai_api_key, expected_max",
     [
@@ -0,0 +1,138 @@
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from agenta_backend.models.shared_models import InvokationResult, Result
+from agenta_backend.services import invocation_cache, llm_apps_service
+
+
+def test_make_cache_key_depends_on_namespace_and_payload_only():
+    """
+    Test that the cache key of an invocation does not depend on the order of the keys
+    of the payload, but changes with the image, the parameters and the inputs.
+    """
+
+    key = invocation_cache.make_cache_key(
+        "image:tag", {"inputs": {"country": "France"}, "temperature": 0.5}
+    )
+
+    assert key == invocation_cache.make_cache_key(
+        "image:tag", {"temperature": 0.5, "inputs": {"country": "France"}}
+    )
+    assert key != invocation_cache.make_cache_key(
+        "other-image:tag", {"inputs": {"country": "France"}, "temperature": 0.5}
+    )
+    assert key != invocation_cache.make_cache_key(
+        "image:tag", {"inputs": {"country": "France"}, "temperature": 0.7}
+    )
+    assert key != invocation_cache.make_cache_key(
+        "image:tag", {"inputs": {"country": "Spain"}, "temperature": 0.5}
+    )
+
+
+@pytest.mark.asyncio
+async def test_invoke_app_returns_cached_result_without_calling_the_app():
+    """
+    Test that invoke_app returns the cached result of an invocation without sending a
+    request to the app when a cache namespace is given.
+    """
+
+    cached_result = InvokationResult(
+        result=Result(type="text", value="Paris"), latency=0.1, cost=0.01
+    )
+
+    with patch(
+        "agenta_backend.services.invocation_cache.get_cached_invocation",
+        new=AsyncMock(return_value=cached_result),
+    ) as mock_get_cached_invocation, patch(
+        "agenta_backend.services.llm_apps_service.get_client_session"
+    ) as mock_get_client_session:
+        result = await llm_apps_service.invoke_app(
+            "http://example.com",
+            {"country": "France"},
+            {},
+            [{"name": "country", "type": "input"}],
+            "test_user",
+            "test_project",
+            cache_namespace="image:tag",
+        )
+
+        assert result == cached_result
+        mock_get_cached_invocation.assert_awaited_once()
+        mock_get_client_session.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_set_cached_invocation_evicts_the_oldest_results():
+    """
+    Test that caching a result evicts the oldest cached results when the cache holds
+    more than INVOCATION_CACHE_MAX_ENTRIES results.
+    """
+
+    redis_client = MagicMock()
+    redis_client.pipeline.return_value.execute = AsyncMock(
+        return_value=[True, 1, 0, 12]
+    )
+    redis_client.zpopmin = AsyncMock(
+        return_value=[(b"invocation_cache:a", 1.0), (b"invocation_cache:b", 2.0)]
+    )
+    redis_client.delete = AsyncMock()
+
+    with patch(
+        "agenta_backend.services.invocation_cache.get_redis_client",
+        return_value=redis_client,
+    ), patch(
+        "agenta_backend.services.invocation_cache.INVOCATION_CACHE_MAX_ENTRIES", 10
+    ):
+        await invocation_cache.set_cached_invocation(
+            "invocation_cache:c",
+            InvokationResult(result=Result(type="text", value="Paris")),
+        )
+
+    redis_client.zpopmin.assert_awaited_once_with(
+        invocation_cache.INVOCATION_CACHE_INDEX, 2
+    )
+    redis_client.delete.assert_awaited_once_with(
+        b"invocation_cache:a", b"invocation_cache:b"
+    )
+
+
+def test_get_cache_namespace_depends_on_project():
+    """
+    Test that the same image of two projects has different cache namespaces, so that
+    the cached results are never shared across projects.
+    """
+
+    image = MagicMock(docker_id="sha256:abc", tags="agenta/app:latest")
+
+    assert invocation_cache.get_cache_namespace(
+        "project-a", image
+    ) != invocation_cache.get_cache_namespace("project-b", image)
+
+
+@pytest.mark.asyncio
+async def test_get_cached_invocation_has_no_cost_nor_latency():
+    """
+    Test that a cached result reports no cost nor latency, since the app is not called
+    again, and that a corrupt entry is treated as a miss.
+    """
+
+    cached_result = InvokationResult(
+        result=Result(type="text", value="Paris"), latency=0.1, cost=0.01
+    )
+    redis_client = MagicMock()
+    redis_client.get = AsyncMock(
+        side_effect=[cached_result.model_dump_json(), b"not json"]
+    )
+
+    with patch(
+        "agenta_backend.services.invocation_cache.get_redis_client",
+        return_value=redis_client,
+    ):
+        result = await invocation_cache.get_cached_invocation("invocation_cache:a")
+        corrupt_result = await invocation_cache.get_cached_invocation(
+            "invocation_cache:b"
+        )
+
+    assert result.result == cached_result.result
+    assert (result.cost, result.latency) == (0.0, 0.0)
+    assert corrupt_result is None
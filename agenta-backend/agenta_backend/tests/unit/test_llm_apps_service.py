@@ -5,6 +5,8 @@ import aiohttp
 
 from agenta_backend.services.llm_apps_service import (
     batch_invoke,
+    get_client_session,
+    close_client_session,
     InvokationResult,
     Result,
     Error,
@@ -41,6 +43,7 @@ async def test_batch_invoke_success():
             openapi_parameters,
             user_id,
             project_id,
+            cache_namespace=None,
         ):
             return InvokationResult(
                 result=Result(type="text", value="Success", error=None),
@@ -110,6 +113,7 @@ async def test_batch_invoke_retries_and_failure():
             openapi_parameters,
             user_id,
             project_id,
+            cache_namespace=None,
         ):
             raise aiohttp.ClientError("Test Error")
 
@@ -175,6 +179,7 @@ async def test_batch_invoke_generic_exception():
             openapi_parameters,
             user_id,
             project_id,
+            cache_namespace=None,
         ):
             raise Exception("Generic Error")
 
@@ -202,3 +207,134 @@ async def test_batch_invoke_generic_exception():
         assert len(results) == 1
         assert results[0].result.type == "error"
         assert results[0].result.error.message == "Max retries reached"
+
+
+@pytest.mark.asyncio
+async def test_batch_invoke_retries_overloaded_app():
+    """
+    Test the batch_invoke function when the app is overloaded.
+
+    This test mocks the invoke_app function to answer HTTP 429 the first time each
+    data point is invoked. It verifies that the overloaded invocations are retried
+    by the scheduler and that the results are returned in the order of the testset.
+    """
+    with patch(
+        "agenta_backend.services.llm_apps_service.get_parameters_from_openapi",
+        new_callable=AsyncMock,
+    ) as mock_get_parameters_from_openapi, patch(
+        "agenta_backend.services.llm_apps_service.invoke_app", new_callable=AsyncMock
+    ) as mock_invoke_app:
+        mock_get_parameters_from_openapi.return_value = [
+            {"name": "param1", "type": "input"},
+        ]
+
+        throttled_ids = set()
+
+        # Mock the response of invoke_app to be throttled once per datapoint
+        def invoke_app_side_effect(
+            uri,
+            datapoint,
+            parameters,
+            openapi_parameters,
+            user_id,
+            project_id,
+            cache_namespace=None,
+        ):
+            if datapoint["id"] not in throttled_ids:
+                throttled_ids.add(datapoint["id"])
+                return InvokationResult(
+                    result=Result(type="error", error=Error(message="HTTP error 429")),
+                    status_code=429,
+                )
+            return InvokationResult(
+                result=Result(type="text", value=f"Success {datapoint['id']}"),
+            )
+
+        mock_invoke_app.side_effect = invoke_app_side_effect
+
+        testset_data = [{"id": index, "param1": "value1"} for index in range(5)]
+        rate_limit_config = {
+            "batch_size": 2,
+            "max_retries": 3,
+            "retry_delay": 0,
+            "delay_between_batches": 0,
+        }
+
+        results = await batch_invoke(
+            "http://example.com",
+            testset_data,
+            {},
+            rate_limit_config,
+            user_id="test_user",
+            project_id="test_project",
+        )
+
+        assert mock_invoke_app.await_count == 10
+        assert [result.result.value for result in results] == [
+            f"Success {index}" for index in range(5)
+        ]
+
+
+@pytest.mark.asyncio
+async def test_batch_invoke_retries_overloaded_app_max_retries_times():
+    """
+    Test the batch_invoke function when the app stays overloaded.
+
+    This test mocks the invoke_app function to always answer HTTP 429. It verifies that
+    each data point is retried max_retries times after its first invocation, and that
+    the last overloaded result is returned.
+    """
+    with patch(
+        "agenta_backend.services.llm_apps_service.get_parameters_from_openapi",
+        new_callable=AsyncMock,
+    ) as mock_get_parameters_from_openapi, patch(
+        "agenta_backend.services.llm_apps_service.invoke_app", new_callable=AsyncMock
+    ) as mock_invoke_app:
+        mock_get_parameters_from_openapi.return_value = [
+            {"name": "param1", "type": "input"},
+        ]
+        mock_invoke_app.return_value = InvokationResult(
+            result=Result(type="error", error=Error(message="HTTP error 429")),
+            status_code=429,
+        )
+
+        testset_data = [{"id": index, "param1": "value1"} for index in range(2)]
+        rate_limit_config = {
+            "batch_size": 2,
+            "max_retries": 3,
+            "retry_delay": 0,
+            "delay_between_batches": 0,
+        }
+
+        results = await batch_invoke(
+            "http://example.com",
+            testset_data,
+            {},
+            rate_limit_config,
+            user_id="test_user",
+            project_id="test_project",
+        )
+
+        assert mock_invoke_app.await_count == 2 * (1 + 3)
+        assert [result.status_code for result in results] == [429, 429]
+
+
+@pytest.mark.asyncio
+async def test_get_client_session_is_shared():
+    """
+    Test that the app invocations share one pooled HTTP client session.
+
+    It verifies that get_client_session returns the same session until it is closed
+    with close_client_session, after which a new session is created.
+    """
+    client_session = get_client_session()
+
+    assert get_client_session() is client_session
+    assert client_session.connector.limit > 0
+
+    await close_client_session()
+
+    assert client_session.closed
+    assert get_client_session() is not client_session
+
+    await close_client_session()
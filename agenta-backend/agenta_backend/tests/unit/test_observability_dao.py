@@ -0,0 +1,538 @@
+import pytest
+from uuid import uuid4
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.future import select
+from sqlalchemy.dialects import postgresql
+
+from agenta_backend.core.observability.dtos import (
+    SpanDTO,
+    RootDTO,
+    TreeDTO,
+    NodeDTO,
+    NodeType,
+    TimeDTO,
+    StatusDTO,
+    FilteringDTO,
+    ConditionDTO,
+    NumericOperator,
+    ComparisonOperator,
+    StringOperator,
+    LogicalOperator,
+)
+from agenta_backend.core.observability.utils import FilteringException
+from agenta_backend.dbs.postgres.observability.dbes import NodesDBE
+from agenta_backend.dbs.postgres.observability import dao
+from agenta_backend.dbs.postgres.observability.dao import (
+    ObservabilityDAO,
+    _chunk,
+    _decode_cursor,
+    _encode_cursor,
+    _filters,
+    _rollup_nodes,
+    _search,
+    _to_partition_lower,
+    _upsert_nodes_statement,
+)
+
+
+def test_chunk_with_cursor_seeks_after_the_cursor():
+    """
+    Test that a cursor is an opaque encoding of (created_at, node_id), and that a
+    page after a cursor is selected with a row comparison rather than an offset.
+    """
+
+    created_at, node_id = datetime.now(timezone.utc), uuid4()
+    cursor = _encode_cursor(created_at, node_id)
+
+    assert _decode_cursor(cursor) == (created_at, node_id)
+
+    query = _chunk(select(NodesDBE), size=50, cursor=cursor)
+    sql = str(query.compile(dialect=postgresql.dialect()))
+
+    assert "(nodes.created_at, nodes.node_id) < (" in sql
+    assert "LIMIT" in sql
+    assert "OFFSET" not in sql
+
+
+def test_decode_cursor_rejects_invalid_cursors():
+    with pytest.raises(FilteringException):
+        _decode_cursor("not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_rollup_nodes_accumulates_node_and_tree_rollups():
+    """
+    Test that the metrics of new nodes are added to the per-minute rollups of all
+    nodes and of root nodes, and that those of deleted nodes are subtracted.
+    """
+
+    session = AsyncMock()
+
+    await _rollup_nodes(session, project_id=uuid4(), node_ids=[uuid4()], sign=-1)
+
+    statements = [
+        str(
+            call.args[0].compile(
+                dialect=postgresql.dialect(),
+                compile_kwargs={"literal_binds": True},
+            )
+        )
+        for call in session.execute.await_args_list
+    ]
+
+    assert len(statements) == 2
+    for statement, focus in zip(statements, ("node", "tree")):
+        assert statement.startswith("INSERT INTO nodes_rollups")
+        assert f"'{focus}' AS focus" in statement
+        assert "date_trunc('minute', nodes.created_at)" in statement
+        assert "-1 * count(*)" in statement
+        assert "ON CONFLICT (project_id, focus, timestamp) DO UPDATE" in statement
+    assert "parent_id IS NULL" not in statements[0]
+    assert "parent_id IS NULL" in statements[1]
+
+
+def test_filters_use_typed_columns_for_hot_attributes():
+    """
+    Test that conditions on hot metrics, references and status codes are applied to
+    their typed columns instead of casts of the JSONB columns, and that the typed
+    columns are never written to.
+    """
+
+    filtering = FilteringDTO(
+        conditions=[
+            ConditionDTO(
+                key="metrics.acc.costs.total",
+                value=0.1,
+                operator=NumericOperator.GT,
+            ),
+            ConditionDTO(
+                key="refs.application.id",
+                value=str(uuid4()),
+                operator=ComparisonOperator.IS,
+            ),
+            ConditionDTO(
+                key="status.code",
+                value="STATUS_CODE_ERROR",
+                operator=ComparisonOperator.IS,
+            ),
+            ConditionDTO(
+                key="metrics.acc.costs.prompt",
+                value=0.1,
+                operator=NumericOperator.GT,
+            ),
+        ]
+    )
+
+    sql = str(
+        select(NodesDBE)
+        .filter(*_filters(filtering.conditions))
+        .compile(dialect=postgresql.dialect())
+    )
+
+    assert "nodes.acc_costs > " in sql
+    assert "nodes.application_id = " in sql
+    assert "nodes.status_code = " in sql
+    assert "CAST((nodes.metrics ->> " in sql
+
+    sql = str(_upsert_nodes_statement().compile(dialect=postgresql.dialect()))
+
+    assert "acc_costs" not in sql
+    assert "application_id" not in sql
+
+
+def test_filters_search_the_content_with_its_full_text_index():
+    """
+    Test that searching the content matches its indexed tsvector instead of scanning
+    it with ILIKE, and that the search terms are found for ranking.
+    """
+
+    filtering = FilteringDTO(
+        operator=LogicalOperator.AND,
+        conditions=[
+            ConditionDTO(
+                key="node.name",
+                value="rag",
+                operator=ComparisonOperator.IS,
+            ),
+            FilteringDTO(
+                conditions=[
+                    ConditionDTO(
+                        key="content",
+                        value='"capital of France"',
+                        operator=StringOperator.SEARCH,
+                    ),
+                ]
+            ),
+        ],
+    )
+
+    sql = str(
+        select(NodesDBE)
+        .filter(*_filters(filtering.conditions))
+        .compile(dialect=postgresql.dialect())
+    )
+
+    assert "nodes.content_search @@ websearch_to_tsquery('simple'::regconfig" in sql
+    assert "ILIKE" not in sql
+    assert "nodes.content_search," not in sql.split("FROM")[0]
+
+    assert _search(filtering) == '"capital of France"'
+    assert _search(FilteringDTO(conditions=filtering.conditions[:1])) is None
+
+
+def mock_engine(monkeypatch, results):
+    session = AsyncMock()
+    session.execute.side_effect = [
+        MagicMock(
+            **{
+                "scalars.return_value.all.return_value": result,
+                "all.return_value": result,
+                "mappings.return_value.all.return_value": result,
+            }
+        )
+        for result in results
+    ] + [MagicMock()] * 16
+
+    @asynccontextmanager
+    async def _session():
+        yield session
+
+    monkeypatch.setattr(dao.engine, "session", _session)
+
+    return session
+
+
+def compile_statements(session):
+    return [
+        str(
+            call.args[0].compile(
+                dialect=postgresql.dialect(),
+                compile_kwargs={"literal_binds": True},
+            )
+        )
+        for call in session.execute.await_args_list
+    ]
+
+
+def rollup_row(focus, timestamp, count, duration):
+    return {
+        "focus": focus,
+        "timestamp": timestamp,
+        "count": count,
+        "duration": duration,
+        "cost": None,
+        "tokens": None,
+        "error_count": 0,
+        "error_duration": None,
+        "error_cost": None,
+        "error_tokens": None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_create_many_replaces_the_rollups_of_existing_spans(monkeypatch):
+    """
+    Test that spans are written under per-tree locks, and that the previous metrics
+    of the spans that are sent again are subtracted from the rollups before their new
+    metrics are added, rather than being added twice, in a single rollups write.
+    """
+
+    project_id = uuid4()
+    span_dtos = [
+        SpanDTO(
+            root=RootDTO(id=uuid4()),
+            tree=TreeDTO(id=uuid4()),
+            node=NodeDTO(id=uuid4(), name="rag", type=NodeType.WORKFLOW),
+            time=TimeDTO(
+                start=datetime(2024, 7, 25, 17, 6), end=datetime(2024, 7, 25, 17, 7)
+            ),
+            status=StatusDTO(code="OK"),
+        )
+        for _ in range(2)
+    ]
+    existing_node_id = span_dtos[0].node.id
+    created_at = datetime(2024, 7, 25, 17, 6, tzinfo=timezone.utc)
+
+    # locks, existing spans, previous rollups, spans, new rollups, then rollups write
+    session = mock_engine(
+        monkeypatch,
+        [
+            None,
+            None,
+            None,
+            [(existing_node_id, created_at)],
+            [rollup_row("node", created_at, -1, -60.0)],
+            [rollup_row("tree", created_at, -1, -60.0)],
+            None,
+            [rollup_row("node", created_at, 2, 120.0)],
+            [rollup_row("tree", created_at, 2, 120.0)],
+        ],
+    )
+
+    await ObservabilityDAO().create_many(project_id=project_id, span_dtos=span_dtos)
+
+    calls = session.execute.await_args_list
+    statements = [
+        str(call.args[0].compile(dialect=postgresql.dialect())) for call in calls
+    ]
+
+    assert "pg_advisory_xact_lock_shared(hashtextextended(" in statements[0]
+    assert all(
+        "pg_advisory_xact_lock(hashtextextended(" in statement
+        for statement in statements[1:3]
+    )
+    assert [statement.split()[0] for statement in statements[3:]] == [
+        "SELECT",  # existing spans
+        "SELECT",  # node rollups, previous metrics
+        "SELECT",  # tree rollups, previous metrics
+        "INSERT",  # spans
+        "SELECT",  # node rollups, new metrics
+        "SELECT",  # tree rollups, new metrics
+        "INSERT",  # rollups
+    ]
+    assert "-1 * count(*)" in str(
+        calls[4]
+        .args[0]
+        .compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    )
+    assert statements[6].startswith("INSERT INTO nodes ")
+    rows = calls[6].args[1]
+    assert rows[0]["created_at"] == created_at
+    assert rows[1]["created_at"] is None
+
+    assert statements[9].startswith("INSERT INTO nodes_rollups")
+    rollups = calls[9].args[0].compile(dialect=postgresql.dialect()).params
+    assert [rollups["focus_m0"], rollups["focus_m1"]] == ["node", "tree"]
+    assert [rollups["count_m0"], rollups["count_m1"]] == [1, 1]
+    assert [rollups["duration_m0"], rollups["duration_m1"]] == [60.0, 60.0]
+    assert rollups["cost_m0"] is None
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_create_many_locks_the_project_when_writing_many_trees(monkeypatch):
+    """
+    Test that writing the spans of more trees than _INGESTION_TREE_LOCKS takes the
+    exclusive project lock only, rather than a lock per tree.
+    """
+
+    monkeypatch.setattr(dao, "_INGESTION_TREE_LOCKS", 1)
+    span_dtos = [
+        SpanDTO(
+            root=RootDTO(id=uuid4()),
+            tree=TreeDTO(id=uuid4()),
+            node=NodeDTO(id=uuid4(), name="rag", type=NodeType.WORKFLOW),
+            time=TimeDTO(
+                start=datetime(2024, 7, 25, 17, 6), end=datetime(2024, 7, 25, 17, 7)
+            ),
+            status=StatusDTO(code="OK"),
+        )
+        for _ in range(2)
+    ]
+
+    # lock, existing spans, then spans and rollups
+    session = mock_engine(monkeypatch, [None, []])
+
+    await ObservabilityDAO().create_many(project_id=uuid4(), span_dtos=span_dtos)
+
+    statements = compile_statements(session)
+
+    assert "pg_advisory_xact_lock(hashtextextended(" in statements[0]
+    assert "pg_advisory_xact_lock" not in statements[1]
+
+
+@pytest.mark.asyncio
+async def test_delete_many_deletes_descendants_in_one_transaction(monkeypatch):
+    """
+    Test that the descendants of the deleted nodes are found with a single recursive
+    query, and that they are deleted in bulk, in a single transaction.
+    """
+
+    node_ids = [uuid4() for _ in range(3)]
+    session = mock_engine(monkeypatch, [node_ids])
+
+    await ObservabilityDAO().delete_many(project_id=uuid4(), node_ids=node_ids[:1])
+
+    statements = compile_statements(session)
+
+    assert statements[0].startswith("WITH RECURSIVE descendants")
+    assert "JOIN descendants ON nodes.parent_id = descendants.node_id" in statements[0]
+    assert [statement.split()[0] for statement in statements[1:]] == [
+        "INSERT",  # node rollups
+        "INSERT",  # tree rollups
+        "DELETE",
+    ]
+    assert all(str(node_id) in statements[-1] for node_id in node_ids)
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_delete_older_deletes_in_chunks(monkeypatch):
+    """
+    Test that old nodes are deleted in chunks, each locked, deleted and committed in
+    its own transaction, until a chunk is not full.
+    """
+
+    monkeypatch.setattr(dao, "_BULK_DELETE_CHUNK_SIZE", 2)
+    # chunk, rollups and delete, then chunk, ...
+    session = mock_engine(
+        monkeypatch, [[uuid4(), uuid4()], None, None, None, [uuid4()]]
+    )
+
+    count = await ObservabilityDAO().delete_older(
+        project_id=uuid4(),
+        oldest=datetime.now(timezone.utc),
+    )
+
+    statements = compile_statements(session)
+
+    assert count == 3
+    assert session.commit.await_count == 2
+    assert len(statements) == 8
+    assert statements[0].endswith("LIMIT 2 FOR UPDATE SKIP LOCKED")
+    assert statements[3].startswith("DELETE FROM nodes")
+
+
+@pytest.mark.asyncio
+async def test_create_partitions_creates_missing_weeks_only(monkeypatch):
+    """
+    Test that weekly partitions are created ahead of time, from Monday 00:00 UTC,
+    except for the weeks already covered by a partition.
+    """
+
+    lower = _to_partition_lower(datetime.now(timezone.utc))
+    upper = lower + timedelta(weeks=1)
+
+    # locks, partitions, weeks of the default partition, then one statement per
+    # created partition
+    session = mock_engine(
+        monkeypatch,
+        [
+            None,
+            None,
+            [
+                (
+                    "nodes_legacy",
+                    f"FOR VALUES FROM (MINVALUE) TO ('{upper.isoformat(' ')}')",
+                ),
+                ("nodes_default", "DEFAULT"),
+            ],
+            [],
+        ],
+    )
+
+    created = await ObservabilityDAO().create_partitions(ahead=2)
+
+    statements = compile_statements(session)
+
+    assert lower.weekday() == 0 and lower.hour == 0
+    assert created == [
+        f"nodes_p{upper:%Y%m%d}",
+        f"nodes_p{upper + timedelta(weeks=1):%Y%m%d}",
+    ]
+    assert "pg_advisory_xact_lock" in statements[0]
+    assert statements[1] == "LOCK TABLE nodes_default IN EXCLUSIVE MODE"
+    assert statements[4] == (
+        f"CREATE TABLE nodes_p{upper:%Y%m%d} PARTITION OF nodes "
+        f"FOR VALUES FROM ('{upper.isoformat()}') "
+        f"TO ('{(upper + timedelta(weeks=1)).isoformat()}')"
+    )
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_create_partitions_moves_the_nodes_of_the_default_partition(monkeypatch):
+    """
+    Test that the nodes written to the default partition, while the partition of their
+    week was missing, are moved to a new partition of their week.
+    """
+
+    lower = _to_partition_lower(datetime.now(timezone.utc)) - timedelta(weeks=2)
+    upper = lower + timedelta(weeks=1)
+
+    # locks, partitions, weeks of the default partition, then the move of the nodes
+    session = mock_engine(
+        monkeypatch,
+        [
+            None,
+            None,
+            [
+                (
+                    "nodes_legacy",
+                    f"FOR VALUES FROM (MINVALUE) TO ('{lower.isoformat(' ')}')",
+                ),
+                ("nodes_default", "DEFAULT"),
+            ],
+            [lower],
+        ],
+    )
+
+    created = await ObservabilityDAO().create_partitions(ahead=0)
+
+    statements = compile_statements(session)
+
+    assert statements[4].startswith(
+        f"CREATE TABLE nodes_p{lower:%Y%m%d} (LIKE nodes INCLUDING DEFAULTS"
+    )
+    assert statements[5].startswith("WITH moved AS (DELETE FROM nodes_default ")
+    assert f"INSERT INTO nodes_p{lower:%Y%m%d} (project_id, " in statements[5]
+    assert statements[6] == (
+        f"ALTER TABLE nodes ATTACH PARTITION nodes_p{lower:%Y%m%d} "
+        f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+    )
+    # The current week has no nodes to move
+    current = lower + timedelta(weeks=2)
+    assert created == [f"nodes_p{lower:%Y%m%d}", f"nodes_p{current:%Y%m%d}"]
+    assert statements[7].startswith(
+        f"CREATE TABLE nodes_p{current:%Y%m%d} PARTITION OF nodes"
+    )
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_drop_partitions_drops_expired_partitions_and_rollups(monkeypatch):
+    """
+    Test that the partitions entirely older than the retention are dropped with the
+    rollups of their time range, and that the others are kept.
+    """
+
+    bounds = [
+        datetime(2024, 11, 4, tzinfo=timezone.utc) + timedelta(weeks=week)
+        for week in range(3)
+    ]
+
+    session = mock_engine(
+        monkeypatch,
+        [
+            None,
+            [
+                ("nodes_legacy", f"FOR VALUES FROM (MINVALUE) TO ('{bounds[0]}')"),
+                (
+                    f"nodes_p{bounds[0]:%Y%m%d}",
+                    f"FOR VALUES FROM ('{bounds[0]}') TO ('{bounds[1]}')",
+                ),
+                (
+                    f"nodes_p{bounds[1]:%Y%m%d}",
+                    f"FOR VALUES FROM ('{bounds[1]}') TO ('{bounds[2]}')",
+                ),
+                ("nodes_default", "DEFAULT"),
+            ],
+        ],
+    )
+
+    dropped = await ObservabilityDAO().drop_partitions(
+        oldest=bounds[1] + timedelta(days=3),
+    )
+
+    statements = compile_statements(session)
+
+    assert dropped == ["nodes_legacy", "nodes_p20241104"]
+    assert statements[2] == "DROP TABLE nodes_legacy"
+    assert statements[3].startswith("DELETE FROM nodes_rollups")
+    assert "nodes_rollups.timestamp >=" not in statements[3]
+    assert statements[4] == "DROP TABLE nodes_p20241104"
+    assert "nodes_rollups.timestamp >=" in statements[5]
+    assert len(statements) == 6
@@ -0,0 +1,112 @@
+import pytest
+from uuid import uuid4
+from unittest.mock import AsyncMock
+
+from agenta_backend.core.observability.ingestion import (
+    LocalObservabilityQueue,
+    ObservabilityIngestor,
+)
+
+
+def fake_parse_otlp_stream(otlp_stream: bytes):
+    if otlp_stream == b"invalid":
+        raise ValueError("invalid payload")
+    return [otlp_stream.decode()]
+
+
+@pytest.mark.asyncio
+async def test_ingestor_coalesces_payloads_per_project():
+    """
+    Test that the ingestor writes the spans of the dequeued payloads with one ingest
+    call per project, and that unparsable payloads are dropped.
+    """
+
+    project_a, project_b = uuid4(), uuid4()
+    queue = LocalObservabilityQueue()
+    for project_id, otlp_stream in [
+        (project_a, b"a1"),
+        (project_b, b"b1"),
+        (project_a, b"invalid"),
+        (project_a, b"a2"),
+    ]:
+        await queue.enqueue(project_id=project_id, otlp_stream=otlp_stream)
+
+    service = AsyncMock()
+    ingestor = ObservabilityIngestor(
+        observability_service=service,
+        observability_queue=queue,
+        parse_otlp_stream=fake_parse_otlp_stream,
+    )
+
+    messages = await queue.dequeue(consumer="test", count=10)
+    await ingestor.process(messages)
+
+    ingested = {
+        call.kwargs["project_id"]: call.kwargs["span_dtos"]
+        for call in service.ingest.await_args_list
+    }
+    assert ingested == {project_a: ["a1", "a2"], project_b: ["b1"]}
+    assert await queue.size() == 0
+
+
+@pytest.mark.asyncio
+async def test_ingestor_requeues_payloads_that_cannot_be_written():
+    """
+    Test that the payloads of a failed ingest call are released back to the queue.
+    """
+
+    project_id = uuid4()
+    queue = LocalObservabilityQueue()
+    await queue.enqueue(project_id=project_id, otlp_stream=b"a1")
+
+    service = AsyncMock()
+    service.ingest.side_effect = [Exception("database unavailable"), None]
+    ingestor = ObservabilityIngestor(
+        observability_service=service,
+        observability_queue=queue,
+        parse_otlp_stream=fake_parse_otlp_stream,
+    )
+
+    await ingestor.process(await queue.dequeue(consumer="test", count=10))
+    assert await queue.size() == 1
+
+    await ingestor.process(await queue.dequeue(consumer="test", count=10))
+    assert await queue.size() == 0
+    assert service.ingest.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_ingestor_only_requeues_the_payloads_that_cannot_be_written():
+    """
+    Test that when the spans of several payloads cannot be written together, the
+    payloads are written again in halves, and only the payload that cannot be written
+    on its own is released back to the queue.
+    """
+
+    project_id = uuid4()
+    queue = LocalObservabilityQueue()
+    for otlp_stream in [b"a1", b"a2", b"bad", b"a3", b"a4"]:
+        await queue.enqueue(project_id=project_id, otlp_stream=otlp_stream)
+
+    async def ingest(project_id, span_dtos):
+        if "bad" in span_dtos:
+            raise Exception("invalid span")
+
+    service = AsyncMock()
+    service.ingest.side_effect = ingest
+    ingestor = ObservabilityIngestor(
+        observability_service=service,
+        observability_queue=queue,
+        parse_otlp_stream=fake_parse_otlp_stream,
+    )
+
+    await ingestor.process(await queue.dequeue(consumer="test", count=10))
+
+    assert sorted(
+        span_dto
+        for call in service.ingest.await_args_list[1:]
+        if "bad" not in call.kwargs["span_dtos"]
+        for span_dto in call.kwargs["span_dtos"]
+    ) == ["a1", "a2", "a3", "a4"]
+    assert await queue.size() == 1
+    assert (await queue.dequeue(consumer="test", count=10))[0][2] == b"bad"
@@ -0,0 +1,119 @@
+from json import loads
+from uuid import uuid4
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects.postgresql import JSONB
+
+from agenta_backend.core.shared.dtos import LifecycleDTO
+from agenta_backend.core.observability.dtos import (
+    SpanDTO,
+    RootDTO,
+    TreeDTO,
+    TreeType,
+    NodeDTO,
+    NodeType,
+    ParentDTO,
+    TimeDTO,
+    StatusDTO,
+    ExceptionDTO,
+    LinkDTO,
+)
+from agenta_backend.dbs.postgres.observability.dbes import NodesDBE
+from agenta_backend.dbs.postgres.observability.mappings import (
+    map_span_dto_to_dbe,
+    map_span_dto_to_row,
+    map_bucket_dbes_to_dtos,
+)
+
+
+def test_map_span_dto_to_row_matches_map_span_dto_to_dbe():
+    """
+    Test that the rows of the bulk span writer hold the same values as the ORM
+    objects, with the JSONB columns encoded to JSON.
+    """
+
+    project_id = uuid4()
+    span_dto = SpanDTO(
+        lifecycle=LifecycleDTO(created_at=datetime.now(timezone.utc)),
+        root=RootDTO(id=uuid4()),
+        tree=TreeDTO(id=uuid4(), type=TreeType.INVOCATION),
+        node=NodeDTO(id=uuid4(), name="rag", type=NodeType.WORKFLOW),
+        parent=ParentDTO(id=uuid4()),
+        time=TimeDTO(
+            start=datetime(2024, 7, 25, 17, 6), end=datetime(2024, 7, 25, 17, 7)
+        ),
+        status=StatusDTO(code="ERROR", message="timeout"),
+        exception=ExceptionDTO(
+            timestamp=datetime(2024, 7, 25, 17, 7), type="TimeoutError"
+        ),
+        data={"inputs": {"country": "France"}, "outputs": "Paris"},
+        metrics={"acc": {"costs": {"total": 0.01}, "tokens": {"total": 42}}},
+        meta={"configuration": {"model": "gpt-4o", "temperature": 0.2}},
+        refs={"application": {"id": str(uuid4())}},
+        links=[LinkDTO(type=TreeType.INVOCATION, id=uuid4(), tree_id=uuid4())],
+    )
+
+    span_dbe = map_span_dto_to_dbe(project_id=project_id, span_dto=span_dto)
+    row = map_span_dto_to_row(project_id=project_id, span_dto=span_dto)
+
+    columns = [
+        column for column in NodesDBE.__table__.columns if column.computed is None
+    ]
+
+    assert set(row) == {column.name for column in columns}
+    for column in columns:
+        value = row[column.name]
+        if isinstance(column.type, JSONB) and value is not None:
+            value = loads(value)
+        if column.name == "content":
+            value, expected = loads(value), loads(span_dbe.content)
+        else:
+            expected = getattr(span_dbe, column.name)
+        assert value == expected, column.name
+
+
+def test_map_bucket_dbes_to_dtos_splits_totals_and_errors():
+    """
+    Test that the buckets of the single-scan analytics query are mapped to total and
+    error metrics, with empty error metrics for buckets without errors.
+    """
+
+    oldest = datetime(2024, 7, 25, tzinfo=timezone.utc)
+    timestamps = [oldest + timedelta(hours=hour) for hour in range(3)]
+    bucket_dbes = [
+        SimpleNamespace(
+            timestamp=timestamps[0],
+            count=10,
+            duration=1000.0,
+            cost=0.5,
+            tokens=400,
+            error_count=2,
+            error_duration=300.0,
+            error_cost=0.1,
+            error_tokens=80,
+        ),
+        SimpleNamespace(
+            timestamp=timestamps[2],
+            count=3,
+            duration=90.0,
+            cost=0.01,
+            tokens=30,
+            error_count=0,
+            error_duration=None,
+            error_cost=None,
+            error_tokens=None,
+        ),
+    ]
+
+    bucket_dtos, count = map_bucket_dbes_to_dtos(
+        bucket_dbes=bucket_dbes,
+        window=60,
+        timestamps=timestamps,
+    )
+
+    assert count == 3
+    assert [bucket_dto.total.count for bucket_dto in bucket_dtos] == [10, 0, 3]
+    assert [bucket_dto.error.count for bucket_dto in bucket_dtos] == [2, 0, 0]
+    assert bucket_dtos[0].error.cost == 0.1
+    assert bucket_dtos[2].error.duration == 0.0
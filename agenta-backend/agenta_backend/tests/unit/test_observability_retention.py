@@ -0,0 +1,38 @@
+import pytest
+from uuid import uuid4
+from unittest.mock import AsyncMock
+from datetime import datetime, timedelta, timezone
+
+from agenta_backend.core.observability.retention import ObservabilityRetention
+
+
+@pytest.mark.asyncio
+async def test_retention_drops_partitions_and_deletes_shorter_retentions():
+    """
+    Test that a run creates the partitions ahead, drops those past the retention of
+    all projects, and deletes the nodes of the projects with a shorter retention only.
+    """
+
+    short_project_id, long_project_id = uuid4(), uuid4()
+
+    service = AsyncMock()
+    retention = ObservabilityRetention(
+        observability_service=service,
+        ahead=2,
+        retention_days=30,
+        project_retention_days={short_project_id: 7, long_project_id: 90},
+    )
+
+    await retention.process()
+
+    now = datetime.now(timezone.utc)
+
+    service.create_partitions.assert_awaited_once_with(ahead=2)
+
+    oldest = service.drop_partitions.await_args.kwargs["oldest"]
+    assert abs(oldest - (now - timedelta(days=30))) < timedelta(minutes=1)
+
+    service.delete_older.assert_awaited_once()
+    assert service.delete_older.await_args.kwargs["project_id"] == short_project_id
+    oldest = service.delete_older.await_args.kwargs["oldest"]
+    assert abs(oldest - (now - timedelta(days=7))) < timedelta(minutes=1)
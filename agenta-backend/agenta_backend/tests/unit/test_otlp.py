@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import agenta_backend.apis.fastapi.observability.opentelemetry.traces_proto as Trace_Proto
+from agenta_backend.apis.fastapi.observability.opentelemetry.otlp import (
+    parse_otlp_stream,
+    validate_otlp_stream,
+)
+
+
+def make_otlp_stream() -> bytes:
+    proto = Trace_Proto.TracesData()
+    span = proto.resource_spans.add().scope_spans.add().spans.add()
+    span.trace_id = bytes(range(16))
+    span.span_id = bytes(range(8))
+    span.name = "rag"
+    span.start_time_unix_nano = 1_721_926_006_141_393_999
+    span.end_time_unix_nano = 1_721_926_012_513_890_001
+
+    values = {
+        "string": ("string_value", "Paris"),
+        "bool": ("bool_value", True),
+        "int": ("int_value", 42),
+        "double": ("double_value", 0.5),
+    }
+    for key, (field, value) in values.items():
+        attribute = span.attributes.add()
+        attribute.key = key
+        setattr(attribute.value, field, value)
+
+    attribute = span.attributes.add()
+    attribute.key = "array"
+    attribute.value.array_value.values.add().string_value = "a"
+    attribute.value.array_value.values.add().int_value = 1
+
+    attribute = span.attributes.add()
+    attribute.key = "kvlist"
+    entry = attribute.value.kvlist_value.values.add()
+    entry.key = "nested"
+    entry.value.array_value.values.add().bool_value = False
+
+    attribute = span.attributes.add()
+    attribute.key = "empty"
+
+    event = span.events.add()
+    event.name = "exception"
+    event.time_unix_nano = 1_721_926_012_000_000_500
+
+    return proto.SerializeToString()
+
+
+def test_parse_otlp_stream_decodes_attribute_values():
+    """
+    Test that scalar, array and kvlist attribute values are decoded to Python values,
+    and that the timestamps keep their microseconds.
+    """
+
+    otlp_stream = make_otlp_stream()
+
+    assert validate_otlp_stream(otlp_stream)
+    assert not validate_otlp_stream(b"\xff\xff")
+
+    [otel_span_dto] = parse_otlp_stream(otlp_stream)
+
+    assert otel_span_dto.attributes == {
+        "string": "Paris",
+        "bool": True,
+        "int": 42,
+        "double": 0.5,
+        "array": ["a", 1],
+        "kvlist": {"nested": [False]},
+        "empty": None,
+    }
+    assert otel_span_dto.start_time == datetime.fromtimestamp(1_721_926_006).replace(
+        microsecond=141_393
+    )
+    assert otel_span_dto.end_time == datetime.fromtimestamp(1_721_926_012).replace(
+        microsecond=513_890
+    )
+    assert otel_span_dto.events[0].timestamp == (
+        datetime.fromtimestamp(1_721_926_012).isoformat(timespec="microseconds")
+    )
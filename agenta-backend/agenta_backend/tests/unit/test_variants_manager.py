@@ -0,0 +1,87 @@
+import pytest
+from uuid import uuid4
+from types import SimpleNamespace
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sqlalchemy.dialects import postgresql
+
+from agenta_backend.services import db_manager, variants_manager
+from agenta_backend.services.variants_manager import ReferenceDTO
+
+
+@pytest.mark.asyncio
+async def test_fetch_app_environment_config_resolves_the_config_in_one_query(
+    monkeypatch,
+):
+    """
+    Test that an environment config is resolved by joining the environment revision,
+    the variant revision, the variant, the app and the deployment in a single query,
+    with the version of the revision computed in the same query.
+    """
+
+    session = AsyncMock()
+    session.execute.return_value = MagicMock(**{"first.return_value": None})
+
+    @asynccontextmanager
+    async def _session():
+        yield session
+
+    monkeypatch.setattr(db_manager.engine, "session", _session)
+
+    await db_manager.fetch_app_environment_config(
+        project_id=str(uuid4()),
+        app_name="rag",
+        environment_name="production",
+    )
+
+    [call] = session.execute.await_args_list
+    sql = str(call.args[0].compile(dialect=postgresql.dialect()))
+
+    assert (
+        "row_number() OVER (PARTITION BY environments_revisions.environment_id" in sql
+    )
+    for table in ("app_variant_revisions", "app_variants", "app_db", "deployments"):
+        assert f"LEFT OUTER JOIN {table} ON" in sql
+    assert "ORDER BY anon_1.created_at DESC" in sql
+    assert "LIMIT" in sql
+
+
+@pytest.mark.asyncio
+async def test_fetch_config_by_environment_ref_serves_cached_configs():
+    """
+    Test that a cached config is served without being resolved again, and that its
+    lifecycles are attributed to the requesting user, who is not cached.
+    """
+
+    config = variants_manager.ConfigDTO(
+        params={"temperature": 0.2},
+        environment_ref=ReferenceDTO(slug="production", version=3, id=uuid4()),
+        environment_lifecycle=variants_manager.LifecycleDTO(created_at="2024-11-04"),
+    )
+    user = SimpleNamespace(id=uuid4(), email="user@agenta.ai")
+
+    with patch(
+        "agenta_backend.services.config_cache.get_cached_config",
+        return_value=config.model_dump(mode="json"),
+    ) as mock_get_cached_config, patch(
+        "agenta_backend.services.variants_manager.get_user_with_uid",
+        return_value=user,
+    ), patch(
+        "agenta_backend.services.variants_manager._fetch_environment_config"
+    ) as mock_fetch_environment_config:
+        fetched_config = await variants_manager.fetch_config_by_environment_ref(
+            project_id=str(uuid4()),
+            environment_ref=ReferenceDTO(slug="production", version=None, id=None),
+            application_ref=ReferenceDTO(slug="rag", version=None, id=None),
+            user_id="user-uid",
+        )
+
+    mock_fetch_environment_config.assert_not_called()
+    assert mock_get_cached_config.call_args.args[1] == {
+        "environment_ref": {"slug": "production", "version": None, "id": None},
+        "application_ref": {"slug": "rag", "version": None, "id": None},
+    }
+    assert fetched_config.params == config.params
+    assert fetched_config.environment_lifecycle.updated_by_id == str(user.id)
+    assert fetched_config.environment_lifecycle.updated_by == user.email
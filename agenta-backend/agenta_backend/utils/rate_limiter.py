@@ -0,0 +1,119 @@
+import time
+import asyncio
+from collections import deque
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter.
+
+    The bucket refills at `rate` tokens per second up to `capacity` tokens. A bucket
+    without a rate never limits. Tokens can also be consumed after the fact with
+    `consume`, in which case the bucket may go into debt and `acquire` waits until
+    the debt is paid back (used when the cost of a request is only known once it
+    completes, e.g. LLM tokens).
+    """
+
+    def __init__(self, rate: Optional[float], capacity: Optional[float] = None):
+        self.rate = rate if rate and rate > 0 else None
+        self.capacity = max(capacity or self.rate or 1.0, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.rate is not None:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.rate
+            )
+        self.updated_at = now
+
+    def consume(self, amount: float) -> None:
+        """Consumes tokens without waiting, the bucket may go into debt."""
+
+        if self.rate is None:
+            return
+
+        self._refill()
+        self.tokens -= amount
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        """Waits until `amount` tokens are available, then consumes them."""
+
+        if self.rate is None:
+            return
+
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class AIMDLimiter:
+    """
+    Adaptive concurrency limit using additive-increase/multiplicative-decrease.
+
+    Each success raises the limit by `increase / limit`, i.e. by about `increase`
+    per window of requests, up to `max_limit`. Each overload signal (e.g. HTTP 429)
+    multiplies the limit by `decrease_factor`, at most once per `cooldown` seconds so
+    that the requests of a single burst only count once.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0,
+    ):
+        self.max_limit = max(max_limit, 1)
+        self.min_limit = max(min(min_limit, self.max_limit), 1)
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self._limit = float(self.max_limit)
+        self._decreased_at: Optional[float] = None
+
+    @property
+    def limit(self) -> int:
+        return max(int(self._limit), self.min_limit)
+
+    def on_success(self) -> None:
+        self._limit = min(
+            float(self.max_limit), self._limit + self.increase / self._limit
+        )
+
+    def on_overload(self) -> None:
+        now = time.monotonic()
+        if self._decreased_at is not None and now - self._decreased_at < self.cooldown:
+            return
+
+        self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+        self._decreased_at = now
+
+
+class ThroughputMeter:
+    """Measures the number of events per second over a sliding time window."""
+
+    def __init__(self, window: float = 10.0):
+        self.window = window
+        self.events: deque = deque()
+
+    def record(self) -> None:
+        self.events.append(time.monotonic())
+
+    def rate(self) -> float:
+        now = time.monotonic()
+        while self.events and now - self.events[0] > self.window:
+            self.events.popleft()
+
+        if not self.events:
+            return 0.0
+
+        return len(self.events) / min(self.window, max(now - self.events[0], 1.0))
@@ -0,0 +1,111 @@
+from typing import Dict, List, Optional
+
+
+def levenshtein_distance(
+    source: str, target: str, max_distance: Optional[int] = None
+) -> int:
+    """
+    Computes the Levenshtein distance between two strings.
+
+    Uses the bit-parallel algorithm of Myers (as adapted to the edit distance by
+    Hyyrö) on Python integers: each character of the longer string costs a few
+    operations on integers of the length of the shorter one, instead of one Python
+    operation per pair of characters.
+
+    Args:
+        source (str): The first string.
+        target (str): The second string.
+        max_distance (Optional[int]): If set, the computation stops as soon as the \
+            distance is known to be greater than max_distance, and max_distance + 1 \
+            is returned.
+
+    Returns:
+        int: The distance, or max_distance + 1 if it is greater than max_distance.
+    """
+
+    # Common prefixes and suffixes do not change the distance
+    start = 0
+    while start < min(len(source), len(target)) and source[start] == target[start]:
+        start += 1
+    source_end, target_end = len(source), len(target)
+    while (
+        source_end > start
+        and target_end > start
+        and source[source_end - 1] == target[target_end - 1]
+    ):
+        source_end -= 1
+        target_end -= 1
+    source, target = source[start:source_end], target[start:target_end]
+
+    # The pattern is the shorter string, so that the bit vectors are the shortest
+    if len(source) > len(target):
+        source, target = target, source
+
+    if max_distance is not None and len(target) - len(source) > max_distance:
+        return max_distance + 1
+    if not source:
+        return len(target)
+
+    pattern_length = len(source)
+    pattern_masks: Dict[str, int] = {}
+    for index, char in enumerate(source):
+        pattern_masks[char] = pattern_masks.get(char, 0) | (1 << index)
+
+    full_mask = (1 << pattern_length) - 1
+    last_bit = 1 << (pattern_length - 1)
+    positive_vertical = full_mask
+    negative_vertical = 0
+    distance = pattern_length
+    remaining = len(target)
+
+    for char in target:
+        remaining -= 1
+        equal = pattern_masks.get(char, 0)
+        vertical = equal | negative_vertical
+        horizontal = (
+            ((equal & positive_vertical) + positive_vertical) ^ positive_vertical
+        ) | equal
+        positive_horizontal = negative_vertical | ~(horizontal | positive_vertical)
+        negative_horizontal = positive_vertical & horizontal
+
+        if positive_horizontal & last_bit:
+            distance += 1
+        elif negative_horizontal & last_bit:
+            distance -= 1
+
+        # Each remaining character decreases the distance by one at most
+        if max_distance is not None and distance - remaining > max_distance:
+            return max_distance + 1
+
+        positive_horizontal = (positive_horizontal << 1) | 1
+        negative_horizontal = negative_horizontal << 1
+        positive_vertical = (
+            negative_horizontal | ~(vertical | positive_horizontal)
+        ) & full_mask
+        negative_vertical = positive_horizontal & vertical & full_mask
+
+    return distance
+
+
+def levenshtein_distances(
+    sources: List[str], targets: List[str], max_distance: Optional[int] = None
+) -> List[int]:
+    """
+    Computes the Levenshtein distances between two columns of strings, pairwise.
+
+    The whole column is computed in a single call, so that a chunk of a column can be
+    sent to a worker process at once instead of row by row.
+
+    Args:
+        sources (List[str]): The first strings.
+        targets (List[str]): The second strings.
+        max_distance (Optional[int]): See levenshtein_distance.
+
+    Returns:
+        List[int]: The distance of each pair, see levenshtein_distance.
+    """
+
+    return [
+        levenshtein_distance(source, target, max_distance)
+        for source, target in zip(sources, targets)
+    ]
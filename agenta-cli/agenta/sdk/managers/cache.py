@@ -0,0 +1,335 @@
+import asyncio
+from os import environ
+from time import monotonic
+from threading import Lock, Thread
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from agenta.sdk.utils.logging import log
+from agenta.sdk.types import ConfigurationResponse
+
+AGENTA_SDK_CONFIG_CACHE = str(environ.get("AGENTA_SDK_CONFIG_CACHE", True)).lower() in (
+    "true",
+    "1",
+    "t",
+)
+
+AGENTA_SDK_CONFIG_CACHE_CAPACITY = int(
+    environ.get(
+        "AGENTA_SDK_CONFIG_CACHE_CAPACITY",
+        512,
+    )
+)
+
+AGENTA_SDK_CONFIG_CACHE_TTL = float(
+    environ.get(
+        "AGENTA_SDK_CONFIG_CACHE_TTL",
+        60,  # 1 minute
+    )
+)
+
+AGENTA_SDK_CONFIG_CACHE_STALE_TTL = float(
+    environ.get(
+        "AGENTA_SDK_CONFIG_CACHE_STALE_TTL",
+        60 * 60,  # 1 hour
+    )
+)
+
+AGENTA_SDK_CONFIG_CACHE_RETRY_DELAY = float(
+    environ.get(
+        "AGENTA_SDK_CONFIG_CACHE_RETRY_DELAY",
+        5,  # 5 seconds
+    )
+)
+
+
+def config_etag(config: ConfigurationResponse) -> str:
+    """
+    Returns the entity tag of a config, as computed by the backend: the ids of its
+    variant revision and environment revision, which change with every commit and
+    deployment.
+    """
+
+    return f'"{config.variant_id or ""}:{config.environment_id or ""}"'
+
+
+class ConfigCache:
+    """
+    In-process cache of the configs fetched from the registry.
+
+    Configs are served from the cache for `ttl` seconds. Configs older than that are
+    still served, for up to `stale_ttl` seconds, while they are revalidated in the
+    background. Configs older than that are revalidated before being served. Configs
+    pinned to a revision (by id or version) never change, hence are never revalidated.
+    While subscribed to the config events, configs are served for up to `stale_ttl`
+    seconds, unless expired by an event.
+
+    Revalidations are conditional requests, which the backend answers with a 304 if
+    the config has not changed. Concurrent revalidations of a config are coalesced
+    into one. If a revalidation fails, the last known config is served instead, and is
+    not revalidated again for `retry_delay` seconds.
+    """
+
+    def __init__(
+        self,
+        capacity: int = AGENTA_SDK_CONFIG_CACHE_CAPACITY,
+        ttl: float = AGENTA_SDK_CONFIG_CACHE_TTL,
+        stale_ttl: float = AGENTA_SDK_CONFIG_CACHE_STALE_TTL,
+        retry_delay: float = AGENTA_SDK_CONFIG_CACHE_RETRY_DELAY,
+    ):
+        self.cache: OrderedDict = OrderedDict()
+        self.capacity = capacity
+        self.ttl = ttl
+        self.stale_ttl = max(ttl, stale_ttl)
+        self.retry_delay = min(ttl, retry_delay)
+
+        # Set while subscribed to the config events, which expire changed configs
+        self.subscribed = False
+
+        self.lock = Lock()
+        self.refreshing: Set[Hashable] = set()
+        self.revalidating: Dict[Hashable, Future] = {}
+        self.arevalidating: Dict[Hashable, asyncio.Task] = {}
+        self.tasks: Set[asyncio.Task] = set()
+
+    def get(self, key: Hashable) -> Optional[Tuple[ConfigurationResponse, float]]:
+        with self.lock:
+            # CACHE
+            if key not in self.cache:
+                return None
+
+            config, fetched_at = self.cache[key]
+            # -----
+
+            # LRU
+            self.cache.move_to_end(key)
+            # ---
+
+            return config, monotonic() - fetched_at
+
+    def put(self, key: Hashable, config: ConfigurationResponse, age: float = 0) -> None:
+        with self.lock:
+            # CACHE
+            if key in self.cache:
+                del self.cache[key]
+            # CACHE & LRU
+            elif len(self.cache) >= self.capacity:
+                self.cache.popitem(last=False)
+            # -----------
+
+            # TTL
+            self.cache[key] = (config, monotonic() - age)
+            # ---
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        with self.lock:
+            if key is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(key, None)
+
+    def expire(self, key: Optional[Hashable] = None) -> None:
+        """
+        Expires the config cached under `key`, or all configs, so that they are
+        revalidated before being served, but are still served if that fails.
+        """
+
+        with self.lock:
+            for _key in self.cache if key is None else [key]:
+                if _key in self.cache:
+                    config, _ = self.cache[_key]
+                    self.cache[_key] = (config, float("-inf"))
+
+    def fetch(
+        self,
+        key: Hashable,
+        fetch: Callable[[Optional[str]], Optional[ConfigurationResponse]],
+        pinned: bool = False,
+    ) -> ConfigurationResponse:
+        """
+        Returns the config cached under `key`, calling `fetch(etag)` to (re)validate it
+        when needed. `fetch` returns None when the config matches the given etag.
+        """
+
+        entry = self.get(key)
+
+        if entry:
+            config, age = entry
+
+            if pinned or age < self._fresh_ttl():
+                return config
+
+            if age < self.stale_ttl:
+                if self._start_refreshing(key):
+                    Thread(
+                        target=self._refresh,
+                        args=(key, fetch, config),
+                        daemon=True,
+                    ).start()
+
+                return config
+
+        return self._revalidate(key, fetch, entry[0] if entry else None)
+
+    async def afetch(
+        self,
+        key: Hashable,
+        fetch: Callable[[Optional[str]], Awaitable[Optional[ConfigurationResponse]]],
+        pinned: bool = False,
+    ) -> ConfigurationResponse:
+        """
+        Returns the config cached under `key`, awaiting `fetch(etag)` to (re)validate
+        it when needed. `fetch` returns None when the config matches the given etag.
+        """
+
+        entry = self.get(key)
+
+        if entry:
+            config, age = entry
+
+            if pinned or age < self._fresh_ttl():
+                return config
+
+            if age < self.stale_ttl:
+                if self._start_refreshing(key):
+                    task = asyncio.create_task(self._arefresh(key, fetch, config))
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+
+                return config
+
+        return await self._arevalidate(key, fetch, entry[0] if entry else None)
+
+    def _fresh_ttl(self) -> float:
+        return self.stale_ttl if self.subscribed else self.ttl
+
+    def _start_refreshing(self, key: Hashable) -> bool:
+        with self.lock:
+            if key in self.refreshing:
+                return False
+
+            self.refreshing.add(key)
+
+            return True
+
+    def _refresh(self, key: Hashable, fetch: Callable, config: Any) -> None:
+        try:
+            self._revalidate(key, fetch, config)
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    async def _arefresh(self, key: Hashable, fetch: Callable, config: Any) -> None:
+        try:
+            await self._arevalidate(key, fetch, config)
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def _revalidate(
+        self,
+        key: Hashable,
+        fetch: Callable,
+        config: Optional[ConfigurationResponse],
+    ) -> ConfigurationResponse:
+        # Concurrent revalidations of a config wait for the first one to complete
+        with self.lock:
+            revalidation = self.revalidating.get(key)
+            leader = revalidation is None
+
+            if leader:
+                revalidation = self.revalidating[key] = Future()
+
+        if not leader:
+            return revalidation.result()
+
+        try:
+            try:
+                fetched = fetch(config_etag(config) if config else None)
+            except Exception:  # pylint: disable=broad-except
+                revalidation.set_result(self._fall_back(key, config))
+            else:
+                revalidation.set_result(self._update(key, config, fetched))
+        except BaseException as e:  # pylint: disable=broad-except
+            revalidation.set_exception(e)
+        finally:
+            with self.lock:
+                self.revalidating.pop(key, None)
+
+        return revalidation.result()
+
+    async def _arevalidate(
+        self,
+        key: Hashable,
+        fetch: Callable,
+        config: Optional[ConfigurationResponse],
+    ) -> ConfigurationResponse:
+        # Concurrent revalidations of a config, on the same event loop, await the task
+        # of the first one, which is shielded from the cancellation of its awaiters
+        loop = asyncio.get_running_loop()
+
+        with self.lock:
+            revalidation = self.arevalidating.get(key)
+
+            if revalidation is None or revalidation.get_loop() is not loop:
+                revalidation = loop.create_task(
+                    self._arevalidate_once(key, fetch, config)
+                )
+                self.arevalidating[key] = revalidation
+                revalidation.add_done_callback(
+                    lambda task: self._arevalidated(key, task)
+                )
+
+        return await asyncio.shield(revalidation)
+
+    async def _arevalidate_once(
+        self,
+        key: Hashable,
+        fetch: Callable,
+        config: Optional[ConfigurationResponse],
+    ) -> ConfigurationResponse:
+        try:
+            fetched = await fetch(config_etag(config) if config else None)
+        except Exception:  # pylint: disable=broad-except
+            return self._fall_back(key, config)
+
+        return self._update(key, config, fetched)
+
+    def _arevalidated(self, key: Hashable, revalidation: asyncio.Task) -> None:
+        with self.lock:
+            if self.arevalidating.get(key) is revalidation:
+                del self.arevalidating[key]
+
+    def _fall_back(
+        self,
+        key: Hashable,
+        config: Optional[ConfigurationResponse],
+    ) -> ConfigurationResponse:
+        # Called while handling the failure of a revalidation
+        if config is None:
+            raise  # pylint: disable=misplaced-bare-raise
+
+        log.warning("Agenta SDK - serving the last known config of %s", key)
+
+        # The config is kept, but is revalidated again only after the retry delay,
+        # so that an outage of the registry does not delay every fetch
+        self.put(key, config, age=self._fresh_ttl() - self.retry_delay)
+
+        return config
+
+    def _update(
+        self,
+        key: Hashable,
+        config: Optional[ConfigurationResponse],
+        fetched: Optional[ConfigurationResponse],
+    ) -> ConfigurationResponse:
+        # None -> not modified
+        config = fetched or config
+
+        self.put(key, config)
+
+        return config
+
+
+config_cache = ConfigCache()
@@ -7,6 +7,8 @@ import yaml
 from pydantic import BaseModel
 
 from agenta.sdk.managers.shared import SharedManager
+from agenta.sdk.managers.cache import AGENTA_SDK_CONFIG_CACHE, config_cache
+from agenta.sdk.managers.events import AGENTA_SDK_CONFIG_EVENTS, config_events
 from agenta.sdk.decorators.routing import routing_context
 
 T = TypeVar("T", bound=BaseModel)
@@ -151,7 +153,7 @@ class ConfigManager:
                 environment_slug = context["environment"].get("slug")
                 environment_version = context["environment"].get("version")
 
-            parameters = await ConfigManager.async_get_from_registry(
+            parameters = await ConfigManager.aget_from_registry(
                 app_id=app_id,
                 app_slug=app_slug,
                 variant_id=variant_id,
@@ -197,7 +199,7 @@ class ConfigManager:
         Raises:
             Exception: For any other errors during the process (e.g., API communication issues).
         """
-        config = SharedManager.fetch(
+        refs = dict(
             app_id=app_id,
             app_slug=app_slug,
             variant_id=variant_id,
@@ -208,6 +210,18 @@ class ConfigManager:
             environment_version=environment_version,
         )
 
+        if AGENTA_SDK_CONFIG_CACHE:
+            if AGENTA_SDK_CONFIG_EVENTS:
+                config_events.start()
+
+            config = config_cache.fetch(
+                tuple(refs.items()),
+                lambda etag: SharedManager.fetch(**refs, etag=etag),
+                pinned=ConfigManager._is_pinned(**refs),
+            )
+        else:
+            config = SharedManager.fetch(**refs)
+
         if schema:
             return schema(**config.params)
 
@@ -243,7 +257,7 @@ class ConfigManager:
         Raises:
             Exception: For any other errors during the process (e.g., API communication issues).
         """
-        config = await SharedManager.afetch(
+        refs = dict(
             app_id=app_id,
             app_slug=app_slug,
             variant_id=variant_id,
@@ -254,11 +268,36 @@ class ConfigManager:
             environment_version=environment_version,
         )
 
+        if AGENTA_SDK_CONFIG_CACHE:
+            if AGENTA_SDK_CONFIG_EVENTS:
+                config_events.start()
+
+            config = await config_cache.afetch(
+                tuple(refs.items()),
+                lambda etag: SharedManager.afetch(**refs, etag=etag),
+                pinned=ConfigManager._is_pinned(**refs),
+            )
+        else:
+            config = await SharedManager.afetch(**refs)
+
         if schema:
             return schema(**config.params)
 
         return config.params
 
+    @staticmethod
+    def _is_pinned(
+        variant_id: Optional[str] = None,
+        variant_version: Optional[int] = None,
+        environment_id: Optional[str] = None,
+        environment_version: Optional[int] = None,
+        **kwargs,
+    ) -> bool:
+        # Configs fetched by revision never change
+        return bool(
+            variant_id or variant_version or environment_id or environment_version
+        )
+
     @staticmethod
     def get_from_yaml(
         filename: str,
@@ -0,0 +1,107 @@
+from os import environ
+from time import sleep
+from threading import Lock, Thread
+from typing import Optional
+
+import httpx
+
+from agenta.sdk.utils.logging import log
+from agenta.sdk.managers.cache import ConfigCache, config_cache
+
+import agenta as ag
+
+AGENTA_SDK_CONFIG_EVENTS = str(
+    environ.get("AGENTA_SDK_CONFIG_EVENTS", False)
+).lower() in (
+    "true",
+    "1",
+    "t",
+)
+
+AGENTA_SDK_CONFIG_EVENTS_MAX_RETRY_DELAY = float(
+    environ.get(
+        "AGENTA_SDK_CONFIG_EVENTS_MAX_RETRY_DELAY",
+        60,  # 1 minute
+    )
+)
+
+
+class ConfigEvents:
+    """
+    Subscriber to the config events of the project, which the backend sends whenever a
+    variant is committed, deployed or removed.
+
+    Each event expires the cached configs, which are then revalidated with conditional
+    requests, so that changes are picked up at once rather than after the TTL of the
+    cache. Events may be missed while disconnected, so the cached configs are expired
+    on disconnection as well, and the subscriber reconnects with exponential backoff.
+    """
+
+    def __init__(self, cache: ConfigCache = config_cache):
+        self.cache = cache
+
+        self.lock = Lock()
+        self.thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return
+
+            self.thread = Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self) -> None:
+        delay = 1.0
+
+        while True:
+            try:
+                self._listen()
+
+                delay = 1.0
+            except Exception as e:  # pylint: disable=broad-except
+                log.warning("Agenta SDK - config events disconnected: %s", e)
+            finally:
+                self.cache.subscribed = False
+                self.cache.expire()
+
+            sleep(delay)
+
+            delay = min(delay * 2, AGENTA_SDK_CONFIG_EVENTS_MAX_RETRY_DELAY)
+
+    def _listen(self) -> None:
+        singleton = ag.DEFAULT_AGENTA_SINGLETON_INSTANCE
+
+        headers = {"Accept": "text/event-stream"}
+        if singleton.api_key:
+            headers["Authorization"] = singleton.api_key
+
+        with httpx.stream(
+            "GET",
+            f"{singleton.host}/api/variants/configs/events",
+            headers=headers,
+            # The backend sends a heartbeat every 15 seconds
+            timeout=httpx.Timeout(10, read=60),
+        ) as response:
+            response.raise_for_status()
+
+            # Events are sent from now on, but may have been missed until now
+            self.cache.subscribed = True
+            self.cache.expire()
+
+            event = None
+
+            for line in response.iter_lines():
+                if line.startswith("event:"):
+                    event = line[len("event:") :].strip()
+
+                elif line.startswith("data:") and event == "config":
+                    log.info("Agenta SDK - config changed: %s", line[len("data:") :])
+
+                    self.cache.expire()
+
+                elif not line:
+                    event = None
+
+
+config_events = ConfigEvents()
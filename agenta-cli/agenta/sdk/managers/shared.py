@@ -10,6 +10,7 @@ from agenta.sdk.types import (
 from agenta.client.backend.types.config_dto import ConfigDto as ConfigRequest
 from agenta.client.backend.types.config_response_model import ConfigResponseModel
 from agenta.client.backend.types.reference_request_model import ReferenceRequestModel
+from agenta.client.backend.core.api_error import ApiError
 
 import agenta as ag
 
@@ -184,7 +185,8 @@ class SharedManager:
         environment_id: Optional[str] = None,
         environment_slug: Optional[str] = None,
         environment_version: Optional[int] = None,
-    ) -> ConfigurationResponse:
+        etag: Optional[str] = None,
+    ) -> Optional[ConfigurationResponse]:
         fetch_signatures = SharedManager._parse_fetch_request(
             app_id=app_id,
             app_slug=app_slug,
@@ -196,24 +198,35 @@ class SharedManager:
             environment_version=environment_version,
         )
 
-        config_response = ag.api.variants.configs_fetch(  # type: ignore
-            variant_ref=SharedManager._ref_or_none(  # type: ignore
-                slug=fetch_signatures["variant_slug"],
-                version=fetch_signatures["variant_version"],
-                id=fetch_signatures["variant_id"],
-            ),
-            environment_ref=SharedManager._ref_or_none(  # type: ignore
-                slug=fetch_signatures["environment_slug"],
-                version=fetch_signatures["environment_version"],
-                id=fetch_signatures["environment_id"],
-            ),
-            application_ref=SharedManager._ref_or_none(  # type: ignore
-                slug=fetch_signatures["app_slug"],
-                version=None,
-                id=fetch_signatures["app_id"],
-            ),
+        # Conditional request, answered with a 304 if the config has not changed
+        request_options = (
+            {"additional_headers": {"If-None-Match": etag}} if etag else None
         )
 
+        try:
+            config_response = ag.api.variants.configs_fetch(  # type: ignore
+                variant_ref=SharedManager._ref_or_none(  # type: ignore
+                    slug=fetch_signatures["variant_slug"],
+                    version=fetch_signatures["variant_version"],
+                    id=fetch_signatures["variant_id"],
+                ),
+                environment_ref=SharedManager._ref_or_none(  # type: ignore
+                    slug=fetch_signatures["environment_slug"],
+                    version=fetch_signatures["environment_version"],
+                    id=fetch_signatures["environment_id"],
+                ),
+                application_ref=SharedManager._ref_or_none(  # type: ignore
+                    slug=fetch_signatures["app_slug"],
+                    version=None,
+                    id=fetch_signatures["app_id"],
+                ),
+                request_options=request_options,
+            )
+        except ApiError as e:
+            if e.status_code == 304:
+                return None
+            raise
+
         response = SharedManager._parse_config_response(config_response)
 
         return ConfigurationResponse(**response)
@@ -231,7 +244,8 @@ class SharedManager:
         environment_id: Optional[str] = None,
         environment_slug: Optional[str] = None,
         environment_version: Optional[int] = None,
-    ):
+        etag: Optional[str] = None,
+    ) -> Optional[ConfigurationResponse]:
         fetch_signatures = SharedManager._parse_fetch_request(
             app_id=app_id,
             app_slug=app_slug,
@@ -243,24 +257,35 @@ class SharedManager:
             environment_version=environment_version,
         )
 
-        config_response = await ag.async_api.variants.configs_fetch(  # type: ignore
-            variant_ref=SharedManager._ref_or_none(  # type: ignore
-                slug=fetch_signatures["variant_slug"],
-                version=fetch_signatures["variant_version"],
-                id=fetch_signatures["variant_id"],
-            ),
-            environment_ref=SharedManager._ref_or_none(  # type: ignore
-                slug=fetch_signatures["environment_slug"],
-                version=fetch_signatures["environment_version"],
-                id=fetch_signatures["environment_id"],
-            ),
-            application_ref=SharedManager._ref_or_none(  # type: ignore
-                slug=fetch_signatures["app_slug"],
-                version=None,
-                id=fetch_signatures["app_id"],
-            ),
+        # Conditional request, answered with a 304 if the config has not changed
+        request_options = (
+            {"additional_headers": {"If-None-Match": etag}} if etag else None
         )
 
+        try:
+            config_response = await ag.async_api.variants.configs_fetch(  # type: ignore
+                variant_ref=SharedManager._ref_or_none(  # type: ignore
+                    slug=fetch_signatures["variant_slug"],
+                    version=fetch_signatures["variant_version"],
+                    id=fetch_signatures["variant_id"],
+                ),
+                environment_ref=SharedManager._ref_or_none(  # type: ignore
+                    slug=fetch_signatures["environment_slug"],
+                    version=fetch_signatures["environment_version"],
+                    id=fetch_signatures["environment_id"],
+                ),
+                application_ref=SharedManager._ref_or_none(  # type: ignore
+                    slug=fetch_signatures["app_slug"],
+                    version=None,
+                    id=fetch_signatures["app_id"],
+                ),
+                request_options=request_options,
+            )
+        except ApiError as e:
+            if e.status_code == 304:
+                return None
+            raise
+
         response = SharedManager._parse_config_response(config_response)
 
         return ConfigurationResponse(**response)
@@ -0,0 +1,168 @@
+import asyncio
+from threading import Event, Thread
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from agenta.sdk.managers import cache as cache_module
+from agenta.sdk.managers.cache import ConfigCache, config_etag
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(cache_module, "monotonic", lambda: clock.now)
+    return clock
+
+
+def make_config(revision: int):
+    return SimpleNamespace(
+        variant_id=f"variant-revision-{revision}",
+        environment_id="environment-revision",
+    )
+
+
+def test_configs_are_served_from_the_cache_until_their_ttl(clock):
+    cache = ConfigCache(ttl=60, stale_ttl=60)
+    config, new_config = make_config(1), make_config(2)
+    fetch = MagicMock(side_effect=[config, new_config])
+
+    assert cache.fetch("key", fetch) is config
+
+    clock.now += 59
+    assert cache.fetch("key", fetch) is config
+    fetch.assert_called_once_with(None)
+
+    clock.now += 2
+    assert cache.fetch("key", fetch) is new_config
+    fetch.assert_called_with(config_etag(config))
+
+
+@pytest.mark.asyncio
+async def test_stale_configs_are_served_while_revalidated(clock):
+    cache = ConfigCache(ttl=60, stale_ttl=3600)
+    config, new_config = make_config(1), make_config(2)
+    cache.put("key", config)
+    fetch = AsyncMock(return_value=new_config)
+
+    clock.now += 61
+    assert await cache.afetch("key", fetch) is config
+    assert await cache.afetch("key", fetch) is config
+
+    for task in list(cache.tasks):
+        await task
+
+    fetch.assert_awaited_once_with(config_etag(config))
+    assert await cache.afetch("key", fetch) is new_config
+
+
+def test_pinned_configs_are_never_revalidated(clock):
+    cache = ConfigCache(ttl=60, stale_ttl=3600)
+    config = make_config(1)
+    cache.put("key", config)
+    fetch = MagicMock()
+
+    clock.now += 7200
+    assert cache.fetch("key", fetch, pinned=True) is config
+    fetch.assert_not_called()
+
+
+def test_unmodified_configs_are_kept(clock):
+    cache = ConfigCache(ttl=60, stale_ttl=60)
+    config = make_config(1)
+    cache.put("key", config)
+    # The backend answers with a 304, which the fetch returns as None
+    fetch = MagicMock(return_value=None)
+
+    clock.now += 61
+    assert cache.fetch("key", fetch) is config
+    fetch.assert_called_once_with(config_etag(config))
+    assert cache.get("key") == (config, 0)
+
+
+def test_last_known_configs_are_served_when_revalidations_fail(clock):
+    cache = ConfigCache(ttl=60, stale_ttl=60, retry_delay=5)
+    config = make_config(1)
+    cache.put("key", config)
+    fetch = MagicMock(side_effect=ConnectionError)
+
+    clock.now += 61
+    assert cache.fetch("key", fetch) is config
+    assert fetch.call_count == 1
+
+    # Not revalidated again until the retry delay
+    clock.now += 4
+    assert cache.fetch("key", fetch) is config
+    assert fetch.call_count == 1
+
+    clock.now += 2
+    assert cache.fetch("key", fetch) is config
+    assert fetch.call_count == 2
+
+    with pytest.raises(ConnectionError):
+        cache.fetch("other-key", fetch)
+
+
+def test_concurrent_revalidations_are_coalesced(clock):
+    cache = ConfigCache(ttl=60, stale_ttl=60)
+    config = make_config(1)
+    fetching, fetched = Event(), Event()
+
+    def fetch(etag):
+        fetching.set()
+        fetched.wait(timeout=5)
+        return config
+
+    fetch = MagicMock(side_effect=fetch)
+    results = []
+
+    first = Thread(target=lambda: results.append(cache.fetch("key", fetch)))
+    first.start()
+    fetching.wait(timeout=5)
+    second = Thread(target=lambda: results.append(cache.fetch("key", fetch)))
+    second.start()
+    fetched.set()
+    first.join(timeout=5)
+    second.join(timeout=5)
+
+    assert results == [config, config]
+    fetch.assert_called_once_with(None)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_async_revalidations_are_coalesced(clock):
+    cache = ConfigCache(ttl=60, stale_ttl=60)
+    config = make_config(1)
+    fetched = asyncio.Event()
+
+    async def fetch(etag):
+        await fetched.wait()
+        return config
+
+    fetch = AsyncMock(side_effect=fetch)
+
+    first = asyncio.ensure_future(cache.afetch("key", fetch))
+    second = asyncio.ensure_future(cache.afetch("key", fetch))
+    await asyncio.sleep(0)
+
+    # The first fetch is cancelled, the revalidation goes on for the second one
+    first.cancel()
+    fetched.set()
+
+    assert await second is config
+    fetch.assert_awaited_once_with(None)
+    assert not cache.arevalidating
+
+
+def test_least_recently_used_configs_are_evicted(clock):
+    cache = ConfigCache(capacity=2)
+    cache.put("a", make_config(1))
+    cache.put("b", make_config(2))
+
+    cache.get("a")
+    cache.put("c", make_config(3))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None